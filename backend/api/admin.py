@@ -1,14 +1,38 @@
 from django.contrib import admin
-from .models import Driver, Customer, PhoneOTP, RideRequest
+from django.utils import timezone
+from .models import ArchivedRide, Driver, Customer, OutboxJob, PhoneOTP, RideRequest
+from . import auth, sync
+from .notifications import DRIVER_FEED_FIELDS, driver_changed_sends, publish
+
+
+def _publish_drivers(ids):
+    # One background job for the whole selection
+    drivers = Driver.objects.filter(id__in=ids).only(*DRIVER_FEED_FIELDS)
+    publish(*(driver_changed_sends(driver) for driver in drivers))
+
 
 # ---------- ACTIONS ----------
+# The ids are read before the update: the changelist may be filtered on
+# approval_status, and the queryset would not match the rows afterwards
 @admin.action(description="Approve selected drivers")
 def approve_drivers(modeladmin, request, queryset):
-    queryset.update(approval_status="APPROVED")
+    ids = list(queryset.values_list("id", flat=True))
+    Driver.objects.filter(id__in=ids).update(approval_status="APPROVED", updated_at=timezone.now())
+    sync.bump(sync.DRIVERS_SCOPE)
+    _publish_drivers(ids)
 
 @admin.action(description="Reject selected drivers")
 def reject_drivers(modeladmin, request, queryset):
-    queryset.update(approval_status="REJECTED")
+    ids = list(queryset.values_list("id", flat=True))
+    Driver.objects.filter(id__in=ids).update(approval_status="REJECTED", updated_at=timezone.now())
+    sync.bump(sync.DRIVERS_SCOPE)
+    auth.revoke(auth.DRIVER, *ids)
+    _publish_drivers(ids)
+
+
+@admin.action(description="Retry selected jobs")
+def retry_jobs(modeladmin, request, queryset):
+    queryset.filter(status="FAILED").update(status="PENDING", attempts=0, run_after=timezone.now())
 
 
 # ---------- DRIVER ADMIN ----------
@@ -39,5 +63,32 @@ class PhoneOTPAdmin(admin.ModelAdmin):
 @admin.register(RideRequest)
 class RideRequestAdmin(admin.ModelAdmin):
     list_display = ("id", "customer", "driver", "status", "created_at")
+    list_select_related = ("customer", "driver")
     list_filter = ("status",)
     search_fields = ("customer__full_name", "driver__full_name")
+
+
+# ---------- ARCHIVED RIDE ADMIN ----------
+@admin.register(ArchivedRide)
+class ArchivedRideAdmin(admin.ModelAdmin):
+    list_display = ("id", "customer", "driver", "status", "created_at", "archived_at")
+    list_select_related = ("customer", "driver")
+    list_filter = ("status",)
+    search_fields = ("customer__full_name", "driver__full_name")
+
+    # History is read-only; archive_rides is the only writer
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# ---------- OUTBOX JOB ADMIN ----------
+@admin.register(OutboxJob)
+class OutboxJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_after", "created_at")
+    list_filter = ("status",)
+    readonly_fields = ("payload", "last_error")
+
+    actions = [retry_jobs]
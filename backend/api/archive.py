@@ -0,0 +1,110 @@
+"""
+Hot/cold split of the ride table.
+
+RideRequest keeps the rides that can still change plus recent history.
+archive_rides() (`manage.py archive_rides`) moves COMPLETED and CANCELLED
+rides untouched for RIDE_ARCHIVE_AFTER_DAYS into ArchivedRide, one batch
+per transaction. Dispatch, assignment and the ride changelist only ever
+read the hot table, so they cost the same however much history piles up.
+
+The history endpoints read both tables when paged (?limit= / ?cursor=).
+Both are paged on (created_at, id), so a page is the hot page merged with
+the archive page for the same cursor (pagination.list_response(archive=...)).
+Every archived ride was created at or before the archive's horizon, kept in
+the cache, so recent pages that end above it never query the archive.
+Unpaged history lists only return the hot table, so the customer app
+pages its history and the driver app reads its totals from the rollups
+(driver/<id>/stats/).
+
+Moving a ride takes it out of the unpaged lists, so the ride lists' sync
+versions are bumped (post_delete); the rollups keep counting it and
+rollups.rebuild() reads both tables.
+"""
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ArchivedRide, RideRequest
+from .pagination import Archive
+
+
+TERMINAL_STATUSES = ("COMPLETED", "CANCELLED")
+
+HORIZON_KEY = "rides:archive:horizon"
+EMPTY = ""   # cached horizon while nothing is archived
+
+# Columns copied as they are (customer_id, driver_id, ... timestamps)
+COPIED_FIELDS = [f.attname for f in ArchivedRide._meta.concrete_fields if f.name != "archived_at"]
+
+
+# ----------------------------------------------------------
+# MOVING RIDES
+# ----------------------------------------------------------
+def archive_rides(days=None, batch_size=1000, now=None):
+    """Move terminal rides not updated for `days` days to ArchivedRide. Returns the number moved."""
+    if days is None:
+        days = getattr(settings, "RIDE_ARCHIVE_AFTER_DAYS", 30)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                RideRequest.objects.select_for_update()
+                .filter(status__in=TERMINAL_STATUSES, updated_at__lt=cutoff)
+                .order_by("updated_at")
+                .values(*COPIED_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+
+            # Raised before the rows move: a reader may query the archive
+            # for nothing, but never skips a ride that is already there
+            _raise_horizon(max(row["created_at"] for row in rows))
+
+            ArchivedRide.objects.bulk_create([ArchivedRide(**row) for row in rows])
+            # post_delete bumps the ride lists: unpaged ones drop the ride
+            RideRequest.objects.filter(id__in=[row["id"] for row in rows]).delete()
+
+        moved += len(rows)
+        if len(rows) < batch_size:
+            break
+    return moved
+
+
+# ----------------------------------------------------------
+# HORIZON (NEWEST ARCHIVED created_at)
+# ----------------------------------------------------------
+def horizon():
+    """The newest created_at in the archive, None while it is empty."""
+    value = cache.get(HORIZON_KEY)
+    if value is None:
+        value = ArchivedRide.objects.aggregate(newest=Max("created_at"))["newest"] or EMPTY
+        cache.add(HORIZON_KEY, value, None)
+    return value or None
+
+
+def _raise_horizon(created_at):
+    current = horizon()
+    if current is None or created_at > current:
+        cache.set(HORIZON_KEY, created_at, None)
+
+
+# ----------------------------------------------------------
+# HISTORY LISTS
+# ----------------------------------------------------------
+def history(queryset):
+    """An ArchivedRide queryset as list_response(archive=...), None while nothing is archived."""
+    newest = horizon()
+    if newest is None:
+        return None
+    return Archive(queryset, newest)
+
+
+async def ahistory(queryset):
+    return await sync_to_async(history)(queryset)
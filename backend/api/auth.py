@@ -0,0 +1,156 @@
+"""
+Stateless JWT authentication for drivers, customers and admins.
+
+Drivers and customers aren't auth.User rows, so simplejwt's
+JWTAuthentication looked their ids up in the wrong table. Tokens now carry
+the caller's role and id ("role", "sub"), and StatelessJWTAuthentication
+builds a Principal from the verified claims alone: authenticating costs no
+query. Views check ownership against request.user.role / .id.
+
+Revocation is per subject: revoke() stores a cutoff time in the shared
+cache and tokens issued before it are refused. Both are whole seconds,
+like the tokens' iat, so a token issued in the second of the revocation
+(a re-login right after it) still works. Each worker remembers
+lookups for AUTH_REVOCATION_CACHE_SECONDS, so a revocation takes that long
+to reach every worker (None turns the checks off). Drivers are revoked
+when rejected or deleted, customers when deleted, admins when they lose
+is_staff or is_active.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import permissions
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+
+DRIVER = "driver"
+CUSTOMER = "customer"
+ADMIN = "admin"
+ROLES = (DRIVER, CUSTOMER, ADMIN)
+
+ROLE_CLAIM = "role"
+SUBJECT_CLAIM = "sub"
+
+REVOKED_KEY = "auth:revoked:{}:{}"
+
+
+# ----------------------------------------------------------
+# TOKENS
+# ----------------------------------------------------------
+def tokens_for(role, subject_id):
+    refresh = RefreshToken()
+    refresh[ROLE_CLAIM] = role
+    refresh[SUBJECT_CLAIM] = str(subject_id)
+    return {
+        "refresh": str(refresh),
+        "access": str(refresh.access_token),
+    }
+
+
+class Principal:
+    """The caller a token speaks for, built from its claims."""
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, role, id):
+        self.role = role
+        self.id = self.pk = id
+
+    @property
+    def is_staff(self):
+        return self.role == ADMIN
+
+    def __repr__(self):
+        return f"<Principal {self.role} {self.id}>"
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        role = validated_token.get(ROLE_CLAIM)
+        subject = validated_token.get(SUBJECT_CLAIM)
+        if role not in ROLES or not str(subject).isdigit():
+            raise InvalidToken("Token has no role and subject; log in again")
+        if is_revoked(role, int(subject), validated_token.get("iat", 0)):
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        return Principal(role, int(subject))
+
+
+def principal_for_token(raw_token):
+    """A raw access token (WebSocket ?token=) -> Principal, or None."""
+    try:
+        return StatelessJWTAuthentication().get_user(AccessToken(raw_token))
+    except (TokenError, InvalidToken, AuthenticationFailed):
+        return None
+
+
+# ----------------------------------------------------------
+# REVOCATION
+# ----------------------------------------------------------
+_seen = {}   # (role, id) -> (cutoff or 0, remembered until)
+
+
+def revoke(role, *subject_ids):
+    """Refuse every token issued so far to these subjects, once the current transaction commits."""
+    if subject_ids:
+        transaction.on_commit(lambda: _set_cutoffs(role, subject_ids, time.time()))
+
+
+def _set_cutoffs(role, subject_ids, now):
+    # Kept as long as a refresh token lives; older tokens are expired anyway
+    lifetime = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    cache.set_many({REVOKED_KEY.format(role, subject_id): int(now) for subject_id in subject_ids}, lifetime)
+    for subject_id in subject_ids:
+        _seen.pop((role, subject_id), None)
+
+
+def is_revoked(role, subject_id, issued_at):
+    ttl = getattr(settings, "AUTH_REVOCATION_CACHE_SECONDS", 30)
+    if ttl is None:
+        return False
+
+    now = time.time()
+    cutoff, until = _seen.get((role, subject_id), (0, 0))
+    if until <= now:
+        if len(_seen) > 100_000:
+            _seen.clear()
+        cutoff = cache.get(REVOKED_KEY.format(role, subject_id)) or 0
+        _seen[(role, subject_id)] = (cutoff, now + ttl)
+    return issued_at < int(cutoff)
+
+
+# ----------------------------------------------------------
+# PERMISSIONS / OWNERSHIP
+# ----------------------------------------------------------
+class _HasRole(permissions.BasePermission):
+    roles = ()
+
+    def has_permission(self, request, view):
+        return getattr(request.user, "role", None) in self.roles
+
+
+class IsDriverOrAdmin(_HasRole):
+    roles = (DRIVER, ADMIN)
+
+
+def acting_as(request, role):
+    """The caller's id if it has role, None for admins (who act for anyone)."""
+    if request.user.role == ADMIN:
+        return None
+    if request.user.role != role:
+        raise PermissionDenied()
+    return request.user.id
+
+
+def check_owner(request, role, subject_id):
+    """Only subject_id itself (or an admin) may act on its resources."""
+    owner = acting_as(request, role)
+    if owner is not None and str(owner) != str(subject_id):
+        raise PermissionDenied(f"Not your {role} account")
@@ -0,0 +1,355 @@
+"""
+Bulk import (`manage.py import_rows`) and streaming export (rides/export/).
+
+Imports read CSV or NDJSON lazily and insert batch_size rows per
+bulk_create, each batch in its own transaction, so memory holds one batch
+whatever the file size. Every row is checked by the model fields' own
+validation; a bad row is reported with its line number and skipped, and so
+is a driver or customer whose phone or email is already taken.
+
+Passwords may be plaintext, hashed in a process pool
+(hashing.bulk_hasher), or already encoded by Django, as when moving from
+another install. Imported rides keep their timestamps, count towards the
+rollups and bump the sync versions like any other write. Imported drivers
+start unavailable: going online is the driver app's call.
+
+Exports read the table in id order, batch_size rows per query, and yield
+one chunk per batch. Memory stays flat on every backend (MySQL's driver
+buffers whole result sets, so .iterator() alone wouldn't do) and under
+ASGI, which the export view serves through aexport_rides().
+"""
+import csv
+import heapq
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import identify_hasher
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import rollups, sync
+from .models import ArchivedRide, Customer, Driver, RideRequest
+from .serializers import RideListSerializer
+
+
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def guess_format(path):
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+# ----------------------------------------------------------
+# READING
+# ----------------------------------------------------------
+class BadRow(Exception):
+    pass
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict or BadRow) from a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = BadRow(f"invalid JSON: {exc}")
+        if not isinstance(row, (dict, BadRow)):
+            row = BadRow("not a JSON object")
+        yield number, row
+
+
+# ----------------------------------------------------------
+# IMPORTERS
+# ----------------------------------------------------------
+class Importer:
+    model = None
+    fields = ()            # columns read from each row
+    clean_exclude = ()     # fields checked in bulk by prepare()
+
+    def __init__(self, hash_passwords=None, batch_size=1000):
+        self.hash_passwords = hash_passwords
+        self.batch_size = batch_size
+        self.created = 0
+        self.skipped = []  # (line number, reason)
+
+    def run(self, rows):
+        """Import (line number, row) pairs. Returns (created, skipped)."""
+        batch = []
+        for number, row in rows:
+            obj = self._build(number, row)
+            if obj is not None:
+                batch.append((number, obj))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        return self.created, self.skipped
+
+    def skip(self, number, reason):
+        self.skipped.append((number, reason))
+
+    # ---------- PER ROW ----------
+    def _build(self, number, row):
+        if isinstance(row, BadRow):
+            self.skip(number, str(row))
+            return None
+
+        values = {name: row[name] for name in self.fields if row.get(name) not in (None, "")}
+        try:
+            obj = self.build(values)
+            obj.clean_fields(exclude=self.clean_exclude)
+        except ValidationError as exc:
+            self.skip(number, "; ".join(
+                f"{field}: {' '.join(messages)}" for field, messages in exc.message_dict.items()
+            ))
+            return None
+        return obj
+
+    def build(self, values):
+        return self.model(**values)
+
+    # ---------- PER BATCH ----------
+    def _flush(self, batch):
+        objs = self.prepare(batch)
+        if not objs:
+            return
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(objs)
+                self.inserted(objs)
+        except IntegrityError as exc:
+            # Lost a race with a live registration; the rest of the file goes on
+            kept = {id(obj) for obj in objs}
+            for number, obj in batch:
+                if id(obj) in kept:
+                    self.skip(number, f"batch failed: {exc}")
+            return
+        self.created += len(objs)
+
+    def prepare(self, batch):
+        """Checks needing queries, done once per batch. Returns the objects to insert."""
+        return [obj for _, obj in batch]
+
+    def inserted(self, objs):
+        pass
+
+
+class AccountImporter(Importer):
+    """Drivers and customers: unique phone / email, hashed passwords."""
+
+    def prepare(self, batch):
+        phones = [obj.phone for _, obj in batch]
+        emails = [obj.email for _, obj in batch]
+        taken = set()
+        for phone, email in self.model.objects.filter(
+            Q(phone__in=phones) | Q(email__in=emails)
+        ).values_list("phone", "email"):
+            taken.update((("phone", phone), ("email", email)))
+
+        objs = []
+        for number, obj in batch:
+            keys = {("phone", obj.phone), ("email", obj.email)}
+            clash = sorted(name for name, value in keys & taken)
+            if clash:
+                self.skip(number, f"{' and '.join(clash)} already registered")
+                continue
+            taken |= keys   # duplicates further down the same batch
+            objs.append(obj)
+
+        plain = [obj for obj in objs if not _is_encoded(obj.password)]
+        for obj, encoded in zip(plain, self.hash_passwords([obj.password for obj in plain])):
+            obj.password = encoded
+        return objs
+
+
+def _is_encoded(password):
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return False
+    return True
+
+
+class DriverImporter(AccountImporter):
+    model = Driver
+    fields = (
+        "full_name", "email", "phone", "address", "password",
+        "experience_years", "approval_status", "latitude", "longitude",
+    )
+
+    def inserted(self, objs):
+        sync.bump(sync.DRIVERS_SCOPE)
+
+
+class CustomerImporter(AccountImporter):
+    model = Customer
+    fields = ("full_name", "email", "phone", "address", "password")
+
+
+class RideImporter(Importer):
+    """
+    Rides reference their customer and driver by id ("customer", "driver",
+    as exported) or by phone ("customer_phone", "driver_phone").
+    """
+    model = RideRequest
+    fields = (
+        "customer", "customer_phone", "driver", "driver_phone",
+        "pickup_address", "pickup_lat", "pickup_lng",
+        "drop_address", "drop_lat", "drop_lng",
+        "estimated_fare", "status",
+        "created_at", "assigned_at", "started_at", "completed_at", "updated_at",
+    )
+    clean_exclude = ("customer", "driver")
+    TIMESTAMPS = ("created_at", "assigned_at", "started_at", "completed_at", "updated_at")
+
+    def build(self, values):
+        refs = {
+            name: str(values.pop(name)) if name in values else None
+            for name in ("customer", "customer_phone", "driver", "driver_phone")
+        }
+        ride = RideRequest(**values)
+        ride.import_refs = refs
+        return ride
+
+    def _build(self, number, row):
+        ride = super()._build(number, row)
+        if ride is None:
+            return None
+
+        for name in self.TIMESTAMPS:
+            value = getattr(ride, name)
+            if isinstance(value, datetime) and timezone.is_naive(value):
+                setattr(ride, name, timezone.make_aware(value))
+        # created_at defaults to now; a missing updated_at is the last transition
+        if row.get("updated_at") in (None, ""):
+            ride.updated_at = max(
+                value for value in (getattr(ride, name) for name in self.TIMESTAMPS[:-1]) if value
+            )
+        return ride
+
+    def prepare(self, batch):
+        customers = _resolve(Customer, batch, "customer")
+        drivers = _resolve(Driver, batch, "driver")
+
+        rides = []
+        for number, ride in batch:
+            refs = ride.import_refs
+            ride.customer_id = customers.get(("id", refs["customer"])) or customers.get(("phone", refs["customer_phone"]))
+            if ride.customer_id is None:
+                self.skip(number, "unknown customer")
+                continue
+            if refs["driver"] or refs["driver_phone"]:
+                ride.driver_id = drivers.get(("id", refs["driver"])) or drivers.get(("phone", refs["driver_phone"]))
+                if ride.driver_id is None:
+                    self.skip(number, "unknown driver")
+                    continue
+            rides.append(ride)
+        return rides
+
+    def inserted(self, rides):
+        rollups.record(*(
+            rollups.ride_deltas(
+                ride.created_at, ride.assigned_at, ride.started_at, ride.completed_at,
+                ride.driver_id, ride.estimated_fare,
+            )
+            for ride in rides
+        ))
+        sync.bump(*{scope for ride in rides for scope in sync.ride_scopes(ride)})
+
+
+def _resolve(model, batch, name):
+    """{("id", value) | ("phone", value): pk} for the references in batch."""
+    ids, phones = set(), set()
+    for _, ride in batch:
+        ids.add(ride.import_refs[name])
+        phones.add(ride.import_refs[f"{name}_phone"])
+    ids = [int(value) for value in ids if value and value.isdigit()]
+    phones.discard(None)
+
+    found = {}
+    if ids or phones:
+        for pk, phone in model.objects.filter(Q(id__in=ids) | Q(phone__in=phones)).values_list("id", "phone"):
+            found[("id", str(pk))] = pk
+            found[("phone", phone)] = pk
+    return found
+
+
+IMPORTERS = {
+    "drivers": DriverImporter,
+    "customers": CustomerImporter,
+    "rides": RideImporter,
+}
+
+
+# ----------------------------------------------------------
+# EXPORT
+# ----------------------------------------------------------
+def _table_rows(model, serializer, batch_size):
+    """Every row of model in id order, one query per batch_size rows."""
+    last_id = 0
+    while True:
+        batch = list(serializer.rows(model.objects.filter(id__gt=last_id).order_by("id"))[:batch_size])
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1][0]
+
+
+def export_rides(fmt="csv", batch_size=2000):
+    """Yield every ride, live and archived, in id order as CSV or NDJSON chunks."""
+    serializer = RideListSerializer()
+    fields = serializer.fields
+    # "id" leads each row, so the two id-ordered streams merge by id
+    rows = heapq.merge(*(_table_rows(model, serializer, batch_size) for model in (RideRequest, ArchivedRide)))
+
+    if fmt == "csv":
+        yield _csv_lines([fields])
+
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        records = serializer.serialize(batch)
+        if fmt == "csv":
+            yield _csv_lines([_csv_value(record[name]) for name in fields] for record in records)
+        else:
+            yield "".join(json.dumps(record, cls=JSONEncoder) + "\n" for record in records)
+
+
+async def aexport_rides(fmt="csv", batch_size=2000):
+    """
+    export_rides() for ASGI. Django serves a sync iterator there by reading
+    it into a list first; this builds one chunk at a time in a worker thread.
+    """
+    chunks = export_rides(fmt, batch_size)
+    while True:
+        chunk = await sync_to_async(next)(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
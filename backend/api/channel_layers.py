@@ -0,0 +1,222 @@
+"""
+Channel layer that works across ASGI worker processes on one host.
+
+Each process keeps an InMemoryChannelLayer for its own consumers and
+listens on a Unix stream socket in CHANNEL_LAYERS[...]["CONFIG"]["socket_dir"].
+group_send delivers to local members and forwards the message once to
+every other worker socket in that directory; a send to a channel owned by
+another worker goes straight to that worker's socket. No Redis needed.
+
+Processes that only send (management commands, WSGI) never listen, so
+dispatch_rides and friends can notify drivers connected to any worker.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import string
+import struct
+import time
+
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+
+
+logger = logging.getLogger(__name__)
+
+SOCKET_SUFFIX = ".sock"
+FRAME_HEADER = struct.Struct("!I")   # payload length, then the JSON payload
+
+
+class UnixSocketChannelLayer(InMemoryChannelLayer):
+
+    extensions = ["groups", "flush"]
+
+    def __init__(self, socket_dir="/tmp/driverhiring-channels", peer_cache_seconds=1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.socket_dir = socket_dir
+        self.peer_cache_seconds = peer_cache_seconds
+
+        self.process_id = f"{os.getpid()}-{_random_suffix(6)}"
+        self.socket_path = os.path.join(socket_dir, self.process_id + SOCKET_SUFFIX)
+
+        self._server = None
+        self._server_loop = None
+        self._writers = {}      # peer path -> (loop, StreamWriter)
+        self._peers = []
+        self._peers_checked = 0.0
+        self._last_clean = 0.0
+
+    # ---------- RECEIVING SIDE ----------
+    async def _ensure_server(self):
+        loop = asyncio.get_running_loop()
+        if self._server is not None and self._server_loop is loop:
+            return
+
+        if self._server is not None:
+            self._server.close()
+
+        os.makedirs(self.socket_dir, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self._server = await asyncio.start_unix_server(self._handle_peer, path=self.socket_path)
+        self._server_loop = loop
+        self._peers_checked = 0.0
+
+    async def _handle_peer(self, reader, writer):
+        try:
+            while True:
+                (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                packet = json.loads(await reader.readexactly(size))
+                await self._deliver_local(packet)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _deliver_local(self, packet):
+        try:
+            if packet["op"] == "group_send":
+                await self._local_group_send(packet["group"], packet["message"])
+            elif packet["op"] == "send":
+                await super().send(packet["channel"], packet["message"])
+        except Exception:
+            logger.exception("failed to deliver forwarded channel layer message")
+
+    def _maybe_clean_expired(self):
+        # InMemoryChannelLayer sweeps every channel and group for expiry on
+        # each receive and group_send, which is O(connections) per message
+        # at fleet scale; sweeping once a second is plenty.
+        now = time.monotonic()
+        if now - self._last_clean > 1.0:
+            self._clean_expired()
+            self._last_clean = now
+
+    async def _local_group_send(self, group, message):
+        self._maybe_clean_expired()
+        for channel in list(self.groups.get(group, ())):
+            try:
+                await InMemoryChannelLayer.send(self, channel, message)
+            except ChannelFull:
+                pass
+
+    # ---------- SENDING SIDE ----------
+    def _peer_paths(self):
+        now = time.monotonic()
+        if now - self._peers_checked > self.peer_cache_seconds:
+            try:
+                names = os.listdir(self.socket_dir)
+            except FileNotFoundError:
+                names = []
+            self._peers = [
+                os.path.join(self.socket_dir, name)
+                for name in names
+                if name.endswith(SOCKET_SUFFIX)
+                and os.path.join(self.socket_dir, name) != self.socket_path
+            ]
+            self._peers_checked = now
+        return self._peers
+
+    async def _writer_for(self, path):
+        loop = asyncio.get_running_loop()
+        cached = self._writers.get(path)
+        if cached is not None:
+            writer_loop, writer = cached
+            if writer_loop is loop and not writer.is_closing():
+                return writer
+            self._writers.pop(path, None)
+
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # The worker behind this socket is gone
+            self._drop_peer(path)
+            return None
+
+        self._writers[path] = (loop, writer)
+        return writer
+
+    async def _forward(self, path, packet):
+        frame = FRAME_HEADER.pack(len(packet)) + packet
+
+        for _ in range(2):   # one retry on a fresh connection
+            writer = await self._writer_for(path)
+            if writer is None:
+                return
+            try:
+                writer.write(frame)
+                await writer.drain()   # backpressure when the peer falls behind
+                return
+            except ConnectionError:
+                self._writers.pop(path, None)
+
+        logger.warning("channel layer peer %s unreachable, message dropped", path)
+
+    def _drop_peer(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        if path in self._peers:
+            self._peers.remove(path)
+
+    def _owner(self, channel):
+        """process_id of a process-specific channel created by this layer class."""
+        if "!" not in channel:
+            return None
+        return channel[:channel.find("!")].rsplit(".", 1)[-1]
+
+    # ---------- CHANNEL LAYER API ----------
+    async def new_channel(self, prefix="specific."):
+        await self._ensure_server()
+        return f"{prefix}.{self.process_id}!{_random_suffix(12)}"
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        self._maybe_clean_expired()
+
+        queue = self.channels.setdefault(
+            channel, asyncio.Queue(maxsize=self.get_capacity(channel))
+        )
+        try:
+            _, message = await queue.get()
+        finally:
+            if queue.empty():
+                self.channels.pop(channel, None)
+        return message
+
+    async def send(self, channel, message):
+        owner = self._owner(channel)
+        if owner is None or owner == self.process_id:
+            return await super().send(channel, message)
+
+        self.require_valid_channel_name(channel)
+        packet = json.dumps({"op": "send", "channel": channel, "message": message}).encode()
+        await self._forward(os.path.join(self.socket_dir, owner + SOCKET_SUFFIX), packet)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+
+        packet = json.dumps({"op": "group_send", "group": group, "message": message}).encode()
+        await asyncio.gather(*(self._forward(path, packet) for path in list(self._peer_paths())))
+
+        await self._local_group_send(group, message)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for _, writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def _random_suffix(length):
+    return "".join(random.choice(string.ascii_letters) for _ in range(length))
@@ -1,20 +1,118 @@
 import json
+import logging
+import secrets
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .auth import ADMIN, CUSTOMER, DRIVER, principal_for_token
+from .locations import location_buffer, ensure_flush_loop
+from .metrics import ensure_loop_monitor, get_consumer_metrics
+from .notifications import ADMIN_FEED_GROUP
+from .presence import ensure_reconcile_loop, get_presence
+
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------
+# INSTRUMENTATION
+# ----------------------------------------------------------
+class InstrumentedConsumer(AsyncWebsocketConsumer):
+    """
+    Records connections, group memberships, frames in and out and send
+    latency in ConsumerMetrics (api/metrics.py), keyed by class name.
+    Subclasses join groups with join() / leave() so membership is counted.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_key = type(self).__name__
+        self.accepted = False
+        self.joined = set()
+
+    async def accept(self, subprotocol=None, headers=None):
+        await super().accept(subprotocol, headers)
+        self.accepted = True
+        metrics = get_consumer_metrics()
+        metrics.add(self.metrics_key, "connections")
+        metrics.add(self.metrics_key, "active")
+        ensure_loop_monitor()
+
+    async def close(self, code=None, reason=None):
+        if not self.accepted:
+            get_consumer_metrics().add(self.metrics_key, "rejected")
+        await super().close(code, reason)
+
+    async def websocket_disconnect(self, message):
+        if self.accepted:
+            self.accepted = False
+            get_consumer_metrics().add(self.metrics_key, "active", -1)
+        await super().websocket_disconnect(message)
+
+    async def websocket_receive(self, message):
+        get_consumer_metrics().add(self.metrics_key, "messages_in")
+        await super().websocket_receive(message)
 
-class DriverRideConsumer(AsyncWebsocketConsumer):
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        start = time.perf_counter()
+        await super().send(text_data, bytes_data, close)
+        get_consumer_metrics().sent(self.metrics_key, time.perf_counter() - start)
+
+    async def authorize(self, role, subject_id=None):
+        """
+        The ?token= principal if it has role (and is subject_id); otherwise
+        close with 4401 (no valid token) or 4403 (someone else's socket).
+        """
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        token = params.get("token", [""])[0]
+        principal = await sync_to_async(principal_for_token)(token) if token else None
+
+        if principal is None:
+            await self.close(code=4401)
+        elif principal.role != role or (subject_id is not None and str(principal.id) != str(subject_id)):
+            await self.close(code=4403)
+        else:
+            return principal
+        return None
+
+    async def join(self, group):
+        await self.channel_layer.group_add(group, self.channel_name)
+        if group not in self.joined:
+            self.joined.add(group)
+            get_consumer_metrics().add(self.metrics_key, "group_members")
+
+    async def leave(self, group):
+        await self.channel_layer.group_discard(group, self.channel_name)
+        if group in self.joined:
+            self.joined.discard(group)
+            get_consumer_metrics().add(self.metrics_key, "group_members", -1)
+
+
+# ----------------------------------------------------------
+# DRIVER: RIDE ASSIGNMENTS, PING, LOCATION
+# ----------------------------------------------------------
+class DriverRideConsumer(InstrumentedConsumer):
 
     async def connect(self):
+        driver_id = self.scope["url_route"]["kwargs"]["driver_id"]
+        if await self.authorize(DRIVER, driver_id) is None:
+            return
+
         try:
-            print("WS CONNECT attempt")
-            self.driver_id = self.scope["url_route"]["kwargs"]["driver_id"]
+            self.driver_id = driver_id
             self.group_name = f"driver_{self.driver_id}"
+            self.conn = secrets.randbits(63)   # presence: this socket's touches
 
-            print(f"Driver #{self.driver_id} connecting")
-            await self.channel_layer.group_add(self.group_name, self.channel_name)
+            await self.join(self.group_name)
+            ensure_flush_loop()
+            get_presence().touch(int(self.driver_id), conn=self.conn)
+            ensure_reconcile_loop()
 
             await self.accept()
-            print(f"WS ACCEPTED for {self.group_name}")
+            logger.info("driver %s connected", self.driver_id)
 
             # Optional welcome message
             await self.send(json.dumps({
@@ -23,14 +121,16 @@ class DriverRideConsumer(AsyncWebsocketConsumer):
                 "message": "WebSocket connected successfully."
             }))
 
-        except Exception as e:
-            print("WS connection error:", e)
+        except Exception:
+            logger.exception("driver %s: WebSocket connect failed", getattr(self, "driver_id", "?"))
             await self.close()
 
     async def disconnect(self, close_code):
-        print(f"WS DISCONNECTED for driver {getattr(self, 'driver_id', 'UNKNOWN')}")
+        logger.info("driver %s disconnected (%s)", getattr(self, "driver_id", "?"), close_code)
+        if hasattr(self, "driver_id"):
+            get_presence().leave(int(self.driver_id), conn=self.conn)
         try:
-            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            await self.leave(self.group_name)
         except:
             pass  # already disconnected safely
 
@@ -39,20 +139,76 @@ class DriverRideConsumer(AsyncWebsocketConsumer):
         try:
             if text_data:
                 data = json.loads(text_data)
-                print("Message from driver:", data)
+                logger.debug("driver %s sent %s", self.driver_id, data.get("event"))
 
-                # Example: driver sends current location
                 if data.get("event") == "PING":
+                    get_presence().touch(int(self.driver_id), conn=self.conn)
                     await self.send(json.dumps({"event": "PONG"}))
 
+                # Driver streams its current position; written to DB in batches
+                elif data.get("event") == "LOCATION":
+                    lat = float(data["latitude"])
+                    lng = float(data["longitude"])
+                    if -90 <= lat <= 90 and -180 <= lng <= 180:
+                        location_buffer.record(int(self.driver_id), lat, lng)
+                        get_presence().touch(int(self.driver_id), conn=self.conn)
+
         except Exception as e:
-            print("Error receiving driver message:", e)
+            get_consumer_metrics().add(self.metrics_key, "errors")
+            logger.warning("driver %s: bad message: %s", self.driver_id, e)
 
     async def new_ride(self, event):
         """Send ride assignment to driver."""
-        print("Sending ride event:", event)
-
-        # Remove internal 'type' field
+        # Remove internal fields
         event.pop("type", None)
+        assigned_at = event.pop("assigned_at", None)
 
         await self.send(text_data=json.dumps(event))
+        if assigned_at is not None:
+            get_consumer_metrics().fanout(self.metrics_key, max(time.time() - assigned_at, 0.0))
+        logger.info("ride %s sent to driver %s", event.get("ride_id"), self.driver_id)
+
+
+# ----------------------------------------------------------
+# ADMIN DASHBOARD FEED
+# ----------------------------------------------------------
+class AdminFeedConsumer(InstrumentedConsumer):
+    """Pushes ride_changed / driver_changed events to the admin dashboard."""
+
+    async def connect(self):
+        if await self.authorize(ADMIN) is None:
+            return
+
+        await self.join(ADMIN_FEED_GROUP)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.leave(ADMIN_FEED_GROUP)
+
+    async def ride_changed(self, event):
+        await self.send(text_data=json.dumps({"event": "RIDE_CHANGED", "ride": event["ride"]}))
+
+    async def driver_changed(self, event):
+        await self.send(text_data=json.dumps({"event": "DRIVER_CHANGED", "driver": event["driver"]}))
+
+
+# ----------------------------------------------------------
+# CUSTOMER RIDE UPDATES
+# ----------------------------------------------------------
+class CustomerRideConsumer(InstrumentedConsumer):
+    """Pushes ride_changed events for one customer's rides."""
+
+    async def connect(self):
+        self.customer_id = self.scope["url_route"]["kwargs"]["customer_id"]
+        self.group_name = f"customer_{self.customer_id}"
+        if await self.authorize(CUSTOMER, self.customer_id) is None:
+            return
+
+        await self.join(self.group_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.leave(self.group_name)
+
+    async def ride_changed(self, event):
+        await self.send(text_data=json.dumps({"event": "RIDE_CHANGED", "ride": event["ride"]}))
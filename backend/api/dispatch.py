@@ -0,0 +1,248 @@
+"""
+Batch dispatch engine.
+
+Every cycle takes the oldest REQUESTED rides, looks up each one's nearest
+available drivers in the spatial index, builds one pickup-to-driver cost
+matrix over those candidates with NumPy and solves the whole assignment at
+once; the matrix is at most DISPATCH_MAX_RIDES x DISPATCH_MAX_DRIVERS
+however big the fleet is. The winning pairs are committed in a single
+transaction together with one outbox job that notifies each driver through
+its driver_{id} group, exactly like a manual AssignDriverToRide.
+"""
+import asyncio
+import logging
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups, sync
+from .geo import driver_index, get_driver_index
+from .models import Driver, RideRequest
+from .notifications import (
+    DRIVER_FEED_FIELDS, driver_changed_sends, new_ride_sends, publish, ride_changed_sends,
+)
+from .presence import get_presence
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy is optional, greedy works without it
+    linear_sum_assignment = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------
+# CANDIDATES (COST MATRIX)
+# ----------------------------------------------------------
+def candidate_matrix(rides, radius_km, per_ride, max_drivers):
+    """
+    (ride indexes, driver ids, distances) for rides [(id, lat, lng)]: each
+    ride's per_ride nearest online drivers within radius_km, from the
+    spatial index, at most max_drivers in all (earliest rides first).
+    Pairs that are not candidates cost inf.
+    """
+    index = get_driver_index()
+    presence = get_presence()
+
+    columns = {}        # driver id -> column
+    entries = []        # (row, column, km)
+    rows = []
+    for i, (_, lat, lng) in enumerate(rides):
+        matches = index.nearest(lat, lng, k=per_ride, radius_km=radius_km)
+        offline = presence.offline_mask([driver_id for driver_id, _ in matches])
+        row = len(rows)
+        for (driver_id, km), gone in zip(matches, offline):
+            if gone:
+                continue
+            if driver_id not in columns:
+                if len(columns) >= max_drivers:
+                    continue
+                columns[driver_id] = len(columns)
+            entries.append((row, columns[driver_id], km))
+        if entries and entries[-1][0] == row:
+            rows.append(i)
+
+    dist = np.full((len(rows), len(columns)), np.inf)
+    for row, column, km in entries:
+        dist[row, column] = km
+    return rows, list(columns), dist
+
+
+# ----------------------------------------------------------
+# SOLVERS
+# ----------------------------------------------------------
+def solve_greedy(dist, max_km=None):
+    """Repeatedly take the globally shortest free (ride, driver) pair (inf = not allowed)."""
+    if dist.size == 0:
+        return []
+
+    flat = np.argsort(dist, axis=None, kind="stable")
+    rows, cols = np.unravel_index(flat, dist.shape)
+
+    used_rows, used_cols = set(), set()
+    pairs = []
+    limit = min(dist.shape)
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        if not np.isfinite(dist[r, c]) or (max_km is not None and dist[r, c] > max_km):
+            break
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        pairs.append((r, c))
+        if len(pairs) == limit:
+            break
+    return pairs
+
+
+def solve_hungarian(dist, max_km=None):
+    """Minimum total pickup distance (needs scipy, else falls back to greedy)."""
+    if linear_sum_assignment is None:
+        return solve_greedy(dist, max_km)
+    if dist.size == 0:
+        return []
+
+    allowed = np.isfinite(dist)
+    if max_km is not None:
+        allowed &= dist <= max_km
+    cost = np.where(allowed, dist, 1e9)
+
+    rows, cols = linear_sum_assignment(cost)
+    return [(r, c) for r, c in zip(rows.tolist(), cols.tolist()) if allowed[r, c]]
+
+
+SOLVERS = {
+    "greedy": solve_greedy,
+    "hungarian": solve_hungarian,
+}
+
+
+# ----------------------------------------------------------
+# DISPATCH CYCLE
+# ----------------------------------------------------------
+def run_dispatch_cycle(solver=None, max_pickup_km=None, max_rides=None):
+    """Assign as many waiting rides as possible. Returns [(ride_id, driver_id)]."""
+    solver = solver or getattr(settings, "DISPATCH_SOLVER", "greedy")
+    if max_pickup_km is None:
+        max_pickup_km = getattr(settings, "DISPATCH_MAX_PICKUP_KM", None)
+    max_rides = max_rides or getattr(settings, "DISPATCH_MAX_RIDES", 1000)
+
+    rides = list(
+        RideRequest.objects.filter(
+            status="REQUESTED",
+            driver__isnull=True,
+            pickup_lat__isnull=False,
+            pickup_lng__isnull=False,
+        ).order_by("created_at").values_list("id", "pickup_lat", "pickup_lng")[:max_rides]
+    )
+    if not rides:
+        return []
+
+    radius_km = max_pickup_km if max_pickup_km is not None else getattr(settings, "DISPATCH_RADIUS_KM", 25)
+    rows, drivers, dist = candidate_matrix(
+        rides, radius_km,
+        per_ride=getattr(settings, "DISPATCH_CANDIDATES_PER_RIDE", 8),
+        max_drivers=getattr(settings, "DISPATCH_MAX_DRIVERS", 2000),
+    )
+    if not drivers:
+        return []
+
+    pairs = SOLVERS[solver](dist, max_pickup_km)
+    if not pairs:
+        return []
+
+    proposed = {rides[rows[r]][0]: drivers[c] for r, c in pairs}
+    return commit_assignments(proposed)
+
+
+def commit_assignments(proposed):
+    """Commit {ride_id: driver_id} in one transaction, skipping stale pairs."""
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Lock and re-check both sides: a manual assign or a driver going
+        # offline may have happened since the matrix was built.
+        free_drivers = set(
+            Driver.objects.select_for_update()
+            .filter(id__in=proposed.values(), is_available=True, approval_status="APPROVED")
+            .values_list("id", flat=True)
+        )
+        rides = list(
+            RideRequest.objects.select_for_update()
+            .filter(id__in=proposed.keys(), status="REQUESTED", driver__isnull=True)
+        )
+
+        assigned = []
+        for ride in rides:
+            driver_id = proposed[ride.id]
+            if driver_id not in free_drivers:
+                continue
+            ride.driver_id = driver_id
+            ride.status = "ASSIGNED"
+            ride.assigned_at = now
+            ride.updated_at = now
+            assigned.append(ride)
+
+        if not assigned:
+            return []
+
+        RideRequest.objects.bulk_update(assigned, ["driver", "status", "assigned_at", "updated_at"])
+        rollups.record(*(rollups.assigned_deltas(ride.created_at, now) for ride in assigned))
+        Driver.objects.filter(id__in=[r.driver_id for r in assigned]).update(
+            is_available=False, updated_at=now
+        )
+        sync.bump(sync.DRIVERS_SCOPE, *{s for ride in assigned for s in sync.ride_scopes(ride)})
+
+        # One outbox job for the whole cycle, committed with the assignments
+        drivers = Driver.objects.filter(id__in=[r.driver_id for r in assigned]).only(*DRIVER_FEED_FIELDS)
+        publish(
+            *(new_ride_sends(ride) + ride_changed_sends(ride) for ride in assigned),
+            *(driver_changed_sends(driver) for driver in drivers),
+        )
+
+        def after_commit():
+            for ride in assigned:
+                driver_index.remove(ride.driver_id)
+
+        transaction.on_commit(after_commit)
+
+    return [(ride.id, ride.driver_id) for ride in assigned]
+
+
+# ----------------------------------------------------------
+# LONG-RUNNING LOOP (ASGI PROCESS OR MANAGEMENT COMMAND)
+# ----------------------------------------------------------
+async def dispatch_loop(interval=None, **options):
+    interval = interval or getattr(settings, "DISPATCH_INTERVAL_SECONDS", 5)
+    while True:
+        try:
+            assigned = await sync_to_async(run_dispatch_cycle)(**options)
+            if assigned:
+                logger.info("dispatch assigned %d rides", len(assigned))
+        except Exception:
+            logger.exception("dispatch cycle failed")
+        await asyncio.sleep(interval)
+
+
+_loop_task = None
+
+
+def ensure_dispatch_loop():
+    """Start the dispatch loop on the running event loop, once per process."""
+    global _loop_task
+    if _loop_task is None and getattr(settings, "DISPATCH_LOOP_ENABLED", False):
+        _loop_task = asyncio.get_running_loop().create_task(dispatch_loop())
+    return _loop_task
+
+
+def with_dispatch_loop(app):
+    """Wrap an ASGI application so the dispatch loop starts with the first connection."""
+    async def application(scope, receive, send):
+        ensure_dispatch_loop()
+        return await app(scope, receive, send)
+
+    return application
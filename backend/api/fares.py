@@ -0,0 +1,144 @@
+"""
+Server-side fare quotes.
+
+    fare = max(minimum, (base + per_km * km + per_minute * minutes) * multiplier)
+
+km is the great-circle distance times the tariff's road_factor (roads are
+longer than the straight line); minutes assume avg_speed_kmh. multiplier
+comes from the time-of-day bands, by the local hour in FARE_TIME_ZONE.
+
+The tariff in settings.FARE_TARIFF is compiled once into a 24-slot
+multiplier table and reused until the setting changes. quote() prices any
+number of pickup/drop pairs in one vectorized NumPy pass; a single ride is
+just a batch of one.
+"""
+from datetime import datetime
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from .geo import EARTH_RADIUS_KM
+
+
+DEFAULT_TARIFF = {
+    "base": 50.0,
+    "per_km": 12.0,
+    "per_minute": 1.5,
+    "minimum": 80.0,
+    "road_factor": 1.3,
+    "avg_speed_kmh": 25.0,
+    "time_of_day": [],
+}
+
+
+# ----------------------------------------------------------
+# DISTANCE
+# ----------------------------------------------------------
+def haversine_pairs(origins, targets):
+    """(N, 2) and (N, 2) lat/lng arrays -> (N,) distances in km, row by row."""
+    origins = np.radians(np.asarray(origins, dtype=np.float64))
+    targets = np.radians(np.asarray(targets, dtype=np.float64))
+
+    lat1, lng1 = origins[:, 0], origins[:, 1]
+    lat2, lng2 = targets[:, 0], targets[:, 1]
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+# ----------------------------------------------------------
+# TARIFF
+# ----------------------------------------------------------
+class Tariff:
+    def __init__(self, config):
+        self.config = config
+        merged = {**DEFAULT_TARIFF, **config}
+
+        self.base = float(merged["base"])
+        self.per_km = float(merged["per_km"])
+        self.per_minute = float(merged["per_minute"])
+        self.minimum = float(merged["minimum"])
+        self.road_factor = float(merged["road_factor"])
+        self.avg_speed_kmh = float(merged["avg_speed_kmh"])
+
+        # (from_hour, to_hour, multiplier) bands, to_hour exclusive; a band
+        # with from_hour > to_hour runs past midnight. The last matching
+        # band wins
+        self.hour_multipliers = np.ones(24)
+        for from_hour, to_hour, multiplier in merged["time_of_day"]:
+            if not (0 <= from_hour <= 24 and 0 <= to_hour <= 24):
+                raise ImproperlyConfigured(
+                    f"FARE_TARIFF time_of_day band {(from_hour, to_hour, multiplier)}: hours must be 0-24"
+                )
+            if from_hour > to_hour:
+                self.hour_multipliers[from_hour:] = multiplier
+                self.hour_multipliers[:to_hour] = multiplier
+            else:
+                self.hour_multipliers[from_hour:to_hour] = multiplier
+
+    def multiplier_at(self, when):
+        zone = ZoneInfo(getattr(settings, "FARE_TIME_ZONE", settings.TIME_ZONE))
+        return float(self.hour_multipliers[when.astimezone(zone).hour])
+
+    def quote(self, pickups, drops, when=None):
+        """Price N pickup/drop pairs. Returns a dict of (N,) arrays plus the multiplier."""
+        multiplier = self.multiplier_at(when or timezone.now())
+
+        km = haversine_pairs(pickups, drops) * self.road_factor
+        minutes = km / self.avg_speed_kmh * 60
+        fare = (self.base + self.per_km * km + self.per_minute * minutes) * multiplier
+        fare = np.maximum(fare, self.minimum)
+
+        return {
+            "multiplier": multiplier,
+            "distance_km": np.round(km, 2),
+            "duration_min": np.round(minutes, 1),
+            "fare": np.round(fare, 2),
+        }
+
+
+_tariff = None
+
+
+def get_tariff():
+    """The compiled tariff, rebuilt if settings.FARE_TARIFF changed."""
+    global _tariff
+    config = getattr(settings, "FARE_TARIFF", DEFAULT_TARIFF)
+    if _tariff is None or _tariff.config != config:
+        _tariff = Tariff(config)
+    return _tariff
+
+
+# ----------------------------------------------------------
+# ENTRY POINTS
+# ----------------------------------------------------------
+def quote_pairs(pairs, when=None):
+    """pairs: (N, 4) rows of pickup_lat, pickup_lng, drop_lat, drop_lng."""
+    pairs = np.asarray(pairs, dtype=np.float64).reshape(-1, 4)
+    return get_tariff().quote(pairs[:, 0:2], pairs[:, 2:4], when)
+
+
+def quote_ride(pickup_lat, pickup_lng, drop_lat, drop_lng, when=None):
+    """Estimated fare of one ride as a Decimal, or None without coordinates."""
+    coords = (pickup_lat, pickup_lng, drop_lat, drop_lng)
+    if any(value is None for value in coords):
+        return None
+    fare = quote_pairs([[float(value) for value in coords]], when)["fare"][0]
+    return Decimal(f"{fare:.2f}")
+
+
+def parse_when(value):
+    """Optional quote time: ISO 8601, naive means the server time zone."""
+    if not value:
+        return None
+    when = datetime.fromisoformat(value)
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
@@ -0,0 +1,225 @@
+"""
+Geo helpers and the in-process spatial index of available drivers.
+
+The index is a uniform lat/lng grid: every available, approved driver with a
+known position sits in exactly one cell, so a k-nearest lookup only has to
+look at the few cells around the pickup point instead of the whole fleet.
+
+Each process has its own index. Saves in the same process are mirrored
+into it right away (sync_driver). Changes made anywhere else (other
+workers, dispatch, presence reconcile, location flushes, admin bulk
+actions) bump the drivers sync version; when that moves, get_driver_index()
+reads only the drivers whose updated_at changed since, like a ?since=
+client. Deleted drivers leave no row behind, so deletes bump their own
+version, which reloads the whole index.
+"""
+import heapq
+import math
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+# ----------------------------------------------------------
+# DISTANCE
+# ----------------------------------------------------------
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# ----------------------------------------------------------
+# DRIVER SPATIAL INDEX
+# ----------------------------------------------------------
+class DriverSpatialIndex:
+    """Uniform grid over driver positions with k-nearest lookup."""
+
+    def __init__(self, cell_deg=0.01):
+        self.cell_deg = cell_deg
+        self._cells = {}        # (row, col) -> {driver_id: (lat, lng)}
+        self._positions = {}    # driver_id -> (lat, lng, (row, col))
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.version = None     # drivers sync version the rows were read under
+        self.deletes_version = None
+        self.refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    # ---------- WRITES ----------
+    def upsert(self, driver_id, lat, lng):
+        lat, lng = float(lat), float(lng)
+        cell = self._cell(lat, lng)
+
+        with self._lock:
+            old = self._positions.get(driver_id)
+            if old is not None and old[2] != cell:
+                self._discard(driver_id, old[2])
+
+            self._cells.setdefault(cell, {})[driver_id] = (lat, lng)
+            self._positions[driver_id] = (lat, lng, cell)
+
+    def move(self, driver_id, lat, lng):
+        """Update the position of a driver that is already indexed."""
+        if driver_id in self._positions:
+            self.upsert(driver_id, lat, lng)
+
+    def remove(self, driver_id):
+        with self._lock:
+            old = self._positions.pop(driver_id, None)
+            if old is not None:
+                self._discard(driver_id, old[2])
+
+    def _discard(self, driver_id, cell):
+        members = self._cells.get(cell)
+        if members is None:
+            return
+        members.pop(driver_id, None)
+        if not members:
+            del self._cells[cell]
+
+    def sync_driver(self, driver):
+        """Mirror a Driver row into the index after it was saved."""
+        if not self.loaded:
+            return  # the next load() reads the row from the DB anyway
+
+        self._apply(
+            driver.id, driver.is_available, driver.approval_status, driver.latitude, driver.longitude
+        )
+
+    def _apply(self, driver_id, is_available, approval_status, lat, lng):
+        if is_available and approval_status == "APPROVED" and lat is not None and lng is not None:
+            self.upsert(driver_id, lat, lng)
+        else:
+            self.remove(driver_id)
+
+    def load(self, rows, version=None, deletes_version=None):
+        """Replace the whole index with (driver_id, lat, lng) rows."""
+        with self._lock:
+            self._cells = {}
+            self._positions = {}
+            for driver_id, lat, lng in rows:
+                self.upsert(driver_id, lat, lng)
+            self.loaded = True
+            self.version = version
+            self.deletes_version = deletes_version
+
+    def apply(self, rows, version=None):
+        """Mirror changed (driver_id, is_available, approval_status, lat, lng) rows."""
+        with self._lock:
+            for row in rows:
+                self._apply(*row)
+            self.version = version
+
+    def invalidate(self):
+        """Force a full reload on next use."""
+        with self._lock:
+            self.loaded = False
+
+    # ---------- READS ----------
+    def nearest(self, lat, lng, k=10, radius_km=5.0):
+        """Return up to k (driver_id, distance_km) pairs within radius_km."""
+        lat, lng = float(lat), float(lng)
+        row, col = self._cell(lat, lng)
+
+        # Smallest side of a cell in km, taken at the widest latitude the
+        # search can reach so the ring lower bound below is never too big.
+        reach_deg = radius_km / KM_PER_DEG_LAT
+        cos_lat = max(0.01, math.cos(math.radians(min(89.9, abs(lat) + reach_deg))))
+        cell_km = self.cell_deg * KM_PER_DEG_LAT * cos_lat
+        max_ring = int(radius_km / cell_km) + 1
+
+        with self._lock:
+            if (2 * max_ring + 1) ** 2 > len(self._cells):
+                # Sparse fleet: scanning occupied cells is cheaper than rings.
+                candidates = (
+                    (haversine_km(lat, lng, d_lat, d_lng), driver_id)
+                    for members in self._cells.values()
+                    for driver_id, (d_lat, d_lng) in members.items()
+                )
+                found = [c for c in candidates if c[0] <= radius_km]
+                return [(d, dist) for dist, d in heapq.nsmallest(k, found)]
+
+            found = []
+            for ring in range(max_ring + 1):
+                # Every point in this ring is at least (ring - 1) cells away.
+                if len(found) >= k:
+                    kth = heapq.nsmallest(k, found)[-1][0]
+                    if kth <= (ring - 1) * cell_km:
+                        break
+
+                for cell in self._ring_cells(row, col, ring):
+                    for driver_id, (d_lat, d_lng) in self._cells.get(cell, {}).items():
+                        dist = haversine_km(lat, lng, d_lat, d_lng)
+                        if dist <= radius_km:
+                            found.append((dist, driver_id))
+
+        return [(d, dist) for dist, d in heapq.nsmallest(k, found)]
+
+    @staticmethod
+    def _ring_cells(row, col, ring):
+        if ring == 0:
+            yield (row, col)
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield (row - ring, c)
+            yield (row + ring, c)
+        for r in range(row - ring + 1, row + ring):
+            yield (r, col - ring)
+            yield (r, col + ring)
+
+
+driver_index = DriverSpatialIndex(
+    cell_deg=getattr(settings, "DRIVER_INDEX_CELL_DEG", 0.01)
+)
+
+
+def get_driver_index():
+    """
+    Return the process-wide index, brought up to date with the DB: a full
+    load the first time and after deletes, else the drivers changed since.
+    """
+    from . import sync
+    from .models import Driver
+
+    # Read before the rows, as for ETags: a change in between is read again next time
+    versions = sync.get_versions(sync.DRIVERS_SCOPE, sync.DRIVER_DELETES_SCOPE)
+    version, deletes_version = versions[sync.DRIVERS_SCOPE], versions[sync.DRIVER_DELETES_SCOPE]
+    if driver_index.loaded and (version, deletes_version) == (
+        driver_index.version, driver_index.deletes_version
+    ):
+        return driver_index
+
+    with driver_index.refresh_lock:
+        if not driver_index.loaded or driver_index.deletes_version != deletes_version:
+            rows = Driver.objects.filter(
+                is_available=True,
+                approval_status="APPROVED",
+                latitude__isnull=False,
+                longitude__isnull=False,
+            ).values_list("id", "latitude", "longitude")
+            driver_index.load(list(rows), version, deletes_version)
+        elif driver_index.version != version:
+            # updated_at is stamped before commit, the version after it
+            overlap = timedelta(seconds=getattr(settings, "SYNC_SINCE_OVERLAP_SECONDS", 5))
+            since = datetime.fromtimestamp(driver_index.version / 1e9, tz=dt_timezone.utc) - overlap
+            rows = Driver.objects.filter(updated_at__gt=since).values_list(
+                "id", "is_available", "approval_status", "latitude", "longitude"
+            )
+            driver_index.apply(list(rows), version)
+
+    return driver_index
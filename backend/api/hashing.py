@@ -0,0 +1,127 @@
+"""
+Password hashing off the request thread.
+
+PBKDF2 is deliberately slow CPU work. Done inline, a burst of logins
+holds every worker thread (and, in async views, the event loop) and
+starves all other endpoints. HashingPool runs check_password /
+make_password in a small process pool and caps how many calls may wait
+for it: past PASSWORD_HASH_MAX_PENDING the caller gets 429 at once
+instead of queueing behind the burst.
+
+PASSWORD_HASH_WORKERS = 0 hashes inline (tests, single-user dev).
+
+Bulk imports hash thousands of passwords at once and use their own pool,
+bulk_hasher(), sized to the CPUs of the machine running the import.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework.exceptions import Throttled
+
+
+class HashingBusy(Throttled):
+    default_detail = "Too many logins in progress, try again shortly."
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+
+
+def _new_executor(workers):
+    return ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", ""),),
+    )
+
+
+class HashingPool:
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = _new_executor(self.workers)
+            return self._executor
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HashingBusy(wait=1)
+            self._pending += 1
+
+        try:
+            if not self.workers:
+                return func(*args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pool = None
+
+
+def get_hashing_pool():
+    """The process-wide pool, rebuilt if the settings changed."""
+    global _pool
+    workers = getattr(settings, "PASSWORD_HASH_WORKERS", 2)
+    max_pending = getattr(settings, "PASSWORD_HASH_MAX_PENDING", 64)
+
+    if _pool is None or (_pool.workers, _pool.max_pending) != (workers, max_pending):
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = HashingPool(workers, max_pending)
+    return _pool
+
+
+async def acheck_password(password, encoded):
+    return await get_hashing_pool().run(check_password, password, encoded)
+
+
+async def amake_password(password):
+    return await get_hashing_pool().run(make_password, password)
+
+
+# ----------------------------------------------------------
+# BULK IMPORTS
+# ----------------------------------------------------------
+@contextmanager
+def bulk_hasher(workers):
+    """
+    Yields hash(passwords) -> [encoded], spreading each call over
+    `workers` processes (0 = inline). No pending cap: the import is the
+    only caller.
+    """
+    if not workers:
+        yield lambda passwords: [make_password(p) for p in passwords]
+        return
+
+    with _new_executor(workers) as executor:
+        def hash_all(passwords):
+            chunksize = max(1, len(passwords) // (workers * 4))
+            return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+        yield hash_all
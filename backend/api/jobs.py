@@ -0,0 +1,261 @@
+"""
+Background jobs with a durable outbox.
+
+enqueue() writes an OutboxJob row in the caller's transaction, so a job
+exists exactly when the change that caused it committed, and wakes the
+JobRunner once that transaction commits. The runner is an asyncio task on
+the ASGI server's event loop (started with the first connection, like the
+dispatch loop) or `manage.py run_jobs`. It claims due rows with a
+conditional UPDATE, runs at most JOBS_CONCURRENCY handlers at a time and
+retries failures with exponential backoff. A job left RUNNING by a dead
+process is reclaimed when its lease runs out, so several workers can poll
+the same table and every job runs at least once.
+
+JOBS_CONCURRENCY = 0 runs each job inline right after commit (tests, dev).
+"""
+import asyncio
+import logging
+import traceback
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import OutboxJob
+
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------
+# REGISTRY
+# ----------------------------------------------------------
+JOBS = {}
+
+
+def job(name):
+    """Register a handler (sync or async), called with the payload as kwargs."""
+    def register(func):
+        JOBS[name] = func
+        return func
+    return register
+
+
+# ----------------------------------------------------------
+# ENQUEUE
+# ----------------------------------------------------------
+def enqueue(name, **payload):
+    """Queue a job in the current transaction; it runs after commit."""
+    if name not in JOBS:
+        raise KeyError(f"unknown job {name!r}")
+    outbox_job = OutboxJob.objects.create(name=name, payload=payload)
+    transaction.on_commit(lambda: job_runner.submitted(outbox_job))
+    return outbox_job
+
+
+async def aenqueue(name, **payload):
+    """enqueue() for async views, which run in autocommit."""
+    if name not in JOBS:
+        raise KeyError(f"unknown job {name!r}")
+    outbox_job = await OutboxJob.objects.acreate(name=name, payload=payload)
+    await job_runner.asubmitted(outbox_job)
+    return outbox_job
+
+
+# ----------------------------------------------------------
+# RUNNER
+# ----------------------------------------------------------
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def retry_delay(attempts):
+    """Seconds before retry number `attempts`: base, 2x base, 4x base, ..."""
+    return _setting("JOBS_RETRY_BASE_SECONDS", 2) * 2 ** (attempts - 1)
+
+
+class JobRunner:
+
+    def __init__(self, concurrency=None):
+        self._concurrency = concurrency   # None = JOBS_CONCURRENCY
+        self._loop = None
+        self._task = None
+        self._wake = None
+        self._in_flight = set()
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def concurrency(self):
+        if self._concurrency is not None:
+            return self._concurrency
+        return _setting("JOBS_CONCURRENCY", 4)
+
+    # ---------- DATABASE SIDE (sync, run via sync_to_async) ----------
+    def claim_due(self, limit):
+        """Take up to `limit` due jobs. Returns [(id, name, payload, attempts)]."""
+        now = timezone.now()
+        lease = now + timedelta(seconds=_setting("JOBS_LEASE_SECONDS", 60))
+        due = (
+            OutboxJob.objects
+            .filter(status__in=("PENDING", "RUNNING"), run_after__lte=now)
+            .order_by("run_after")
+            .values_list("id", "name", "payload", "attempts")[:limit]
+        )
+
+        claimed = []
+        for job_id, name, payload, attempts in due:
+            # attempts doubles as a version: only one runner wins the row
+            won = OutboxJob.objects.filter(id=job_id, attempts=attempts).update(
+                status="RUNNING", attempts=attempts + 1, run_after=lease
+            )
+            if won:
+                claimed.append((job_id, name, payload, attempts + 1))
+        return claimed
+
+    def claim(self, job_id):
+        """Claim one specific fresh job (inline runs)."""
+        lease = timezone.now() + timedelta(seconds=_setting("JOBS_LEASE_SECONDS", 60))
+        won = OutboxJob.objects.filter(id=job_id, status="PENDING", attempts=0).update(
+            status="RUNNING", attempts=F("attempts") + 1, run_after=lease
+        )
+        return bool(won)
+
+    def finish(self, job_id, attempts, error=None):
+        mine = OutboxJob.objects.filter(id=job_id, attempts=attempts)
+        if error is None:
+            mine.delete()
+            self.completed += 1
+        elif attempts < _setting("JOBS_MAX_ATTEMPTS", 5):
+            mine.update(
+                status="PENDING", last_error=error,
+                run_after=timezone.now() + timedelta(seconds=retry_delay(attempts)),
+            )
+            self.retried += 1
+        else:
+            mine.update(status="FAILED", last_error=error)
+            self.failed += 1
+
+    # ---------- EXECUTION ----------
+    async def execute(self, job_id, name, payload, attempts):
+        error = None
+        try:
+            handler = JOBS[name]
+            if asyncio.iscoroutinefunction(handler):
+                await handler(**payload)
+            else:
+                await sync_to_async(handler)(**payload)
+        except Exception:
+            logger.exception("job %s #%s failed (attempt %d)", name, job_id, attempts)
+            error = traceback.format_exc(limit=5)
+        await sync_to_async(self.finish)(job_id, attempts, error)
+
+    async def run_due(self):
+        """Claim as many due jobs as there are free slots and start them."""
+        free = self.concurrency - len(self._in_flight)
+        if free <= 0:
+            return 0
+        claimed = await sync_to_async(self.claim_due)(free)
+        for args in claimed:
+            self._spawn(self.execute(*args))
+        return len(claimed)
+
+    def _spawn(self, coro):
+        task = self._loop.create_task(coro)
+        self._in_flight.add(task)
+        task.add_done_callback(self._done)
+
+    def _done(self, task):
+        self._in_flight.discard(task)
+        self._wake.set()   # a slot is free
+
+    async def serve(self):
+        poll = _setting("JOBS_POLL_SECONDS", 5)
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_due()
+            except Exception:
+                logger.exception("job runner poll failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), poll)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain(self):
+        """Run every job that is due now, then return (run_jobs --once)."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        while True:
+            await self.run_due()
+            if not self._in_flight:
+                return
+            await asyncio.wait(set(self._in_flight), return_when=asyncio.FIRST_COMPLETED)
+
+    def ensure_started(self):
+        """Start serving on the running event loop, once per process."""
+        if self._task is None and self.concurrency:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = self._loop.create_task(self.serve())
+        return self._task
+
+    # ---------- WAKE-UPS ----------
+    def submitted(self, outbox_job):
+        """on_commit hook of enqueue()."""
+        if not self.concurrency:
+            if self.claim(outbox_job.id):
+                async_to_sync(self.execute)(outbox_job.id, outbox_job.name, outbox_job.payload, 1)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        # else: no runner in this process yet, the next poll picks it up
+
+    async def asubmitted(self, outbox_job):
+        if not self.concurrency:
+            if await sync_to_async(self.claim)(outbox_job.id):
+                await self.execute(outbox_job.id, outbox_job.name, outbox_job.payload, 1)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # ---------- METRICS ----------
+    def stats(self):
+        """Queue depth by status from the outbox, plus this process's counters."""
+        rows = OutboxJob.objects.values("status").annotate(n=Count("id"), oldest=Min("created_at"))
+        depth = {status: 0 for status, _ in OutboxJob.STATUS_CHOICES}
+        oldest = None
+        for row in rows:
+            depth[row["status"]] = row["n"]
+            if row["status"] == "PENDING":
+                oldest = row["oldest"]
+
+        return {
+            "pending": depth["PENDING"],
+            "running": depth["RUNNING"],
+            "failed": depth["FAILED"],
+            "oldest_pending_seconds": (
+                round((timezone.now() - oldest).total_seconds(), 1) if oldest else None
+            ),
+            "process": {
+                "concurrency": self.concurrency,
+                "in_flight": len(self._in_flight),
+                "completed": self.completed,
+                "retried": self.retried,
+                "failed": self.failed,
+            },
+        }
+
+
+job_runner = JobRunner()
+
+
+def with_job_runner(app):
+    """Wrap an ASGI application so the job runner starts with the first connection."""
+    async def application(scope, receive, send):
+        job_runner.ensure_started()
+        return await app(scope, receive, send)
+
+    return application
@@ -0,0 +1,110 @@
+"""
+Pre-rendered JSON for the driver lists (rides/available-drivers/, drivers/).
+
+Bodies are cached per sync version of their scope (api/sync.py). Every
+write that changes drivers already bumps DRIVERS_SCOPE: the post_save /
+post_delete signals, the bulk updates of the approve / reject admin
+actions, assignment, dispatch, presence and location flushes. A bump is
+therefore the invalidation, and no body is ever served for a version other
+than the one it was built under. The version is read before the rows, as
+for ETags: a change landing in between is cached under the old version and
+replaced at the next bump.
+
+Two tiers: a bounded per-process LRU (LIST_CACHE_LOCAL_ENTRIES) in front of
+CACHES["default"], which every worker shares. Bodies of old versions are
+never deleted; they fall out of the LRU and expire from the shared cache
+after LIST_CACHE_TIMEOUT.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+from .renderers import ORJSONRenderer
+
+
+KEY = "listcache:{}:{}:{}"
+
+
+class LocalLRU:
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = None
+
+
+def get_local_cache():
+    """This process' LRU tier, rebuilt if the settings changed."""
+    global _local
+    max_entries = getattr(settings, "LIST_CACHE_LOCAL_ENTRIES", 128)
+    if _local is None or _local.max_entries != max_entries:
+        _local = LocalLRU(max_entries)
+    return _local
+
+
+def cached(scope, version, variant, build):
+    """build()'s result for (scope, version, variant), from the LRU, the shared cache or build()."""
+    key = KEY.format(scope, version, hashlib.md5(variant.encode()).hexdigest())
+    local = get_local_cache()
+    value = local.get(key)
+    if value is None:
+        value = cache.get(key)
+        if value is None:
+            value = build()
+            cache.set(key, value, getattr(settings, "LIST_CACHE_TIMEOUT", 300))
+        local.set(key, value)
+    return value
+
+
+# ----------------------------------------------------------
+# JSON BODIES
+# ----------------------------------------------------------
+_renderer = ORJSONRenderer()
+
+
+def render(data):
+    return _renderer.render(data)
+
+
+def render_rows(serializer, queryset):
+    """(ids, one JSON fragment per row) of a ValuesListSerializer's rows, to filter before joining."""
+    rows = list(serializer.rows(queryset))
+    return [row[0] for row in rows], [render(data) for data in serializer.serialize(rows)]
+
+
+def join_rows(name, fragments):
+    return b'{"' + name.encode() + b'":[' + b",".join(fragments) + b"]}"
+
+
+def response(request, body):
+    """body as is for JSON clients; decoded again for the browsable API."""
+    if request.accepted_renderer.format == "json":
+        return HttpResponse(body, content_type="application/json")
+    return Response(json.loads(body))
@@ -0,0 +1,93 @@
+"""
+Last-known driver positions streamed over the WebSocket.
+
+Positions are kept in memory and written back in one bulk_update every
+DRIVER_LOCATION_FLUSH_SECONDS, so a ping from every driver costs one
+UPDATE per flush instead of one full row save per ping.
+"""
+import asyncio
+import logging
+import threading
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .geo import driver_index
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocationBuffer:
+    def __init__(self):
+        self._positions = {}   # driver_id -> (lat, lng), latest wins
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def record(self, driver_id, lat, lng):
+        with self._lock:
+            self._positions[driver_id] = (lat, lng)
+        driver_index.move(driver_id, lat, lng)
+
+    def discard(self, driver_id):
+        """Drop a pending position (a newer one was written directly)."""
+        with self._lock:
+            self._positions.pop(driver_id, None)
+
+    def drain(self):
+        with self._lock:
+            positions, self._positions = self._positions, {}
+        return positions
+
+    def flush(self):
+        """Write all pending positions in one bulk_update. Returns the row count."""
+        from . import sync
+        from .models import Driver
+
+        positions = self.drain()
+        if not positions:
+            return 0
+
+        now = timezone.now()
+        drivers = [
+            Driver(id=driver_id, latitude=_coord(lat), longitude=_coord(lng), updated_at=now)
+            for driver_id, (lat, lng) in positions.items()
+        ]
+        Driver.objects.bulk_update(drivers, ["latitude", "longitude", "updated_at"], batch_size=500)
+        sync.bump(sync.DRIVERS_SCOPE)
+        return len(drivers)
+
+
+def _coord(value):
+    return Decimal(str(round(value, 6)))
+
+
+location_buffer = LocationBuffer()
+
+
+# ----------------------------------------------------------
+# PERIODIC FLUSH
+# ----------------------------------------------------------
+async def flush_loop(interval=None):
+    interval = interval or getattr(settings, "DRIVER_LOCATION_FLUSH_SECONDS", 5)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_to_async(location_buffer.flush)()
+        except Exception:
+            logger.exception("driver location flush failed")
+
+
+_flush_task = None
+
+
+def ensure_flush_loop():
+    """Start the flush loop on the running event loop, once per process."""
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.get_running_loop().create_task(flush_loop())
+    return _flush_task
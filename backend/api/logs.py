@@ -0,0 +1,50 @@
+"""
+Logging that never blocks the event loop.
+
+queue_handler() is the handler of the api loggers (see LOGGING in
+settings): a record is formatted and put on an in-memory queue, and a
+listener thread writes it to stderr. A slow terminal or log shipper then
+delays the log, not the request or the WebSocket.
+
+SampleFilter keeps every warning and error but only a fraction of the
+chattier records, for loggers that log per message (api.consumers).
+"""
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+class SampleFilter(logging.Filter):
+
+    def __init__(self, rate=1.0, below=logging.WARNING):
+        super().__init__()
+        self.rate = rate
+        self.below = below
+
+    def filter(self, record):
+        return record.levelno >= self.below or random.random() < self.rate
+
+
+def queue_handler(stream=None, maxsize=10000):
+    """A QueueHandler whose listener thread writes to stream (stderr)."""
+    log_queue = queue.Queue(maxsize)
+    handler = _DroppingQueueHandler(log_queue)
+    listener = QueueListener(log_queue, logging.StreamHandler(stream or sys.stderr))
+    listener.start()
+    atexit.register(listener.stop)
+    handler.listener = listener
+    return handler
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Drops records rather than wait when the writer falls behind."""
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
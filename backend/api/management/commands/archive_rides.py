@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.archive import archive_rides
+
+
+class Command(BaseCommand):
+    help = (
+        "Move COMPLETED / CANCELLED rides older than RIDE_ARCHIVE_AFTER_DAYS "
+        "from RideRequest to ArchivedRide in batches, optionally in a loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help="archive rides not updated for this many days (default: setting)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="rides moved per transaction")
+        parser.add_argument("--loop", action="store_true", help="keep archiving every --interval seconds")
+        parser.add_argument("--interval", type=float, default=3600)
+
+    def handle(self, *args, **opts):
+        days = opts["days"]
+        if days is None:
+            days = getattr(settings, "RIDE_ARCHIVE_AFTER_DAYS", 30)
+
+        while True:
+            start = time.perf_counter()
+            moved = archive_rides(days=days, batch_size=opts["batch_size"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{moved} rides older than {days} days archived in {time.perf_counter() - start:.1f}s"
+            ))
+            if not opts["loop"]:
+                return
+            try:
+                time.sleep(opts["interval"])
+            except KeyboardInterrupt:
+                return
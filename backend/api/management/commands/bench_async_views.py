@@ -0,0 +1,181 @@
+import asyncio
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.shortcuts import get_object_or_404
+from django.test import AsyncClient, override_settings
+from django.urls import include, path
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.geo import driver_index
+from api.models import Customer, Driver, OutboxJob, RideRequest
+from api.notifications import notify_driver_new_ride, publish_driver_changed, publish_ride_changed
+from api.rides import assign_driver, complete_ride, start_ride
+from api.serializers import RideListSerializer, RideRequestSerializer
+from api.sync import conditional_list_response, customer_rides_scope
+from api.views import get_tokens_for_user
+
+
+BENCH_PHONE_PREFIX = "0777"
+BENCH_ADMIN = "bench-async-admin"
+
+
+# ----------------------------------------------------------
+# SYNC BASELINE (the ride lifecycle views before they went async)
+# ----------------------------------------------------------
+class SyncCreateRideRequest(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        customer = get_object_or_404(Customer, id=request.data.get("customer_id"))
+        serializer = RideRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ride = serializer.save(customer=customer)
+        publish_ride_changed(ride)
+        return Response(RideRequestSerializer(ride).data, status=201)
+
+
+class SyncAssignDriverToRide(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, ride_id):
+        ride = assign_driver(ride_id, request.data.get("driver_id"))
+        driver_index.sync_driver(ride.driver)
+        notify_driver_new_ride(ride)
+        publish_ride_changed(ride)
+        publish_driver_changed(ride.driver)
+        return Response({"message": "Driver assigned", "ride": RideRequestSerializer(ride).data})
+
+
+class SyncDriverStartRide(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request, ride_id):
+        ride = start_ride(ride_id)
+        publish_ride_changed(ride)
+        return Response({"message": "Ride started", "ride": RideRequestSerializer(ride).data})
+
+
+class SyncDriverCompleteRide(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request, ride_id):
+        ride = complete_ride(ride_id)
+        publish_ride_changed(ride)
+        if ride.driver:
+            driver_index.sync_driver(ride.driver)
+            publish_driver_changed(ride.driver)
+        return Response({"message": "Ride completed", "ride": RideRequestSerializer(ride).data})
+
+
+class SyncCustomerRides(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, customer_id):
+        rides = RideRequest.objects.filter(customer_id=customer_id)
+        return conditional_list_response(
+            request, rides, RideListSerializer, customer_rides_scope(customer_id)
+        )
+
+
+urlpatterns = [
+    path("sync/rides/create/", SyncCreateRideRequest.as_view()),
+    path("sync/rides/<int:ride_id>/assign/", SyncAssignDriverToRide.as_view()),
+    path("sync/rides/<int:ride_id>/start/", SyncDriverStartRide.as_view()),
+    path("sync/rides/<int:ride_id>/complete/", SyncDriverCompleteRide.as_view()),
+    path("sync/customer/<int:customer_id>/rides/", SyncCustomerRides.as_view()),
+    path("api/", include("api.urls")),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Ride lifecycle load test (create, assign, start, complete, history) "
+        "through the ASGI handler: requests/s of the sync views versus the async ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rides", type=int, default=200, help="lifecycles per run")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--rounds", type=int, default=3, help="runs per variant, best is reported")
+
+    def handle(self, *args, **opts):
+        self.cleanup()
+        # The async views queue their fan-out; drop what this run queued
+        self.last_job_id = OutboxJob.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        customer = Customer.objects.create(
+            full_name="Bench", email="bench-async@example.com",
+            phone=BENCH_PHONE_PREFIX + "000000", password="!",
+        )
+        drivers = [
+            Driver.objects.create(
+                full_name=f"Bench {i}", email=f"bench-async-{i}@example.com",
+                phone=f"{BENCH_PHONE_PREFIX}{i + 1:06d}", password="!",
+                approval_status="APPROVED", is_available=True,
+            )
+            for i in range(opts["concurrency"])
+        ]
+        admin = User.objects.create_user(BENCH_ADMIN, is_staff=True)
+        token = get_tokens_for_user(admin)["access"]
+
+        try:
+            with override_settings(ROOT_URLCONF=__name__):
+                results = {}
+                for _ in range(opts["rounds"]):
+                    for label, prefix in (("sync", "/sync/"), ("async", "/api/")):
+                        rps = asyncio.run(self.run(prefix, customer.id, drivers, token, opts))
+                        results[label] = max(rps, results.get(label, 0))
+        finally:
+            self.cleanup()
+
+        self.stdout.write(f"lifecycles per run:  {opts['rides']} (5 requests each), "
+                          f"concurrency {opts['concurrency']}")
+        for label, rps in results.items():
+            self.stdout.write(f"{label:>5} views:         {rps:,.0f} requests/s per worker")
+        self.stdout.write(f"speedup:             {results['async'] / results['sync']:.2f}x")
+
+    async def run(self, prefix, customer_id, drivers, token, opts):
+        client = AsyncClient()
+        admin_headers = {"Authorization": f"Bearer {token}"}
+        # Drivers start and complete their own rides
+        driver_headers = {
+            driver.id: {"Authorization": f"Bearer {get_tokens_for_user(driver)['access']}"} for driver in drivers
+        }
+        free = asyncio.Queue()
+        for driver in drivers:
+            free.put_nowait(driver.id)
+
+        async def lifecycle():
+            driver_id = await free.get()
+            try:
+                response = await client.post(
+                    f"{prefix}rides/create/",
+                    {"customer_id": customer_id, "pickup_address": "A", "drop_address": "B"},
+                )
+                assert response.status_code == 201, response.content
+                ride_id = response.json()["id"]
+                for step, data, headers in (
+                    ("assign", {"driver_id": driver_id}, admin_headers),
+                    ("start", {}, driver_headers[driver_id]),
+                    ("complete", {}, driver_headers[driver_id]),
+                ):
+                    response = await client.post(f"{prefix}rides/{ride_id}/{step}/", data, headers=headers)
+                    assert response.status_code == 200, response.content
+                await client.get(f"{prefix}customer/{customer_id}/rides/?limit=20")
+            finally:
+                free.put_nowait(driver_id)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(lifecycle() for _ in range(opts["rides"])))
+        return opts["rides"] * 5 / (time.perf_counter() - start)
+
+    def cleanup(self):
+        # Rides go with their customer
+        Customer.objects.filter(phone__startswith=BENCH_PHONE_PREFIX).delete()
+        Driver.objects.filter(phone__startswith=BENCH_PHONE_PREFIX).delete()
+        User.objects.filter(username=BENCH_ADMIN).delete()
+        if hasattr(self, "last_job_id"):
+            OutboxJob.objects.filter(id__gt=self.last_job_id).delete()
@@ -0,0 +1,109 @@
+import asyncio
+import multiprocessing
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.channel_layers import UnixSocketChannelLayer
+
+
+def _worker(socket_dir, driver_ids, ready, results):
+    """One simulated ASGI worker holding a share of the connected drivers."""
+
+    async def main():
+        layer = UnixSocketChannelLayer(socket_dir=socket_dir, capacity=1000)
+        latencies = []
+        done = asyncio.Event()
+
+        async def driver_connection(driver_id):
+            channel = await layer.new_channel()
+            await layer.group_add(f"driver_{driver_id}", channel)
+            while True:
+                message = await layer.receive(channel)
+                latencies.append(time.time() - message["sent_at"])
+
+        async def control():
+            channel = await layer.new_channel()
+            await layer.group_add("bench_control", channel)
+            await layer.receive(channel)
+            done.set()
+
+        tasks = [asyncio.create_task(driver_connection(d)) for d in driver_ids]
+        tasks.append(asyncio.create_task(control()))
+        await asyncio.sleep(0.5)  # let every group_add run
+        ready.put(len(driver_ids))
+
+        await done.wait()
+        await asyncio.sleep(0.2)  # drain in-flight deliveries
+        for task in tasks:
+            task.cancel()
+        await layer.close()
+        results.put(latencies)
+
+    asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = "Throughput and delivery latency of group_send to driver groups across worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drivers", type=int, default=10_000, help="connected drivers in total")
+        parser.add_argument("--workers", type=int, default=4, help="simulated ASGI worker processes")
+        parser.add_argument("--messages", type=int, default=20_000)
+        parser.add_argument("--rate", type=float, default=0, help="messages/s, 0 = as fast as possible")
+
+    def handle(self, *args, **opts):
+        ctx = multiprocessing.get_context("spawn")
+        socket_dir = tempfile.mkdtemp(prefix="bench-channels-")
+        ready, results = ctx.Queue(), ctx.Queue()
+
+        driver_ids = list(range(1, opts["drivers"] + 1))
+        shards = [driver_ids[i::opts["workers"]] for i in range(opts["workers"])]
+        procs = [
+            ctx.Process(target=_worker, args=(socket_dir, shard, ready, results), daemon=True)
+            for shard in shards
+        ]
+        for proc in procs:
+            proc.start()
+        connected = sum(ready.get(timeout=120) for _ in procs)
+        self.stdout.write(f"{connected} drivers connected across {len(procs)} workers")
+
+        send_times = asyncio.run(self._publish(socket_dir, driver_ids, opts))
+        total = sum(send_times)
+
+        latencies = []
+        for _ in procs:
+            latencies.extend(results.get(timeout=120))
+        for proc in procs:
+            proc.join(timeout=10)
+
+        latencies.sort()
+        self.stdout.write(f"messages sent:        {len(send_times)}")
+        self.stdout.write(f"messages delivered:   {len(latencies)}")
+        self.stdout.write(f"publish throughput:   {len(send_times) / total:,.0f} group_send/s")
+        self.stdout.write(f"group_send call p50:  {statistics.median(send_times) * 1e6:.1f} us")
+        if latencies:
+            for pct in (50, 95, 99):
+                idx = min(len(latencies) - 1, int(len(latencies) * pct / 100))
+                self.stdout.write(f"delivery latency p{pct}: {latencies[idx] * 1000:.3f} ms")
+
+    async def _publish(self, socket_dir, driver_ids, opts):
+        layer = UnixSocketChannelLayer(socket_dir=socket_dir)
+        interval = 1 / opts["rate"] if opts["rate"] else 0
+        send_times = []
+
+        for _ in range(opts["messages"]):
+            message = {"type": "new_ride", "ride_id": 1, "sent_at": time.time()}
+            start = time.perf_counter()
+            await layer.group_send(f"driver_{random.choice(driver_ids)}", message)
+            send_times.append(time.perf_counter() - start)
+            if interval:
+                await asyncio.sleep(interval)
+
+        await asyncio.sleep(0.5)
+        await layer.group_send("bench_control", {"type": "stop"})
+        await layer.close()
+        return send_times
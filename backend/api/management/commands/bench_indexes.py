@@ -0,0 +1,165 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from api.models import Customer, Driver, PhoneOTP, RideRequest
+
+
+STATUSES = ["COMPLETED"] * 85 + ["CANCELLED"] * 8 + ["ONGOING"] * 3 + ["ASSIGNED"] * 2 + ["REQUESTED"] * 2
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot queries with and without the access-pattern indexes, "
+        "printing latency and the EXPLAIN plan. Use --seed once on a scratch DB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", action="store_true", help="insert the synthetic data set first")
+        parser.add_argument("--rides", type=int, default=1_000_000)
+        parser.add_argument("--drivers", type=int, default=50_000)
+        parser.add_argument("--customers", type=int, default=20_000)
+        parser.add_argument("--otps", type=int, default=100_000)
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **opts):
+        self.db = opts["database"]
+        self.rng = random.Random(7)
+
+        if opts["seed"]:
+            self.seed(opts)
+
+        if not RideRequest.objects.using(self.db).exists():
+            raise CommandError("No rides found, run with --seed first.")
+
+        queries = self.hot_queries()
+        models = [Driver, PhoneOTP, RideRequest]
+
+        self.drop_indexes(models)
+        try:
+            before = self.measure(queries, opts["runs"], "WITHOUT access-pattern indexes")
+        finally:
+            self.create_indexes(models)
+        after = self.measure(queries, opts["runs"], "WITH access-pattern indexes")
+
+        self.stdout.write("\n=== SUMMARY (median ms) ===")
+        for label in queries:
+            self.stdout.write(f"{label:<28} {before[label]:>10.3f} -> {after[label]:>10.3f}")
+
+    # ---------- DATA ----------
+    def seed(self, opts):
+        batch = opts["batch_size"]
+        now = timezone.now()
+        tag = f"{time.time_ns() % 10**6:06d}"
+        self.stdout.write("Seeding customers / drivers / OTPs / rides ...")
+
+        self._bulk(Customer, (
+            Customer(full_name=f"Customer {i}", email=f"bc{tag}-{i}@example.com",
+                     phone=f"6{tag}{i:07d}"[:15], password="!")
+            for i in range(opts["customers"])
+        ), batch)
+
+        self._bulk(Driver, (
+            Driver(full_name=f"Driver {i}", email=f"bd{tag}-{i}@example.com",
+                   phone=f"7{tag}{i:07d}"[:15], password="!",
+                   approval_status=self.rng.choice(["APPROVED"] * 8 + ["PENDING", "REJECTED"]),
+                   is_available=self.rng.random() < 0.1)
+            for i in range(opts["drivers"])
+        ), batch)
+
+        self._bulk(PhoneOTP, (
+            PhoneOTP(phone=f"8{self.rng.randrange(opts['otps'] // 3):09d}", otp="1234",
+                     created_at=now - timedelta(minutes=self.rng.randrange(60 * 24 * 90)))
+            for _ in range(opts["otps"])
+        ), batch)
+
+        customer_ids = list(Customer.objects.using(self.db).values_list("id", flat=True))
+        driver_ids = list(Driver.objects.using(self.db).values_list("id", flat=True))
+        self._bulk(RideRequest, (self._ride(customer_ids, driver_ids) for _ in range(opts["rides"])), batch)
+
+        # created_at is auto_now_add, so spread it out afterwards in chunks
+        self.stdout.write("Spreading ride timestamps over a year ...")
+        with connections[self.db].cursor() as cursor:
+            table = connections[self.db].ops.quote_name(RideRequest._meta.db_table)
+            ids = list(RideRequest.objects.using(self.db).values_list("id", flat=True))
+            for start in range(0, len(ids), batch):
+                chunk = ids[start:start + batch]
+                cursor.executemany(
+                    f"UPDATE {table} SET created_at = %s WHERE id = %s",
+                    [(now - timedelta(seconds=self.rng.randrange(365 * 86400)), pk) for pk in chunk],
+                )
+
+    def _ride(self, customer_ids, driver_ids):
+        status = self.rng.choice(STATUSES)
+        return RideRequest(
+            customer_id=self.rng.choice(customer_ids),
+            driver_id=None if status == "REQUESTED" else self.rng.choice(driver_ids),
+            pickup_address="Pickup", drop_address="Drop", status=status,
+        )
+
+    def _bulk(self, model, objects, batch):
+        buffer = []
+        total = 0
+        for obj in objects:
+            buffer.append(obj)
+            if len(buffer) >= batch:
+                model.objects.using(self.db).bulk_create(buffer)
+                total += len(buffer)
+                buffer = []
+        if buffer:
+            model.objects.using(self.db).bulk_create(buffer)
+            total += len(buffer)
+        self.stdout.write(f"  {model.__name__}: {total}")
+
+    # ---------- QUERIES ----------
+    def hot_queries(self):
+        rides = RideRequest.objects.using(self.db)
+        customer_id = rides.values_list("customer_id", flat=True).order_by("?").first()
+        driver_id = rides.exclude(driver=None).values_list("driver_id", flat=True).order_by("?").first()
+        phone = PhoneOTP.objects.using(self.db).values_list("phone", flat=True).first()
+
+        return {
+            "customer history (50)": lambda: rides.filter(customer_id=customer_id).order_by("-created_at")[:50],
+            "driver history (50)": lambda: rides.filter(driver_id=driver_id).order_by("-created_at")[:50],
+            "requested rides": lambda: rides.filter(status="REQUESTED").order_by("created_at")[:1000],
+            "admin rides page (50)": lambda: rides.order_by("-created_at", "-id")[:50],
+            "available drivers": lambda: Driver.objects.using(self.db).filter(
+                is_available=True, approval_status="APPROVED"),
+            "latest OTP for phone": lambda: PhoneOTP.objects.using(self.db).filter(
+                phone=phone).order_by("-created_at")[:1],
+        }
+
+    def measure(self, queries, runs, title):
+        self.stdout.write(f"\n=== {title} ===")
+        medians = {}
+        for label, build in queries.items():
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - start) * 1000)
+            medians[label] = statistics.median(timings)
+
+            self.stdout.write(f"\n-- {label}: median {medians[label]:.3f} ms, max {max(timings):.3f} ms")
+            self.stdout.write(build().explain())
+        return medians
+
+    # ---------- INDEX TOGGLING ----------
+    def drop_indexes(self, models):
+        with connections[self.db].schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+
+    def create_indexes(self, models):
+        with connections[self.db].schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
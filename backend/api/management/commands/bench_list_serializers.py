@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Customer, Driver, RideRequest
+from api.renderers import ORJSONRenderer, orjson
+from api.serializers import (
+    DriverListSerializer, DriverSerializer, RideListSerializer, RideRequestSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rows/s for list responses: ModelSerializer + JSONRenderer versus "
+        ".values_list() serializers + ORJSONRenderer. Seeds its own rows "
+        "inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **opts):
+        if orjson is None:
+            self.stdout.write("orjson not installed, ORJSONRenderer falls back to JSONRenderer")
+
+        with transaction.atomic():
+            self.seed(opts["rows"])
+
+            drivers = Driver.objects.filter(email__startswith="bench-list-").order_by("-id")
+            rides = RideRequest.objects.filter(pickup_address="bench-list").order_by("-created_at", "-id")
+
+            self.compare("drivers", opts,
+                         lambda: JSONRenderer().render(DriverSerializer(drivers, many=True).data),
+                         lambda: ORJSONRenderer().render(self.fast(DriverListSerializer, drivers)))
+            self.compare("rides", opts,
+                         lambda: JSONRenderer().render(RideRequestSerializer(rides, many=True).data),
+                         lambda: ORJSONRenderer().render(self.fast(RideListSerializer, rides)))
+
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        customer = Customer.objects.create(
+            full_name="Bench", email="bench-list@example.com", phone="0999999999", password="!"
+        )
+        drivers = Driver.objects.bulk_create([
+            Driver(full_name=f"Driver {i}", email=f"bench-list-{i}@example.com",
+                   phone=f"09{i:08d}", password="!", approval_status="APPROVED",
+                   is_available=i % 2 == 0, latitude=17.38, longitude=78.48)
+            for i in range(count)
+        ], batch_size=1000)
+        RideRequest.objects.bulk_create([
+            RideRequest(customer=customer, driver=drivers[i], pickup_address="bench-list",
+                        drop_address="Drop", pickup_lat=17.38, pickup_lng=78.48,
+                        estimated_fare="120.50", status="COMPLETED")
+            for i in range(count)
+        ], batch_size=1000)
+
+    def fast(self, serializer_class, queryset):
+        serializer = serializer_class()
+        return serializer.serialize(serializer.rows(queryset))
+
+    def compare(self, label, opts, before, after):
+        self.stdout.write(f"\n=== {label}: {opts['rows']} rows ===")
+        results = {}
+        for name, func in (("ModelSerializer + JSONRenderer", before),
+                           ("values_list + ORJSONRenderer", after)):
+            timings = []
+            for _ in range(opts["runs"]):
+                start = time.perf_counter()
+                body = func()
+                timings.append(time.perf_counter() - start)
+            median = statistics.median(timings)
+            results[name] = median
+            self.stdout.write(
+                f"{name:<32} {median * 1000:>9.1f} ms  "
+                f"{opts['rows'] / median:>12,.0f} rows/s  {len(body):>10,} bytes"
+            )
+
+        before_s, after_s = results.values()
+        self.stdout.write(f"speedup: {before_s / after_s:.1f}x")
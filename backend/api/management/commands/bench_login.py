@@ -0,0 +1,93 @@
+import asyncio
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from api.hashing import get_hashing_pool
+from api.models import Driver
+
+
+BENCH_PHONE = "0888888888"
+BENCH_PASSWORD = "bench-pass"
+
+
+class Command(BaseCommand):
+    help = (
+        "Login burst: throughput and p99 of DriverLogin, plus the latency of a cheap "
+        "endpoint hit during the burst, with hashing inline versus in the process pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--workers", type=int, default=4, help="pool size for the pooled run")
+        parser.add_argument("--max-pending", type=int, default=64)
+
+    def handle(self, *args, **opts):
+        Driver.objects.filter(phone=BENCH_PHONE).delete()
+        Driver.objects.create(
+            full_name="Bench", email="bench-login@example.com", phone=BENCH_PHONE,
+            password=make_password(BENCH_PASSWORD), approval_status="APPROVED",
+        )
+        try:
+            for label, workers in (("inline", 0), (f"pool ({opts['workers']} workers)", opts["workers"])):
+                with override_settings(PASSWORD_HASH_WORKERS=workers,
+                                       PASSWORD_HASH_MAX_PENDING=opts["max_pending"]):
+                    self.report(label, asyncio.run(self.burst(opts)))
+                    get_hashing_pool().shutdown()
+        finally:
+            Driver.objects.filter(phone=BENCH_PHONE).delete()
+
+    async def burst(self, opts):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(opts["concurrency"])
+        logins, probes, statuses = [], [], []
+        done = asyncio.Event()
+
+        async def login():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/api/login-driver/", {"phone": BENCH_PHONE, "password": BENCH_PASSWORD}
+                )
+                logins.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+
+        async def probe():
+            # Another endpoint served by the same process during the burst
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/api/rides/nearby-drivers/?lat=0&lng=0")
+                probes.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(opts["logins"])))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+        return {"elapsed": elapsed, "logins": logins, "probes": probes, "statuses": statuses}
+
+    def report(self, label, result):
+        ok = result["statuses"].count(200)
+        self.stdout.write(f"\n=== {label} ===")
+        self.stdout.write(f"logins ok / 429:       {ok} / {result['statuses'].count(429)}")
+        self.stdout.write(f"login throughput:      {ok / result['elapsed']:.1f} /s")
+        self.stdout.write(f"login p50 / p99:       {_pct(result['logins'], 50):.0f} / {_pct(result['logins'], 99):.0f} ms")
+        if result["probes"]:
+            self.stdout.write(
+                f"other endpoint p50/p99: {_pct(result['probes'], 50):.0f} / {_pct(result['probes'], 99):.0f} ms "
+                f"({len(result['probes'])} requests)"
+            )
+
+
+def _pct(values, pct):
+    values = sorted(values)
+    if pct == 50:
+        return statistics.median(values) * 1000
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000
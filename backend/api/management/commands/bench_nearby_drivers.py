@@ -0,0 +1,115 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.geo import DriverSpatialIndex, haversine_km
+from api.models import Driver
+from api.serializers import DriverSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the spatial index k-nearest lookup against the full "
+        "available-drivers scan. Seed rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drivers", type=int, default=5000)
+        parser.add_argument("--queries", type=int, default=1000)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--radius-km", type=float, default=5.0)
+        parser.add_argument("--center", default="17.3850,78.4867", help="lat,lng of the city centre")
+        parser.add_argument("--spread-km", type=float, default=25.0)
+        parser.add_argument("--scan-runs", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        center_lat, center_lng = (float(v) for v in opts["center"].split(","))
+        spread_deg = opts["spread_km"] / 111.2
+
+        def random_point():
+            return (
+                center_lat + rng.uniform(-spread_deg, spread_deg),
+                center_lng + rng.uniform(-spread_deg, spread_deg),
+            )
+
+        with transaction.atomic():
+            self._seed(opts["drivers"], random_point)
+
+            # ---------- CURRENT: FULL TABLE SCAN ----------
+            scan_times = []
+            for _ in range(opts["scan_runs"]):
+                start = time.perf_counter()
+                drivers = Driver.objects.filter(is_available=True, approval_status="APPROVED")
+                DriverSerializer(drivers, many=True).data
+                scan_times.append(time.perf_counter() - start)
+
+            # ---------- SPATIAL INDEX ----------
+            index = DriverSpatialIndex()
+            start = time.perf_counter()
+            index.load(list(
+                Driver.objects.filter(
+                    is_available=True,
+                    approval_status="APPROVED",
+                    latitude__isnull=False,
+                    longitude__isnull=False,
+                ).values_list("id", "latitude", "longitude")
+            ))
+            load_time = time.perf_counter() - start
+
+            queries = [random_point() for _ in range(opts["queries"])]
+            query_times = []
+            for lat, lng in queries:
+                start = time.perf_counter()
+                index.nearest(lat, lng, k=opts["k"], radius_km=opts["radius_km"])
+                query_times.append(time.perf_counter() - start)
+
+            self._check(index, queries[0], opts["k"], opts["radius_km"])
+
+            transaction.set_rollback(True)
+
+        query_times.sort()
+        self.stdout.write(f"drivers seeded:          {opts['drivers']}")
+        self.stdout.write(f"full scan + serialize:   {min(scan_times) * 1000:.2f} ms (best of {len(scan_times)})")
+        self.stdout.write(f"index load:              {load_time * 1000:.2f} ms (once per process)")
+        self.stdout.write(f"index k-nearest p50:     {self._pct(query_times, 50) * 1000:.3f} ms")
+        self.stdout.write(f"index k-nearest p99:     {self._pct(query_times, 99) * 1000:.3f} ms")
+
+    def _seed(self, count, random_point):
+        # Unique phone/email per run so a real dev DB is never clashed with.
+        tag = f"{time.time_ns() % 10**8:08d}"
+        rows = []
+        for i in range(count):
+            lat, lng = random_point()
+            rows.append(Driver(
+                full_name=f"Bench Driver {i}",
+                email=f"bench-{tag}-{i}@example.com",
+                phone=f"9{tag[-4:]}{i:06d}"[:15],
+                password="!",
+                approval_status="APPROVED",
+                is_available=True,
+                latitude=round(lat, 6),
+                longitude=round(lng, 6),
+            ))
+        Driver.objects.bulk_create(rows, batch_size=1000)
+
+    def _check(self, index, point, k, radius_km):
+        lat, lng = point
+        expected = sorted(
+            (haversine_km(lat, lng, d_lat, d_lng), driver_id)
+            for driver_id, (d_lat, d_lng, _) in index._positions.items()
+        )
+        expected = [d for dist, d in expected if dist <= radius_km][:k]
+        got = [d for d, _ in index.nearest(lat, lng, k=k, radius_km=radius_km)]
+        if got != expected:
+            self.stderr.write(self.style.ERROR("index result differs from brute force"))
+
+    @staticmethod
+    def _pct(sorted_values, pct):
+        if not sorted_values:
+            return 0.0
+        idx = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+        return sorted_values[idx]
@@ -0,0 +1,31 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from api.dispatch import SOLVERS, dispatch_loop, run_dispatch_cycle
+
+
+class Command(BaseCommand):
+    help = "Assign waiting rides to available drivers in one batch (optionally in a loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="keep dispatching every --interval seconds")
+        parser.add_argument("--interval", type=float, default=None)
+        parser.add_argument("--solver", choices=sorted(SOLVERS), default=None)
+        parser.add_argument("--max-pickup-km", type=float, default=None)
+
+    def handle(self, *args, **opts):
+        options = {"solver": opts["solver"], "max_pickup_km": opts["max_pickup_km"]}
+
+        if opts["loop"]:
+            self.stdout.write("Dispatch loop running, Ctrl+C to stop")
+            try:
+                asyncio.run(dispatch_loop(interval=opts["interval"], **options))
+            except KeyboardInterrupt:
+                pass
+            return
+
+        assigned = run_dispatch_cycle(**options)
+        for ride_id, driver_id in assigned:
+            self.stdout.write(f"ride {ride_id} -> driver {driver_id}")
+        self.stdout.write(self.style.SUCCESS(f"{len(assigned)} rides assigned"))
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk import FORMATS, IMPORTERS, guess_format, read_rows
+from api.hashing import bulk_hasher
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream drivers, customers or rides from a CSV or NDJSON file ('-' for stdin) "
+        "into the database in batches. Bad rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORTERS))
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, help="default: from the file extension (.csv, else NDJSON)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="rows per bulk_create / transaction")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="processes hashing plaintext passwords (0 = inline)")
+        parser.add_argument("--max-errors", type=int, default=20, help="skipped rows listed in the output")
+
+    def handle(self, *args, **opts):
+        path = opts["path"]
+        fmt = opts["format"] or ("ndjson" if path == "-" else guess_format(path))
+
+        try:
+            stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        start = time.perf_counter()
+        with stream, bulk_hasher(opts["workers"]) as hash_passwords:
+            importer = IMPORTERS[opts["kind"]](hash_passwords=hash_passwords, batch_size=opts["batch_size"])
+            created, skipped = importer.run(read_rows(stream, fmt))
+
+        for number, reason in skipped[:opts["max_errors"]]:
+            self.stderr.write(f"line {number}: {reason}")
+        if len(skipped) > opts["max_errors"]:
+            self.stderr.write(f"... and {len(skipped) - opts['max_errors']} more")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} {opts['kind']} imported, {len(skipped)} skipped "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
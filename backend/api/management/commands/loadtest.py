@@ -0,0 +1,288 @@
+import asyncio
+import json
+import platform
+import subprocess
+import time
+from collections import defaultdict
+
+import numpy as np
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from api.auth import DRIVER, tokens_for
+from api.models import Customer, Driver, OutboxJob
+from api.views import get_tokens_for_user
+
+
+LOAD_PHONE_PREFIX = "0888"
+LOAD_ADMIN = "loadtest-admin"
+
+
+def percentiles(samples):
+    """Latency summary in ms of samples in seconds."""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a fleet against the ASGI application in this process: drivers hold "
+        "ws/driver/<id>/ sockets while customers run create -> assign -> start -> "
+        "complete -> history cycles. Reports throughput, p50/p95/p99 per endpoint and "
+        "assignment-to-WebSocket delivery lag, and writes them as JSON. Use a scratch "
+        "database: the simulated rides are deleted afterwards but stay in the rollups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drivers", type=int, default=50, help="connected driver sockets")
+        parser.add_argument("--customers", type=int, default=20, help="concurrent simulated customers")
+        parser.add_argument("--cycles", type=int, default=10, help="ride cycles per customer")
+        parser.add_argument("--timeout", type=float, default=10, help="seconds before a request or event counts as lost")
+        parser.add_argument("--output", default=None, help="JSON results file (default: loadtest-<commit>-<time>.json)")
+        parser.add_argument("--compare", default=None, help="an earlier results file to print deltas against")
+
+    def handle(self, *args, **opts):
+        from driverhiring.asgi import application
+
+        self.cleanup()
+        self.last_job_id = OutboxJob.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        drivers, customers, token = self.setup_fleet(opts)
+        started_at = timezone.now()
+
+        try:
+            results = asyncio.run(self.run(application, drivers, customers, token, opts))
+        finally:
+            self.cleanup()
+
+        results = {
+            "commit": git_commit(),
+            "started_at": started_at.isoformat(),
+            "options": {k: opts[k] for k in ("drivers", "customers", "cycles", "timeout")},
+            "environment": {
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "channel_layer": settings.CHANNEL_LAYERS["default"]["BACKEND"],
+                "jobs_concurrency": getattr(settings, "JOBS_CONCURRENCY", 4),
+            },
+            **results,
+        }
+
+        output = opts["output"] or f"loadtest-{results['commit'] or 'nocommit'}-{int(time.time())}.json"
+        with open(output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+        self.report(results)
+        if opts["compare"]:
+            with open(opts["compare"]) as fh:
+                self.compare(json.load(fh), results)
+        self.stdout.write(self.style.SUCCESS(f"results written to {output}"))
+
+    # ---------- FIXTURES ----------
+    def setup_fleet(self, opts):
+        Driver.objects.bulk_create([
+            Driver(
+                full_name=f"Load driver {i}", email=f"load-driver-{i}@example.com",
+                phone=f"{LOAD_PHONE_PREFIX}1{i:05d}", password="!",
+                approval_status="APPROVED", is_available=True,
+                latitude=17.38 + i * 0.0005, longitude=78.48,
+            )
+            for i in range(opts["drivers"])
+        ])
+        Customer.objects.bulk_create([
+            Customer(
+                full_name=f"Load customer {i}", email=f"load-customer-{i}@example.com",
+                phone=f"{LOAD_PHONE_PREFIX}2{i:05d}", password="!",
+            )
+            for i in range(opts["customers"])
+        ])
+        # bulk_create doesn't return ids on every backend
+        driver_ids = list(Driver.objects.filter(phone__startswith=LOAD_PHONE_PREFIX).values_list("id", flat=True))
+        customer_ids = list(Customer.objects.filter(phone__startswith=LOAD_PHONE_PREFIX).values_list("id", flat=True))
+        admin = User.objects.create_user(LOAD_ADMIN, is_staff=True)
+        return driver_ids, customer_ids, get_tokens_for_user(admin)["access"]
+
+    def cleanup(self):
+        # Rides go with their customer
+        Customer.objects.filter(phone__startswith=LOAD_PHONE_PREFIX).delete()
+        Driver.objects.filter(phone__startswith=LOAD_PHONE_PREFIX).delete()
+        User.objects.filter(username=LOAD_ADMIN).delete()
+        if hasattr(self, "last_job_id"):
+            OutboxJob.objects.filter(id__gt=self.last_job_id).delete()
+
+    # ---------- SIMULATION ----------
+    async def run(self, application, driver_ids, customer_ids, admin_token, opts):
+        timeout = opts["timeout"]
+        driver_tokens = {driver_id: tokens_for(DRIVER, driver_id)["access"] for driver_id in driver_ids}
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        lags = []
+        awaiting = {}   # ride_id -> (assign sent at, asyncio.Event)
+
+        async def request(name, method, path, data=None, token=None):
+            body = json.dumps(data).encode() if data is not None else b""
+            headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+            if token:
+                headers.append((b"authorization", f"Bearer {token}".encode()))
+            communicator = HttpCommunicator(application, method, path, body=body, headers=headers)
+            start = time.perf_counter()
+            try:
+                response = await communicator.get_response(timeout=timeout)
+                latencies[name].append(time.perf_counter() - start)
+                # Let the handler finish (request_finished closes its DB connection)
+                await communicator.wait(timeout)
+            except asyncio.TimeoutError:
+                errors[name] += 1
+                return None
+            if response["status"] >= 400:
+                errors[name] += 1
+                return None
+            return json.loads(response["body"] or b"null")
+
+        # Drivers: one socket each, reading until cancelled
+        sockets, connect_times = [], []
+        for driver_id in driver_ids:
+            socket = WebsocketCommunicator(application, f"/ws/driver/{driver_id}/?token={driver_tokens[driver_id]}")
+            start = time.perf_counter()
+            connected, _ = await socket.connect(timeout=timeout)
+            if not connected:
+                errors["ws_connect"] += 1
+                continue
+            await socket.receive_json_from(timeout=timeout)   # CONNECTED
+            connect_times.append(time.perf_counter() - start)
+            sockets.append(socket)
+
+        async def listen(socket):
+            while True:
+                try:
+                    event = await socket.receive_json_from(timeout=3600)
+                except asyncio.TimeoutError:
+                    continue
+                pending = awaiting.pop(event.get("ride_id"), None)
+                if pending:
+                    sent_at, delivered = pending
+                    lags.append(time.perf_counter() - sent_at)
+                    delivered.set()
+
+        listeners = [asyncio.create_task(listen(socket)) for socket in sockets]
+
+        free = asyncio.Queue()
+        for driver_id in driver_ids[:len(sockets)]:
+            free.put_nowait(driver_id)
+        lost = completed = 0
+
+        async def customer(customer_id):
+            nonlocal lost, completed
+            for _ in range(opts["cycles"]):
+                ride = await request("create", "POST", "/api/rides/create/", {
+                    "customer_id": customer_id,
+                    "pickup_address": "Load pickup", "pickup_lat": "17.385", "pickup_lng": "78.486",
+                    "drop_address": "Load drop", "drop_lat": "17.44", "drop_lng": "78.35",
+                })
+                if ride is None:
+                    continue
+
+                driver_id = await free.get()
+                try:
+                    delivered = asyncio.Event()
+                    awaiting[ride["id"]] = (time.perf_counter(), delivered)
+                    assigned = await request(
+                        "assign", "POST", f"/api/rides/{ride['id']}/assign/", {"driver_id": driver_id}, admin_token
+                    )
+                    if assigned is None:
+                        awaiting.pop(ride["id"], None)
+                        continue
+                    # The driver starts once the app has shown the ride
+                    try:
+                        await asyncio.wait_for(delivered.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        awaiting.pop(ride["id"], None)
+                        lost += 1
+
+                    token = driver_tokens[driver_id]
+                    if await request("start", "POST", f"/api/rides/{ride['id']}/start/", {}, token) is None:
+                        continue
+                    if await request("complete", "POST", f"/api/rides/{ride['id']}/complete/", {}, token) is None:
+                        continue
+                    completed += 1
+                finally:
+                    free.put_nowait(driver_id)
+
+                await request("history", "GET", f"/api/customer/{customer_id}/rides/?limit=20")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(customer(customer_id) for customer_id in customer_ids))
+        elapsed = time.perf_counter() - start
+
+        for task in listeners:
+            task.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        for socket in sockets:
+            await socket.disconnect()
+
+        requests = sum(len(samples) for samples in latencies.values())
+        return {
+            "duration_s": round(elapsed, 3),
+            "rides_completed": completed,
+            "rides_per_s": round(completed / elapsed, 2),
+            "requests_per_s": round(requests / elapsed, 2),
+            "endpoints": {
+                name: {**percentiles(samples), "errors": errors[name], "per_s": round(len(samples) / elapsed, 2)}
+                for name, samples in latencies.items()
+            },
+            "websocket": {
+                "connected": len(sockets),
+                "connect_errors": errors["ws_connect"],
+                "connect": percentiles(connect_times),
+                "delivery_lag": {**percentiles(lags), "lost": lost},
+            },
+        }
+
+    # ---------- OUTPUT ----------
+    def report(self, results):
+        self.stdout.write(
+            f"{results['rides_completed']} rides in {results['duration_s']:.1f}s: "
+            f"{results['rides_per_s']:.1f} rides/s, {results['requests_per_s']:.1f} requests/s"
+        )
+        self.stdout.write(f"{'endpoint':<12}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        rows = {**results["endpoints"], "ws lag": results["websocket"]["delivery_lag"]}
+        for name, row in rows.items():
+            if not row["count"]:
+                continue
+            self.stdout.write(
+                f"{name:<12}{row['count']:>7}{row.get('errors', row.get('lost', 0)):>8}"
+                f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+            )
+
+    def compare(self, before, after):
+        self.stdout.write(f"vs {before.get('commit')}: rides/s {before['rides_per_s']} -> {after['rides_per_s']}")
+        rows = [(name, before["endpoints"].get(name), row) for name, row in after["endpoints"].items()]
+        rows.append(("ws lag", before["websocket"]["delivery_lag"], after["websocket"]["delivery_lag"]))
+        for name, old, new in rows:
+            if old and old.get("count") and new.get("count"):
+                self.stdout.write(
+                    f"  {name:<10} p95 {old['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms "
+                    f"({new['p95_ms'] / old['p95_ms']:.2f}x)"
+                )
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the analytics rollups (admin/stats/) from the ride history. "
+        "Transitions that land while it runs are lost, so run it when traffic is low."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="rides read per query")
+
+    def handle(self, *args, **opts):
+        start = time.perf_counter()
+        rides, buckets = rebuild(batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{rides} rides -> {buckets} buckets in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,36 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import JobRunner
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the outbox (for WSGI deployments or a dedicated worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="run the jobs due now, then exit")
+        parser.add_argument("--concurrency", type=int, default=None,
+                            help="jobs at once (default JOBS_CONCURRENCY)")
+
+    def handle(self, *args, **opts):
+        runner = JobRunner(concurrency=opts["concurrency"])
+        if not runner.concurrency:
+            runner = JobRunner(concurrency=1)
+
+        if opts["once"]:
+            asyncio.run(runner.drain())
+            self.stdout.write(self.style.SUCCESS(
+                f"{runner.completed} jobs done, {runner.retried} retried, {runner.failed} failed"
+            ))
+            return
+
+        self.stdout.write(f"Job runner running ({runner.concurrency} at once), Ctrl+C to stop")
+
+        async def serve():
+            await runner.ensure_started()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
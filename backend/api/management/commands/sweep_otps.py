@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.otp import CacheOTPStore, DatabaseOTPStore
+
+
+class Command(BaseCommand):
+    help = "Delete expired PhoneOTP and PhoneOTPLimit rows in batches, optionally in a loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="keep sweeping every --interval seconds")
+        parser.add_argument("--interval", type=float, default=300)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        while True:
+            deleted = DatabaseOTPStore.sweep(batch_size=opts["batch_size"])
+            deleted += CacheOTPStore.sweep(batch_size=opts["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{deleted} expired OTP rows deleted"))
+            if not opts["loop"]:
+                return
+            try:
+                time.sleep(opts["interval"])
+            except KeyboardInterrupt:
+                return
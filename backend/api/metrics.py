@@ -0,0 +1,383 @@
+"""
+Request and WebSocket metrics, shared by every worker process on the host.
+
+QueryCountMiddleware records each request in RequestMetrics: latency
+histogram, SQL queries and DB time, response bytes and status class, keyed
+by resolved view name. The WebSocket consumers record connections, group
+membership, messages in and out, send latency and new_ride fan-out time in
+ConsumerMetrics, keyed by consumer class, and a probe task records how late
+the event loop runs (LoopMetrics). metrics/ sums all workers and renders
+Prometheus text format.
+
+Counters live in memory-mapped files under METRICS_DIR, one file per
+process and kind. Inside it every thread that records gets its own shard
+(one RECORD row per key), so an increment is a plain in-place add with no
+lock and no other writer; only a thread's first record and a process's
+first record for a new key take a lock. The metrics/ view reads every file
+in the directory, so counts from all workers (and from exited ones, so
+counters never go backwards) are summed. Gauges only count live
+processes. Clear METRICS_DIR on deploy.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default latency buckets (seconds); the last slot is +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# WebSocket sends take microseconds unless the event loop is stalled
+WS_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+OVERFLOW_KEY = "<other>"   # keys past METRICS_MAX_VIEWS
+
+
+# ----------------------------------------------------------
+# WRITING (ONE FILE PER PROCESS, ONE SHARD PER THREAD)
+# ----------------------------------------------------------
+class _Shard:
+    """A thread's rows; hands the shard back when the thread ends."""
+
+    def __init__(self, registry, index, table):
+        self.registry = registry
+        self.index = index
+        self.table = table
+
+    def __del__(self):
+        self.registry._free.append(self.index)
+
+
+class MetricsRegistry:
+    """One kind of counters for this process: a RECORD row per key."""
+    kind = None
+    RECORD = None
+    BUCKETS = ()
+    GAUGES = ()   # fields that go up and down; dropped with their process
+
+    def __init__(self, directory, max_keys):
+        self.directory = directory
+        self.max_keys = max_keys
+        self.path = os.path.join(directory, f"{self.kind}-{os.getpid()}-{time.time_ns()}.bin")
+        self.keys = {}            # key -> row, same in every shard
+        self._free = []           # shard indexes of finished threads
+        self._shards = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Column of each field in a RECORD seen as a flat row of float64s
+        self.width = self.RECORD.itemsize // 8
+        self.column = {name: self.RECORD.fields[name][1] // 8 for name in self.RECORD.names}
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = self._new_shard()
+        return shard.table
+
+    def _new_shard(self):
+        with self._lock:
+            if self._free:
+                index = self._free.pop()
+            else:
+                index = self._shards
+                self._shards += 1
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self.path, "ab") as fh:
+                    fh.truncate(self._shards * self.max_keys * self.RECORD.itemsize)
+        # Plain float64 rows: a scalar += on these is far cheaper than on record fields
+        table = np.memmap(
+            self.path, dtype="<f8", mode="r+",
+            offset=index * self.max_keys * self.RECORD.itemsize, shape=(self.max_keys, self.width),
+        )
+        return _Shard(self, index, table)
+
+    def _row(self, key):
+        row = self.keys.get(key)
+        if row is not None:
+            return row
+        with self._lock:
+            if key not in self.keys and len(self.keys) >= self.max_keys - 1:
+                key = OVERFLOW_KEY
+            if key not in self.keys:
+                self.keys[key] = len(self.keys)
+                self._write_keys()
+            return self.keys[key]
+
+    def _write_keys(self):
+        # Readers only trust rows listed here; replaced atomically
+        os.makedirs(self.directory, exist_ok=True)
+        names = sorted(self.keys, key=self.keys.get)
+        tmp = f"{self.path}.json.tmp"
+        with open(tmp, "w") as fh:
+            json.dump({"max_keys": self.max_keys, "keys": names}, fh)
+        os.replace(tmp, f"{self.path}.json")
+
+    def counters(self, key):
+        """This thread's float64 row for key."""
+        # The row first: a new key is listed before its counters move
+        row = self._row(key)
+        return self._shard()[row]
+
+    def observe(self, counters, field, seconds):
+        counters[self.column[field] + bisect_left(self.BUCKETS, seconds)] += 1
+        counters[self.column[f"{field}_sum"]] += seconds
+
+    # ---------- READING (ALL PROCESSES) ----------
+    @classmethod
+    def collect(cls, directory):
+        """{key: summed RECORD} over every process file of this kind."""
+        try:
+            names = [
+                name for name in os.listdir(directory)
+                if name.startswith(f"{cls.kind}-") and name.endswith(".bin")
+            ]
+        except FileNotFoundError:
+            return {}
+
+        totals = {}
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                with open(f"{path}.json") as fh:
+                    meta = json.load(fh)
+                data = np.fromfile(path, dtype=cls.RECORD)
+            except (FileNotFoundError, ValueError):
+                continue   # a process that is still creating its file
+            max_keys = meta["max_keys"]
+            shards = data[: len(data) // max_keys * max_keys].reshape(-1, max_keys)
+            alive = _alive(int(name.split("-")[1]))
+
+            for row, key in enumerate(meta["keys"]):
+                summed = {field: shards[field][:, row].sum(axis=0) for field in cls.RECORD.names}
+                if not alive:
+                    for field in cls.GAUGES:
+                        summed[field] = np.zeros_like(summed[field])
+                if key in totals:
+                    for field in cls.RECORD.names:
+                        totals[key][field] = totals[key][field] + summed[field]
+                else:
+                    totals[key] = summed
+        return totals
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class RequestMetrics(MetricsRegistry):
+    kind = "http"
+    BUCKETS = BUCKETS
+    RECORD = np.dtype([
+        ("status", "<f8", (len(STATUS_CLASSES),)),
+        ("latency", "<f8", (len(BUCKETS) + 1,)),
+        ("latency_sum", "<f8"),
+        ("queries", "<f8"),
+        ("query_seconds", "<f8"),
+        ("response_bytes", "<f8"),
+    ])
+
+    def record(self, view, status, seconds, queries=0, query_seconds=0.0, response_bytes=0):
+        counters = self.counters(view)
+        column = self.column
+        counters[column["status"] + min(max(status // 100, 1), 5) - 1] += 1
+        self.observe(counters, "latency", seconds)
+        counters[column["queries"]] += queries
+        counters[column["query_seconds"]] += query_seconds
+        counters[column["response_bytes"]] += response_bytes
+
+
+class ConsumerMetrics(MetricsRegistry):
+    kind = "ws"
+    BUCKETS = WS_BUCKETS
+    GAUGES = ("active", "group_members")
+    RECORD = np.dtype([
+        ("active", "<f8"),
+        ("connections", "<f8"),
+        ("rejected", "<f8"),
+        ("group_members", "<f8"),
+        ("messages_in", "<f8"),
+        ("messages_out", "<f8"),
+        ("errors", "<f8"),
+        ("send", "<f8", (len(WS_BUCKETS) + 1,)),
+        ("send_sum", "<f8"),
+        ("fanout", "<f8", (len(WS_BUCKETS) + 1,)),
+        ("fanout_sum", "<f8"),
+    ])
+
+    def add(self, consumer, field, amount=1):
+        self.counters(consumer)[self.column[field]] += amount
+
+    def sent(self, consumer, seconds):
+        counters = self.counters(consumer)
+        counters[self.column["messages_out"]] += 1
+        self.observe(counters, "send", seconds)
+
+    def fanout(self, consumer, seconds):
+        self.observe(self.counters(consumer), "fanout", seconds)
+
+
+class LoopMetrics(MetricsRegistry):
+    """How late the event loop wakes up: the time nothing else could run."""
+    kind = "loop"
+    BUCKETS = WS_BUCKETS
+    RECORD = np.dtype([
+        ("lag", "<f8", (len(WS_BUCKETS) + 1,)),
+        ("lag_sum", "<f8"),
+    ])
+    KEY = "asgi"
+
+
+_registries = {}
+
+
+def _registry(cls):
+    """This process' registry of cls, reopened if the settings changed."""
+    directory = getattr(settings, "METRICS_DIR", "/tmp/driverhiring-metrics")
+    max_keys = getattr(settings, "METRICS_MAX_VIEWS", 256)
+
+    registry = _registries.get(cls)
+    if registry is None or (registry.directory, registry.max_keys) != (directory, max_keys):
+        registry = _registries[cls] = cls(directory, max_keys)
+    return registry
+
+
+def get_metrics():
+    return _registry(RequestMetrics)
+
+
+def get_consumer_metrics():
+    return _registry(ConsumerMetrics)
+
+
+# ----------------------------------------------------------
+# EVENT LOOP LAG
+# ----------------------------------------------------------
+async def loop_monitor(interval=None):
+    """Sleep interval seconds at a time and record how late each wake-up is."""
+    interval = interval or getattr(settings, "METRICS_LOOP_PROBE_SECONDS", 0.5)
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        try:
+            registry = _registry(LoopMetrics)
+            registry.observe(registry.counters(LoopMetrics.KEY), "lag", max(loop.time() - start - interval, 0.0))
+        except Exception:
+            logger.exception("event loop lag probe failed")
+
+
+_monitor_task = None
+
+
+def ensure_loop_monitor():
+    """Start the lag probe on the running event loop, once per process."""
+    global _monitor_task
+    if _monitor_task is None or _monitor_task.done():
+        _monitor_task = asyncio.get_running_loop().create_task(loop_monitor())
+    return _monitor_task
+
+
+# ----------------------------------------------------------
+# PROMETHEUS TEXT FORMAT
+# ----------------------------------------------------------
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Exposition:
+    """Prometheus text exposition format (version 0.0.4)."""
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text, samples):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        self.lines.extend(samples)
+
+    def per_key(self, name, kind, help_text, label, totals, field):
+        self.family(name, kind, help_text, [
+            f'{name}{{{label}="{_label(key)}"}} {_number(totals[key][field])}' for key in sorted(totals)
+        ])
+
+    def histogram(self, name, help_text, label, totals, field, buckets):
+        """One labelled histogram per key; label=None for a single unlabelled one."""
+        samples = []
+        for key in sorted(totals):
+            labels = f'{label}="{_label(key)}",' if label else ""
+            cumulative = np.cumsum(totals[key][field])
+            if not cumulative[-1]:
+                continue
+            for bound, count in zip(buckets + ("+Inf",), cumulative):
+                samples.append(f'{name}_bucket{{{labels}le="{bound}"}} {_number(count)}')
+            labels = f"{{{labels[:-1]}}}" if labels else ""
+            samples.append(f'{name}_sum{labels} {_number(totals[key][f"{field}_sum"])}')
+            samples.append(f'{name}_count{labels} {_number(cumulative[-1])}')
+        self.family(name, "histogram", help_text, samples)
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def render(directory=None):
+    """Every worker's request and consumer metrics as Prometheus text."""
+    directory = directory or get_metrics().directory
+    out = _Exposition()
+
+    requests = RequestMetrics.collect(directory)
+    out.family("http_requests_total", "counter", "Requests by view and status class.", [
+        f'http_requests_total{{view="{_label(view)}",status="{status}"}} {_number(count)}'
+        for view in sorted(requests)
+        for status, count in zip(STATUS_CLASSES, requests[view]["status"]) if count
+    ])
+    out.histogram("http_request_duration_seconds", "Request latency by view.", "view", requests, "latency", BUCKETS)
+    for name, field, help_text in (
+        ("http_db_queries_total", "queries", "SQL queries run by view."),
+        ("http_db_seconds_total", "query_seconds", "Time spent in SQL by view."),
+        ("http_response_bytes_total", "response_bytes", "Response body bytes by view (not streamed bodies)."),
+    ):
+        out.per_key(name, "counter", help_text, "view", requests, field)
+
+    consumers = ConsumerMetrics.collect(directory)
+    for name, kind, field, help_text in (
+        ("ws_connections_active", "gauge", "active", "Open WebSocket connections by consumer."),
+        ("ws_connections_total", "counter", "connections", "Accepted WebSocket connections by consumer."),
+        ("ws_connections_rejected_total", "counter", "rejected", "WebSocket connections closed before accept."),
+        ("ws_group_members", "gauge", "group_members", "Channel layer group memberships held by consumer."),
+        ("ws_messages_received_total", "counter", "messages_in", "Frames received from clients."),
+        ("ws_messages_sent_total", "counter", "messages_out", "Frames sent to clients."),
+        ("ws_errors_total", "counter", "errors", "Client messages that failed to handle."),
+    ):
+        out.per_key(name, kind, help_text, "consumer", consumers, field)
+    out.histogram(
+        "ws_send_duration_seconds", "Time to hand a frame to the server.",
+        "consumer", consumers, "send", WS_BUCKETS,
+    )
+    out.histogram(
+        "ws_new_ride_fanout_seconds", "From assignment to the new_ride frame leaving for the driver.",
+        "consumer", consumers, "fanout", WS_BUCKETS,
+    )
+    out.histogram(
+        "asgi_event_loop_lag_seconds", "How late the event loop ran a timer; stalls show here.",
+        None, LoopMetrics.collect(directory), "lag", WS_BUCKETS,
+    )
+    return out.text()
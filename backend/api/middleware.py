@@ -0,0 +1,127 @@
+"""
+Per-view request instrumentation.
+
+QueryCountMiddleware times every request and counts its queries and DB
+time, then records them per resolved view in api/metrics.py (served at
+metrics/). Hidden N+1 patterns also show up in the log (and in
+X-DB-Query-Count / X-DB-Time-Ms headers while DEBUG is on).
+"""
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from .metrics import get_metrics
+
+
+logger = logging.getLogger("api.queries")
+
+
+class QueryStats:
+    """connection.execute_wrapper that counts queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+# ----------------------------------------------------------
+# PER-REQUEST RECORDING
+# ----------------------------------------------------------
+# Async views run their queries on sync_to_async threads, each with its
+# own connection, so a wrapper installed on the request thread's
+# connection would miss them. Every connection gets record_query instead,
+# and it finds the current request's stats through a context variable
+# (asgiref copies the context into those threads).
+_request_stats = contextvars.ContextVar("request_query_stats", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+def view_name_for(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unresolved>"
+    return match.view_name or match._func_path
+
+
+class QueryCountMiddleware:
+    # Async capable, or Django would run every async view on the single
+    # sync thread behind this middleware
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.warn_threshold = getattr(settings, "QUERY_COUNT_WARN_THRESHOLD", 20)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        install_query_recorder(connection)   # opened before this module loaded
+        start = time.perf_counter()
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    def finish(self, request, response, stats, seconds):
+        view_name = view_name_for(request)
+        get_metrics().record(
+            view_name, response.status_code, seconds,
+            queries=stats.count, query_seconds=stats.duration,
+            # streamed bodies aren't known yet
+            response_bytes=0 if response.streaming else len(response.content),
+        )
+
+        if stats.count > self.warn_threshold:
+            logger.warning(
+                "%s ran %d queries (%.1f ms)", view_name, stats.count, stats.duration * 1000
+            )
+
+        if settings.DEBUG:
+            response["X-DB-Query-Count"] = str(stats.count)
+            response["X-DB-Time-Ms"] = f"{stats.duration * 1000:.2f}"
+
+        return response
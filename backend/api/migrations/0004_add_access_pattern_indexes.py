@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_driver_is_available_driver_latitude_driver_longitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customer',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='driver',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='phoneotp',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='riderequest',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AlterField(
+            model_name='driver',
+            name='license_file',
+            field=models.FileField(blank=True, null=True, upload_to='licenses/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='driver',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, upload_to='driver_photos/%Y/%m/%d/'),
+        ),
+        migrations.AlterField(
+            model_name='phoneotp',
+            name='phone',
+            field=models.CharField(max_length=15),
+        ),
+        migrations.AddIndex(
+            model_name='driver',
+            index=models.Index(fields=['is_available', 'approval_status'], name='driver_avail_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phoneotp',
+            index=models.Index(fields=['phone', '-created_at'], name='otp_phone_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='ride_customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['driver', '-created_at', '-id'], name='ride_driver_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['status', 'created_at'], name='ride_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['-created_at', '-id'], name='ride_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='phoneotp',
+            index=models.Index(fields=['created_at'], name='otp_created_idx'),
+        ),
+    ]
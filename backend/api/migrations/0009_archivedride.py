@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRide',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('pickup_address', models.CharField(max_length=255)),
+                ('pickup_lat', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('pickup_lng', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('drop_address', models.CharField(max_length=255)),
+                ('drop_lat', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('drop_lng', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('estimated_fare', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('status', models.CharField(choices=[('REQUESTED', 'Requested'), ('ASSIGNED', 'Assigned'), ('ONGOING', 'Ongoing'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('assigned_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_rides', to='api.customer')),
+                ('driver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_rides', to='api.driver')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['customer', '-created_at', '-id'], name='archive_customer_created_idx'), models.Index(fields=['driver', '-created_at', '-id'], name='archive_driver_created_idx'), models.Index(fields=['-created_at', '-id'], name='archive_created_idx')],
+            },
+        ),
+    ]
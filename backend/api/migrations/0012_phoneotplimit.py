@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_phoneotp_attempts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhoneOTPLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=15, unique=True)),
+                ('window_ends', models.DateTimeField()),
+                ('sends', models.PositiveSmallIntegerField(default=0)),
+                ('next_send', models.DateTimeField()),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window_ends'], name='otp_limit_window_idx')],
+            },
+        ),
+    ]
@@ -29,6 +29,7 @@ class Driver(models.Model):
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # ?since= delta sync
 
     # Driver availability for ride assignment
     is_available = models.BooleanField(default=False)
@@ -44,6 +45,12 @@ class Driver(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # ListAvailableDrivers / dispatch
+            models.Index(fields=["is_available", "approval_status"], name="driver_avail_status_idx"),
+            # DriverList ?since=
+            models.Index(fields=["updated_at"], name="driver_updated_idx"),
+        ]
 
 
 # -------------------------------------------------------------
@@ -75,6 +82,7 @@ class PhoneOTP(models.Model):
     phone = models.CharField(max_length=15)  # removed unique=True
     otp = models.CharField(max_length=6)
     is_verified = models.BooleanField(default=False)
+    attempts = models.PositiveSmallIntegerField(default=0)   # verify calls, see OTP_MAX_ATTEMPTS
     created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
@@ -82,6 +90,30 @@ class PhoneOTP(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # latest OTP for a phone
+            models.Index(fields=["phone", "-created_at"], name="otp_phone_created_idx"),
+            # sweep_otps: expired rows
+            models.Index(fields=["created_at"], name="otp_created_idx"),
+        ]
+
+
+class PhoneOTPLimit(models.Model):
+    """Send and guess counters of the cache OTP store (api/otp.py), one row per phone."""
+    phone = models.CharField(max_length=15, unique=True)
+    window_ends = models.DateTimeField()      # OTP_SEND_WINDOW_SECONDS from its first send
+    sends = models.PositiveSmallIntegerField(default=0)   # in the current window
+    next_send = models.DateTimeField()        # OTP_RESEND_SECONDS after the last send
+    attempts = models.PositiveSmallIntegerField(default=0)   # verify calls on the current code
+
+    def __str__(self):
+        return f"{self.phone} - {self.sends} sends"
+
+    class Meta:
+        indexes = [
+            # sweep_otps: finished windows
+            models.Index(fields=["window_ends"], name="otp_limit_window_idx"),
+        ]
 
 
 # -------------------------------------------------------------
@@ -121,14 +153,165 @@ class RideRequest(models.Model):
     # Status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="REQUESTED")
 
-    # Timestamps
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Timestamps. Not auto_now / auto_now_add, which bulk_create would
+    # stamp over the times of imported history; save() stamps updated_at.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     assigned_at = models.DateTimeField(null=True, blank=True)
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)  # ?since= delta sync
 
     def __str__(self):
-        return f"Ride {self.id} - {self.customer.full_name} - {self.status}"
+        # customer_id avoids loading the customer row for every ride printed
+        return f"Ride {self.id} - customer #{self.customer_id} - {self.status}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.updated_at = timezone.now()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
+        super().save(*args, **kwargs)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # customer / driver ride history, newest first (keyset pages)
+            models.Index(fields=["customer", "-created_at", "-id"], name="ride_customer_created_idx"),
+            models.Index(fields=["driver", "-created_at", "-id"], name="ride_driver_created_idx"),
+            # dispatch: oldest REQUESTED rides first
+            models.Index(fields=["status", "created_at"], name="ride_status_created_idx"),
+            # admin ride list pages
+            models.Index(fields=["-created_at", "-id"], name="ride_created_idx"),
+            # admin ride list ?since=
+            models.Index(fields=["updated_at"], name="ride_updated_idx"),
+        ]
+
+
+# -------------------------------------------------------------
+# RIDE ARCHIVE (api/archive.py)
+# -------------------------------------------------------------
+class ArchivedRide(models.Model):
+    """
+    A COMPLETED or CANCELLED ride moved out of RideRequest. Same id and
+    columns, but the timestamps are copied as they were, not stamped.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+
+    customer = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, related_name="archived_rides"
+    )
+
+    driver = models.ForeignKey(
+        Driver, on_delete=models.SET_NULL, null=True, blank=True, related_name="archived_rides"
+    )
+
+    pickup_address = models.CharField(max_length=255)
+    pickup_lat = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    pickup_lng = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+
+    drop_address = models.CharField(max_length=255)
+    drop_lat = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    drop_lng = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+
+    estimated_fare = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    status = models.CharField(max_length=20, choices=RideRequest.STATUS_CHOICES)
+
+    created_at = models.DateTimeField()
+    assigned_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived ride {self.id} - customer #{self.customer_id} - {self.status}"
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # the history endpoints page both tables the same way
+            models.Index(fields=["customer", "-created_at", "-id"], name="archive_customer_created_idx"),
+            models.Index(fields=["driver", "-created_at", "-id"], name="archive_driver_created_idx"),
+            models.Index(fields=["-created_at", "-id"], name="archive_created_idx"),
+        ]
+
+
+# -------------------------------------------------------------
+# OUTBOX (BACKGROUND JOBS, api/jobs.py)
+# -------------------------------------------------------------
+class OutboxJob(models.Model):
+
+    STATUS_CHOICES = (
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("FAILED", "Failed"),   # out of attempts, kept for inspection
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDING")
+    attempts = models.PositiveIntegerField(default=0)
+    # PENDING: not before this time. RUNNING: lease expiry, after which
+    # another runner may reclaim the job.
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.id} - {self.status}"
+
+    class Meta:
+        ordering = ["run_after"]
+        indexes = [
+            # runner: due jobs, oldest first
+            models.Index(fields=["status", "run_after"], name="outbox_due_idx"),
+        ]
+
+
+# -------------------------------------------------------------
+# ANALYTICS ROLLUPS (api/rollups.py)
+# -------------------------------------------------------------
+class HourlyRideStats(models.Model):
+    """Ride transitions per hour; the *_seconds columns are sums for averages."""
+    hour = models.DateTimeField(unique=True)   # UTC, truncated to the hour
+
+    requested = models.PositiveIntegerField(default=0)
+    assigned = models.PositiveIntegerField(default=0)
+    started = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+
+    assign_wait_seconds = models.FloatField(default=0)    # created -> assigned
+    pickup_wait_seconds = models.FloatField(default=0)    # assigned -> started
+    ride_seconds = models.FloatField(default=0)           # started -> completed
+    fare_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}:00 - {self.completed} completed"
+
+    class Meta:
+        ordering = ["-hour"]
+
+
+class DriverDailyStats(models.Model):
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+
+    completed = models.PositiveIntegerField(default=0)
+    busy_seconds = models.FloatField(default=0)           # assigned -> completed
+    earnings = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Driver #{self.driver_id} - {self.day}"
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(fields=["driver", "day"], name="driver_day_stats_unique"),
+        ]
+        indexes = [
+            # admin/stats: every driver's rows for the last N days
+            models.Index(fields=["day"], name="driver_stats_day_idx"),
+        ]
@@ -0,0 +1,112 @@
+"""
+Real-time notifications pushed over the channel layer.
+
+Drivers get new_ride on driver_{id}. Dashboards get incremental change
+events instead of polling: every ride change goes to admin_feed and to
+customer_{id}, every driver change goes to admin_feed.
+
+Views don't wait for the fan-out: they build the (group, message) pairs
+with the *_sends() helpers and hand them to the group_send job
+(api/jobs.py) with publish() / apublish().
+"""
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .jobs import aenqueue, enqueue, job
+from .serializers import DriverSerializer, RideRequestSerializer
+
+
+ADMIN_FEED_GROUP = "admin_feed"
+
+# What the admin dashboard shows about a driver (never the password hash);
+# updated_at lets it drop events that arrive after a newer one
+DRIVER_FEED_FIELDS = [
+    "id", "full_name", "phone", "email", "approval_status",
+    "is_available", "latitude", "longitude", "created_at", "updated_at",
+]
+
+
+async def agroup_send(group, message):
+    await get_channel_layer().group_send(group, message)
+
+
+def _group_send(group, message):
+    async_to_sync(agroup_send)(group, message)
+
+
+# ----------------------------------------------------------
+# DRIVER: NEW RIDE ASSIGNED
+# ----------------------------------------------------------
+def new_ride_event(ride):
+    """Payload delivered to DriverRideConsumer.new_ride."""
+    return {
+        "type": "new_ride",
+        "message": "New ride assigned!",
+        "ride_id": ride.id,
+        "pickup": ride.pickup_address,
+        "drop": ride.drop_address,
+        "assigned_at": time.time(),   # for the fan-out time; not sent to the app
+    }
+
+
+def notify_driver_new_ride(ride):
+    """Tell the assigned driver about a ride through its driver_{id} group."""
+    _group_send(f"driver_{ride.driver_id}", new_ride_event(ride))
+
+
+# ----------------------------------------------------------
+# DASHBOARDS: RIDE / DRIVER CHANGED
+# ----------------------------------------------------------
+def ride_changed_event(ride):
+    return {"type": "ride_changed", "ride": dict(RideRequestSerializer(ride).data)}
+
+
+def driver_changed_event(driver):
+    data = DriverSerializer(driver, fields=DRIVER_FEED_FIELDS).data
+    return {"type": "driver_changed", "driver": dict(data)}
+
+
+def publish_ride_changed(ride):
+    message = ride_changed_event(ride)
+    _group_send(ADMIN_FEED_GROUP, message)
+    _group_send(f"customer_{ride.customer_id}", message)
+
+
+def publish_driver_changed(driver):
+    _group_send(ADMIN_FEED_GROUP, driver_changed_event(driver))
+
+
+# ----------------------------------------------------------
+# FAN-OUT AS A BACKGROUND JOB
+# ----------------------------------------------------------
+GROUP_SEND_JOB = "group_send"
+
+
+def new_ride_sends(ride):
+    return [(f"driver_{ride.driver_id}", new_ride_event(ride))]
+
+
+def ride_changed_sends(ride):
+    message = ride_changed_event(ride)
+    return [(ADMIN_FEED_GROUP, message), (f"customer_{ride.customer_id}", message)]
+
+
+def driver_changed_sends(driver):
+    return [(ADMIN_FEED_GROUP, driver_changed_event(driver))]
+
+
+@job(GROUP_SEND_JOB)
+async def deliver_group_sends(sends):
+    for group, message in sends:
+        await agroup_send(group, message)
+
+
+def publish(*sends):
+    """Queue the fan-out of several *_sends() lists as one job, after commit."""
+    return enqueue(GROUP_SEND_JOB, sends=[pair for pairs in sends for pair in pairs])
+
+
+async def apublish(*sends):
+    return await aenqueue(GROUP_SEND_JOB, sends=[pair for pairs in sends for pair in pairs])
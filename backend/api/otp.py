@@ -0,0 +1,224 @@
+"""
+Phone OTP storage behind one small interface, with two backends:
+
+  "cache"  Django's cache: codes expire by TTL. The send and guess
+           counters are one PhoneOTPLimit row per phone, counted with
+           conditional UPDATEs: cache.incr() is a plain get + set on the
+           file and database caches, which also resets the timeout.
+  "db"     The PhoneOTP table: one row per send.
+
+`manage.py sweep_otps` bulk-deletes the rows of both once expired.
+
+Both throttle sends per phone: at most one every OTP_RESEND_SECONDS and
+OTP_SEND_LIMIT per OTP_SEND_WINDOW_SECONDS, answering 429 with the seconds
+left. A code takes OTP_MAX_ATTEMPTS guesses, then a new one must be sent.
+Pick one with OTP_STORE.
+"""
+import math
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, F, Max, Min, Q, Value, When
+from django.utils import timezone
+from rest_framework.exceptions import APIException, Throttled
+
+from .models import PhoneOTP, PhoneOTPLimit
+
+
+class OTPError(APIException):
+    status_code = 400
+    default_detail = "Invalid OTP"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def ttl_seconds():
+    return _setting("OTP_TTL_SECONDS", 600)
+
+
+def verified_ttl_seconds():
+    return _setting("OTP_VERIFIED_TTL_SECONDS", 3600)
+
+
+def max_attempts():
+    return _setting("OTP_MAX_ATTEMPTS", 5)
+
+
+def too_many_attempts():
+    return OTPError("Too many attempts, request a new OTP")
+
+
+def new_code():
+    return str(random.randint(1000, 9999))
+
+
+# ----------------------------------------------------------
+# CACHE BACKEND
+# ----------------------------------------------------------
+class CacheOTPStore:
+    CODE_KEY = "otp:code:{}"
+    VERIFIED_KEY = "otp:verified:{}"
+
+    def issue(self, phone):
+        self._throttle(phone)
+        code = new_code()
+        # Kept for two TTLs so a late verify reads "expired", not "not found"
+        cache.set(
+            self.CODE_KEY.format(phone),
+            {"otp": code, "created_at": timezone.now()},
+            2 * ttl_seconds(),
+        )
+        return code
+
+    def _throttle(self, phone):
+        now = timezone.now()
+        limit = _setting("OTP_SEND_LIMIT", 5)
+        window = timedelta(seconds=_setting("OTP_SEND_WINDOW_SECONDS", 3600))
+        resend = timedelta(seconds=_setting("OTP_RESEND_SECONDS", 30))
+
+        # A phone's first send finds an empty, already finished window
+        PhoneOTPLimit.objects.bulk_create(
+            [PhoneOTPLimit(phone=phone, window_ends=now, next_send=now)], ignore_conflicts=True
+        )
+        # One conditional UPDATE claims the send: concurrent sends can't
+        # both take the last one
+        finished = Q(window_ends__lte=now)
+        claimed = PhoneOTPLimit.objects.filter(
+            finished | Q(sends__lt=limit), phone=phone, next_send__lte=now
+        ).update(
+            sends=Case(When(finished, then=Value(1)), default=F("sends") + 1),
+            window_ends=Case(When(finished, then=Value(now + window)), default=F("window_ends")),
+            next_send=now + resend,
+            attempts=0,
+        )
+        if claimed:
+            return
+
+        row = PhoneOTPLimit.objects.get(phone=phone)
+        waits = [row.next_send - now]
+        if row.sends >= limit:
+            waits.append(row.window_ends - now)
+        raise Throttled(wait=max(1, math.ceil(max(waits).total_seconds())))
+
+    def verify(self, phone, code):
+        entry = cache.get(self.CODE_KEY.format(phone))
+        if entry is None:
+            raise OTPError("OTP not found")
+        if timezone.now() - entry["created_at"] > timedelta(seconds=ttl_seconds()):
+            raise OTPError("OTP expired")
+        # Counted before comparing, in one conditional UPDATE, so parallel
+        # guesses can't get past the limit
+        counted = PhoneOTPLimit.objects.filter(phone=phone, attempts__lt=max_attempts()).update(
+            attempts=F("attempts") + 1
+        )
+        if not counted:
+            cache.delete(self.CODE_KEY.format(phone))
+            raise too_many_attempts()
+        if code != entry["otp"]:
+            raise OTPError("Incorrect OTP")
+
+        cache.delete(self.CODE_KEY.format(phone))
+        cache.set(self.VERIFIED_KEY.format(phone), True, verified_ttl_seconds())
+
+    def is_verified(self, phone):
+        return bool(cache.get(self.VERIFIED_KEY.format(phone)))
+
+    def consume(self, phone):
+        """Forget the verification once it has been used to register."""
+        cache.delete(self.VERIFIED_KEY.format(phone))
+
+    @staticmethod
+    def sweep(batch_size=1000):
+        """Delete the counters of phones idle past their window and last code. Returns the number deleted."""
+        cutoff = timezone.now() - timedelta(seconds=ttl_seconds())
+        return _delete_in_batches(PhoneOTPLimit.objects.filter(window_ends__lt=cutoff), batch_size)
+
+
+# ----------------------------------------------------------
+# DATABASE BACKEND
+# ----------------------------------------------------------
+class DatabaseOTPStore:
+
+    def issue(self, phone):
+        self._throttle(phone)
+        code = new_code()
+        PhoneOTP.objects.create(phone=phone, otp=code)
+        return code
+
+    def _throttle(self, phone):
+        now = timezone.now()
+        window = _setting("OTP_SEND_WINDOW_SECONDS", 3600)
+        recent = PhoneOTP.objects.filter(
+            phone=phone, created_at__gte=now - timedelta(seconds=window)
+        ).aggregate(sends=Count("id"), first=Min("created_at"), last=Max("created_at"))
+
+        resend = _setting("OTP_RESEND_SECONDS", 30)
+        if recent["last"] and (now - recent["last"]).total_seconds() < resend:
+            raise Throttled(wait=math.ceil(resend - (now - recent["last"]).total_seconds()))
+        if recent["sends"] >= _setting("OTP_SEND_LIMIT", 5):
+            # Open again once the oldest send leaves the window
+            raise Throttled(wait=max(1, math.ceil(window - (now - recent["first"]).total_seconds())))
+
+    def verify(self, phone, code):
+        obj = PhoneOTP.objects.filter(phone=phone).order_by("-created_at").first()
+        if not obj:
+            raise OTPError("OTP not found")
+        if timezone.now() - obj.created_at > timedelta(seconds=ttl_seconds()):
+            raise OTPError("OTP expired")
+        # Counted and, if right, verified in one conditional UPDATE, so
+        # parallel guesses can't get past the limit
+        right = Q(otp=code)
+        counted = PhoneOTP.objects.filter(id=obj.id, attempts__lt=max_attempts()).update(
+            attempts=F("attempts") + 1,
+            is_verified=Case(When(right, then=Value(True)), default=F("is_verified")),
+            created_at=Case(When(right, then=Value(timezone.now())), default=F("created_at")),
+        )
+        if not counted:
+            raise too_many_attempts()
+        if code != obj.otp:
+            raise OTPError("Incorrect OTP")
+
+    def is_verified(self, phone):
+        since = timezone.now() - timedelta(seconds=verified_ttl_seconds())
+        return PhoneOTP.objects.filter(phone=phone, is_verified=True, created_at__gte=since).exists()
+
+    def consume(self, phone):
+        PhoneOTP.objects.filter(phone=phone).delete()
+
+    @staticmethod
+    def sweep(batch_size=1000):
+        """Delete expired rows in small batches. Returns the number deleted."""
+        keep = max(ttl_seconds(), verified_ttl_seconds())
+        cutoff = timezone.now() - timedelta(seconds=keep)
+        return _delete_in_batches(PhoneOTP.objects.filter(created_at__lt=cutoff), batch_size)
+
+
+def _delete_in_batches(queryset, batch_size):
+    queryset = queryset.order_by()
+    deleted = 0
+    while True:
+        # Short deletes by primary key keep row locks brief
+        ids = list(queryset.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+
+
+STORES = {
+    "cache": CacheOTPStore,
+    "db": DatabaseOTPStore,
+}
+
+_store = None
+
+
+def get_otp_store():
+    global _store
+    name = _setting("OTP_STORE", "cache")
+    if not isinstance(_store, STORES[name]):
+        _store = STORES[name]()
+    return _store
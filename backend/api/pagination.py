@@ -0,0 +1,163 @@
+"""
+Keyset (cursor) pagination and ?fields= projection for list endpoints.
+
+Lists are always ordered by (-created_at, -id), paged or not, and the
+cursor is the position of the last row of the previous page, so every page
+is one range scan no matter how deep the client pages. Pagination is opt-in: without ?limit or
+?cursor the endpoints keep returning the full list.
+
+A list can also take an Archive: rows moved out of the queryset into a
+table with the same columns and ordering (api/archive.py). Only pages read
+it: the archive page for the cursor is merged in once the hot page runs
+short or crosses its horizon. Full (unpaged) lists are the hot rows alone,
+so their size doesn't grow with the archive.
+"""
+import base64
+import heapq
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+KEYSET_ORDERING = ("-created_at", "-id")
+
+
+class Archive(NamedTuple):
+    queryset: Any        # same serializer fields as the hot queryset
+    horizon: datetime    # newest created_at in it
+
+
+# ----------------------------------------------------------
+# CURSOR ENCODING
+# ----------------------------------------------------------
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ParseError("Invalid cursor")
+
+    if created_at is None:
+        raise ParseError("Invalid cursor")
+    return created_at, pk
+
+
+# ----------------------------------------------------------
+# QUERY PARAMS
+# ----------------------------------------------------------
+def parse_fields(request, serializer_class):
+    """?fields=a,b,c -> list of serializer fields, or None for all fields."""
+    raw = request.query_params.get("fields")
+    if not raw:
+        return None
+
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    allowed = serializer_class().fields
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ParseError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ParseError("Invalid limit")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def wants_page(request):
+    return "cursor" in request.query_params or "limit" in request.query_params
+
+
+# ----------------------------------------------------------
+# LIST RESPONSE
+# ----------------------------------------------------------
+def list_response(request, queryset, serializer_class, archive=None):
+    """Serialize queryset with a ValuesListSerializer honouring ?fields=, ?limit= and ?cursor=."""
+    serializer, rows, older, limit = _list_query(request, queryset, serializer_class, archive)
+    rows = list(rows)
+    if _reaches_archive(rows, limit, archive):
+        rows = _merge(rows, list(older), limit)
+    return _list_body(serializer, rows, limit)
+
+
+async def alist_response(request, queryset, serializer_class, archive=None):
+    """list_response() for async views, fetching rows with the async ORM."""
+    serializer, rows, older, limit = _list_query(request, queryset, serializer_class, archive)
+    rows = [row async for row in rows]
+    if _reaches_archive(rows, limit, archive):
+        rows = _merge(rows, [row async for row in older], limit)
+    return _list_body(serializer, rows, limit)
+
+
+def _list_query(request, queryset, serializer_class, archive):
+    """-> (serializer, unevaluated rows, unevaluated archive rows or None, page limit or None)."""
+    serializer = serializer_class(fields=parse_fields(request, serializer_class))
+
+    if not wants_page(request):
+        return serializer, serializer.rows(queryset.order_by(*KEYSET_ORDERING)), None, None
+
+    cursor = request.query_params.get("cursor")
+    position = decode_cursor(cursor) if cursor else None
+    limit = parse_limit(request)
+
+    older = None
+    if archive is not None:
+        older = _page_rows(serializer, archive.queryset, position, limit)
+    return serializer, _page_rows(serializer, queryset, position, limit), older, limit
+
+
+def _page_rows(serializer, queryset, position, limit):
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    # created_at and id ride along at the end of each tuple for the cursor
+    return serializer.rows(queryset, extra=("created_at", "id"))[:limit + 1]
+
+
+def _reaches_archive(rows, limit, archive):
+    """Could archived rows be part of this page?"""
+    if archive is None or limit is None:
+        return False
+    if len(rows) <= limit:
+        return True
+    # Every archived row sorts after a hot row created past the horizon
+    return rows[-1][-2] <= archive.horizon
+
+
+def _merge(rows, older, limit):
+    return list(heapq.merge(rows, older, key=lambda row: row[-2:], reverse=True))[:limit + 1]
+
+
+def _list_body(serializer, rows, limit):
+    if limit is None:
+        return Response(serializer.serialize(rows))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+
+    return Response({
+        "results": serializer.serialize(rows),
+        "next_cursor": next_cursor,
+    })
@@ -0,0 +1,293 @@
+"""
+Driver presence: is the driver app actually connected right now?
+
+is_available is what the driver asked for; presence is whether the app is
+still there. DriverRideConsumer touches a driver on connect and on every
+PING and ends the entry on disconnect; a driver silent for
+PRESENCE_TTL_SECONDS is offline. Each touch records the connection it came
+from, and a disconnect only ends the entry if it is still that
+connection's, so a stale socket closing can't take a reconnected driver
+offline.
+
+The registry is a memory-mapped file, so every ASGI worker on the host
+reads and writes the same table and availability checks are a NumPy lookup
+instead of a query. A driver gets a slot (driver id, expiry time, connection
+id, a "dropped" flag) the first time it connects; slot 0 is a header holding the
+number of slots handed out. Slots are claimed under a file lock and never
+reused, and each process keeps its own id -> slot map, extended from the
+file when the header count moves. The file has PRESENCE_MAX_DRIVERS slots
+and never grows: once they are all taken, further drivers are simply not
+presence-managed (clear PRESENCE_FILE on deploy). Drivers without a slot,
+or that never opened the WebSocket (expires == 0), are left alone.
+
+reconcile() writes the changes back to is_available in bulk, one worker
+at a time under a file lock:
+
+  * available drivers that went silent -> is_available=False, flagged dropped
+  * dropped drivers that came back     -> is_available=True again, unless on a ride
+
+Only availability reconcile took away is given back: a driver who sets
+their own status meanwhile clears the flag (keep_status).
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+RECORD = np.dtype(
+    [("driver_id", "<i8"), ("expires", "<f8"), ("conn", "<i8"), ("dropped", "u1")], align=True
+)
+BATCH_SIZE = 1000   # ids per bulk UPDATE
+
+
+class PresenceRegistry:
+
+    def __init__(self, path, ttl, max_drivers):
+        self.path = path
+        self.ttl = ttl
+        self.max_drivers = max_drivers
+        self._table = None
+        self._slots = {}      # driver id -> slot, as far as this process has read
+        self._synced = 0      # slots read from the file so far
+        self._lock = threading.Lock()
+
+    # ---------- SHARED TABLE ----------
+    def _get_table(self):
+        table = self._table
+        if table is not None:
+            return table
+
+        with self._lock:
+            if self._table is None:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    needed = (self.max_drivers + 1) * RECORD.itemsize
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    try:
+                        size = os.fstat(fd).st_size
+                        if size < needed:
+                            os.ftruncate(fd, needed)
+                            size = needed
+                    finally:
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+                finally:
+                    os.close(fd)
+                self._table = np.memmap(self.path, dtype=RECORD, mode="r+", shape=(size // RECORD.itemsize,))
+            return self._table
+
+    def _used(self, table):
+        return int(table["driver_id"][0])
+
+    def _sync(self, table):
+        """Read slots other processes handed out since the last call."""
+        used = self._used(table)
+        if used > self._synced:
+            with self._lock:
+                ids = table["driver_id"][self._synced + 1:used + 1]
+                self._slots.update((int(driver_id), self._synced + 1 + i) for i, driver_id in enumerate(ids))
+                self._synced = max(self._synced, used)
+
+    def _slot(self, driver_id, claim=False):
+        """driver_id's slot; 0 (the header, never online) if it has none and claim is False or the file is full."""
+        slot = self._slots.get(driver_id)
+        if slot is not None:
+            return slot
+        table = self._get_table()
+        self._sync(table)
+        slot = self._slots.get(driver_id)
+        if slot is None and claim:
+            slot = self._claim(table, driver_id)
+        return slot or 0
+
+    def _claim(self, table, driver_id):
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self._sync(table)
+            if driver_id in self._slots:
+                return self._slots[driver_id]
+            used = self._used(table)
+            if used + 1 >= len(table):
+                logger.warning("presence: all %d slots taken, driver %s not tracked", used, driver_id)
+                return None
+            # The slot is written before the header count that publishes it
+            table["driver_id"][used + 1] = driver_id
+            table["driver_id"][0] = used + 1
+            self._sync(table)
+            return self._slots[driver_id]
+        finally:
+            os.close(fd)   # releases the lock
+
+    def _live(self, table):
+        """The slots handed out so far (a view, header excluded)."""
+        return table[1:self._used(table) + 1]
+
+    # ---------- CONSUMER SIDE ----------
+    def touch(self, driver_id, now=None, conn=0):
+        """Connect or heartbeat from connection conn: online for another TTL."""
+        slot = self._slot(driver_id, claim=True)
+        if slot:
+            table = self._get_table()
+            table["conn"][slot] = conn
+            table["expires"][slot] = (now or time.time()) + self.ttl
+
+    def leave(self, driver_id, conn=0, now=None):
+        """Disconnect: offline right away (reconcile picks it up), unless another connection touched since."""
+        slot = self._slot(driver_id)
+        table = self._get_table()
+        if slot and table["conn"][slot] == conn and table["expires"][slot] > 0:
+            table["expires"][slot] = now or time.time()
+
+    def keep_status(self, driver_id):
+        """The driver set is_available: reconcile must not restore what it took."""
+        slot = self._slot(driver_id)
+        if slot:
+            self._get_table()["dropped"][slot] = 0
+
+    # ---------- QUERIES ----------
+    def offline_mask(self, driver_ids, now=None):
+        """Boolean array: True where a presence-managed driver is not connected."""
+        slots = np.fromiter((self._slot(int(driver_id)) for driver_id in driver_ids), dtype=np.int64)
+        if not len(slots):
+            return np.zeros(0, dtype=bool)
+
+        records = self._get_table()[slots]
+        expires = records["expires"]
+        # Slot 0 (no slot) has expires == 0 and dropped == 0: never offline
+        return (expires <= (now or time.time())) & ((expires > 0) | (records["dropped"] == 1))
+
+    def is_offline(self, driver_id, now=None):
+        return bool(self.offline_mask([driver_id], now)[0])
+
+    def online_ids(self, now=None):
+        live = self._live(self._get_table())
+        return live["driver_id"][live["expires"] > (now or time.time())]
+
+    # ---------- WRITE-BACK TO is_available ----------
+    def reconcile(self, now=None):
+        """Bulk-update is_available from presence. Returns (went_offline, came_back) ids."""
+        lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return [], []   # another worker is reconciling
+            return self._reconcile(now or time.time())
+        finally:
+            os.close(lock_fd)   # releases the lock
+
+    def _reconcile(self, now):
+        from . import sync
+        from .models import Driver
+        from .notifications import DRIVER_FEED_FIELDS, driver_changed_sends, publish
+
+        table = self._live(self._get_table())
+        ids = np.array(table["driver_id"])
+        expires = np.array(table["expires"])   # snapshot
+        dropped = np.array(table["dropped"])
+        slot_of = {int(driver_id): slot for slot, driver_id in enumerate(ids)}
+        changed_at = timezone.now()
+
+        # Went silent since the last pass (pending, back: indexes into table)
+        pending = np.nonzero((expires > 0) & (expires <= now) & (dropped == 0))[0]
+        went_offline = []
+        for batch in _batches(ids[pending]):
+            went_offline += (
+                Driver.objects.filter(id__in=batch, is_available=True).values_list("id", flat=True)
+            )
+        for batch in _batches(went_offline):
+            Driver.objects.filter(id__in=batch, is_available=True).update(
+                is_available=False, updated_at=changed_at
+            )
+        table["dropped"][[slot_of[driver_id] for driver_id in went_offline]] = 1
+        # Forget the rest, unless they heartbeated since the snapshot
+        untouched = pending[table["expires"][pending] == expires[pending]]
+        table["expires"][untouched] = 0
+
+        # Dropped drivers that are connected again
+        back = np.nonzero((dropped == 1) & (expires > now))[0]
+        came_back = []
+        for batch in _batches(ids[back]):
+            came_back += (
+                Driver.objects.filter(id__in=batch, is_available=False, approval_status="APPROVED")
+                .exclude(rides__status__in=("ASSIGNED", "ONGOING"))
+                .values_list("id", flat=True)
+            )
+        # Read the flags again: a driver may have set their status since the snapshot
+        came_back = [driver_id for driver_id in came_back if table["dropped"][slot_of[driver_id]]]
+        for batch in _batches(came_back):
+            Driver.objects.filter(id__in=batch, is_available=False).update(
+                is_available=True, updated_at=changed_at
+            )
+        table["dropped"][back] = 0
+
+        changed = went_offline + came_back
+        if changed:
+            sync.bump(sync.DRIVERS_SCOPE)
+            drivers = Driver.objects.filter(id__in=changed).only(*DRIVER_FEED_FIELDS)
+            publish(*(driver_changed_sends(driver) for driver in drivers))
+        return went_offline, came_back
+
+
+def _batches(ids):
+    ids = [int(i) for i in ids]
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+_registry = None
+
+
+def get_presence():
+    """The process-wide registry, reopened if the settings changed."""
+    global _registry
+    path = getattr(settings, "PRESENCE_FILE", "/tmp/driverhiring-presence.bin")
+    ttl = getattr(settings, "PRESENCE_TTL_SECONDS", 45)
+    max_drivers = getattr(settings, "PRESENCE_MAX_DRIVERS", 100_000)
+
+    if _registry is None or (_registry.path, _registry.ttl, _registry.max_drivers) != (path, ttl, max_drivers):
+        _registry = PresenceRegistry(path, ttl, max_drivers)
+    return _registry
+
+
+def exclude_offline(driver_ids):
+    """The ids from driver_ids whose drivers are not known to be offline."""
+    driver_ids = list(driver_ids)
+    mask = get_presence().offline_mask(driver_ids)
+    return [driver_id for driver_id, offline in zip(driver_ids, mask) if not offline]
+
+
+# ----------------------------------------------------------
+# PERIODIC RECONCILE
+# ----------------------------------------------------------
+async def reconcile_loop(interval=None):
+    interval = interval or getattr(settings, "PRESENCE_RECONCILE_SECONDS", 10)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            went_offline, came_back = await sync_to_async(get_presence().reconcile)()
+            if went_offline or came_back:
+                logger.info("presence: %d drivers offline, %d back", len(went_offline), len(came_back))
+        except Exception:
+            logger.exception("presence reconcile failed")
+
+
+_reconcile_task = None
+
+
+def ensure_reconcile_loop():
+    """Start the reconcile loop on the running event loop, once per process."""
+    global _reconcile_task
+    if _reconcile_task is None or _reconcile_task.done():
+        _reconcile_task = asyncio.get_running_loop().create_task(reconcile_loop())
+    return _reconcile_task
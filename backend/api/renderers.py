@@ -0,0 +1,28 @@
+"""
+JSON renderer backed by orjson, several times faster than the stdlib
+encoder on large lists. Falls back to DRF's JSONRenderer when orjson is
+not installed.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+# DRF's encoder covers what orjson can't do natively (Decimal, lazy
+# strings, timedelta, ...)
+_fallback = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        # OPT_UTC_Z: "...Z" for UTC datetimes, same as DRF's encoder
+        return orjson.dumps(data, default=_fallback, option=orjson.OPT_UTC_Z)
@@ -0,0 +1,175 @@
+"""
+Ride state transitions as single conditional UPDATEs.
+
+Each transition is `UPDATE ... WHERE id = ... AND status = <expected>`,
+so the check and the write are one atomic statement and the row count says
+who won: two admins assigning the same driver, or a start racing a
+complete, can't both succeed. Reads happen only after a transition, to
+build the response, or after a failed one, to explain why it failed.
+
+Lock order is always driver row, then ride row (same as dispatch), so
+concurrent transitions can't deadlock each other.
+
+The a-prefixed coroutines are the same transitions for async views. Parts
+that need transaction.atomic() (sync only) run in one sync_to_async call.
+"""
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.utils import timezone
+from rest_framework.exceptions import APIException, PermissionDenied
+
+from . import rollups, sync
+from .models import Driver, RideRequest
+from .presence import get_presence
+
+
+class TransitionError(APIException):
+    """The row was not in the state the transition expects (400)."""
+    status_code = 400
+    default_detail = "Invalid ride state"
+
+
+# ----------------------------------------------------------
+# ASSIGN
+# ----------------------------------------------------------
+def assign_driver(ride_id, driver_id):
+    """REQUESTED -> ASSIGNED and claim the driver. Returns the ride with its driver."""
+    if _known_offline(driver_id):
+        get_object_or_404(RideRequest, id=ride_id)
+        raise TransitionError("Driver is offline")
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        claimed = Driver.objects.filter(
+            id=driver_id, is_available=True, approval_status="APPROVED"
+        ).update(is_available=False, updated_at=now)
+
+        assigned = claimed and RideRequest.objects.filter(
+            id=ride_id, status="REQUESTED", driver__isnull=True
+        ).update(driver_id=driver_id, status="ASSIGNED", assigned_at=now, updated_at=now)
+
+        if not assigned:
+            # Raising rolls back the driver claim as well
+            _explain_assign_failure(ride_id, driver_id)
+
+        ride = RideRequest.objects.select_related("driver").get(id=ride_id)
+        rollups.record(rollups.assigned_deltas(ride.created_at, now))
+
+    sync.bump(sync.DRIVERS_SCOPE, *sync.ride_scopes(ride))
+    return ride
+
+
+def _known_offline(driver_id):
+    """Presence says the driver app is gone (no query; unknown ids pass)."""
+    try:
+        return get_presence().is_offline(int(driver_id))
+    except (TypeError, ValueError):
+        return False
+
+
+def _explain_assign_failure(ride_id, driver_id):
+    ride = get_object_or_404(RideRequest, id=ride_id)
+    if ride.driver_id:
+        raise TransitionError("Ride already assigned")
+    if ride.status != "REQUESTED":
+        raise TransitionError("Ride not in requested state")
+
+    get_object_or_404(Driver, id=driver_id)
+    raise TransitionError("Driver not available")
+
+
+# ----------------------------------------------------------
+# START
+# ----------------------------------------------------------
+def start_ride(ride_id, driver_id=None):
+    """ASSIGNED -> ONGOING, only by driver_id if given. Returns the ride."""
+    now = timezone.now()
+
+    started = _startable(ride_id, driver_id).update(status="ONGOING", started_at=now, updated_at=now)
+    if not started:
+        _explain_start_failure(get_object_or_404(RideRequest, id=ride_id), driver_id)
+
+    ride = RideRequest.objects.get(id=ride_id)
+    rollups.record(rollups.started_deltas(ride.assigned_at, now))
+    sync.bump(*sync.ride_scopes(ride))
+    return ride
+
+
+def _startable(ride_id, driver_id):
+    # The owner check rides along in the UPDATE: no extra query
+    rides = RideRequest.objects.filter(id=ride_id, status="ASSIGNED")
+    return rides if driver_id is None else rides.filter(driver_id=driver_id)
+
+
+def _explain_start_failure(ride, driver_id):
+    _check_driver(ride, driver_id)
+    raise TransitionError("Ride not in assigned state")
+
+
+def _check_driver(ride, driver_id):
+    if driver_id is not None and ride.driver_id != driver_id:
+        raise PermissionDenied("Not your ride")
+
+
+# ----------------------------------------------------------
+# COMPLETE
+# ----------------------------------------------------------
+def complete_ride(ride_id, driver_id=None):
+    """ONGOING -> COMPLETED and free the driver, only by driver_id if given. Returns the ride with its driver."""
+    ride = _complete(ride_id, driver_id, timezone.now())
+    sync.bump(sync.DRIVERS_SCOPE, *sync.ride_scopes(ride))
+    return ride
+
+
+def _complete(ride_id, driver_id, now):
+    rides = RideRequest.objects.filter(id=ride_id, status="ONGOING")
+    if driver_id is not None:
+        rides = rides.filter(driver_id=driver_id)
+
+    with transaction.atomic():
+        Driver.objects.filter(id__in=rides.values("driver_id")).update(is_available=True, updated_at=now)
+        if not rides.update(status="COMPLETED", completed_at=now, updated_at=now):
+            # Raising rolls back the driver update as well
+            _explain_complete_failure(get_object_or_404(RideRequest, id=ride_id), driver_id)
+
+        # Read in the transaction, locked by the UPDATE: the times the
+        # rollups need are the ones this transition completed
+        ride = RideRequest.objects.select_related("driver").get(id=ride_id)
+        rollups.record(rollups.completed_deltas(
+            ride.driver_id, ride.assigned_at, ride.started_at, now, ride.estimated_fare
+        ))
+    return ride
+
+
+def _explain_complete_failure(ride, driver_id):
+    _check_driver(ride, driver_id)
+    raise TransitionError("Ride not started")
+
+
+# ----------------------------------------------------------
+# ASYNC VARIANTS
+# ----------------------------------------------------------
+async def aassign_driver(ride_id, driver_id):
+    # Claim + assign must share one transaction
+    return await sync_to_async(assign_driver)(ride_id, driver_id)
+
+
+async def astart_ride(ride_id, driver_id=None):
+    now = timezone.now()
+
+    started = await _startable(ride_id, driver_id).aupdate(status="ONGOING", started_at=now, updated_at=now)
+    if not started:
+        _explain_start_failure(await aget_object_or_404(RideRequest, id=ride_id), driver_id)
+
+    ride = await RideRequest.objects.aget(id=ride_id)
+    await rollups.arecord(rollups.started_deltas(ride.assigned_at, now))
+    await sync.abump(*sync.ride_scopes(ride))
+    return ride
+
+
+async def acomplete_ride(ride_id, driver_id=None):
+    ride = await sync_to_async(_complete)(ride_id, driver_id, timezone.now())
+    await sync.abump(sync.DRIVERS_SCOPE, *sync.ride_scopes(ride))
+    return ride
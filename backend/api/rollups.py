@@ -0,0 +1,238 @@
+"""
+Operational analytics kept as counters instead of scans.
+
+Every ride transition adds to two small tables: HourlyRideStats (one row
+per hour: transitions, summed waits and ride times, fares) and
+DriverDailyStats (one row per driver per day: completed rides, busy time,
+earnings). admin/stats/ then reads O(buckets) rows, never RideRequest.
+
+Each transition turns into a list of deltas, (model, key, {field: amount}).
+record() applies them as `UPDATE ... SET f = f + amount`, creating the
+bucket on first use; rebuild() (`manage.py rebuild_rollups`) sums the
+same deltas over the whole ride history, so both paths count identically.
+
+The UPDATEs run after the transition's transaction commits, each in its own
+statement: every transition in an hour hits the same HourlyRideStats row,
+and holding that row lock for the whole transaction would serialize them.
+
+Rides deleted or edited outside the transitions aren't seen here, nor
+deltas lost to a crash between the commit and record(); a rebuild puts the
+counters right again.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import DriverDailyStats, HourlyRideStats
+
+
+def hour_of(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def _seconds(start, end):
+    if start is None or end is None:
+        return 0.0
+    return max(0.0, (end - start).total_seconds())
+
+
+# ----------------------------------------------------------
+# DELTAS PER TRANSITION
+# ----------------------------------------------------------
+def requested_deltas(created_at):
+    return [(HourlyRideStats, {"hour": hour_of(created_at)}, {"requested": 1})]
+
+
+def assigned_deltas(created_at, assigned_at):
+    return [(HourlyRideStats, {"hour": hour_of(assigned_at)}, {
+        "assigned": 1,
+        "assign_wait_seconds": _seconds(created_at, assigned_at),
+    })]
+
+
+def started_deltas(assigned_at, started_at):
+    return [(HourlyRideStats, {"hour": hour_of(started_at)}, {
+        "started": 1,
+        "pickup_wait_seconds": _seconds(assigned_at, started_at),
+    })]
+
+
+def completed_deltas(driver_id, assigned_at, started_at, completed_at, fare):
+    fare = fare or Decimal("0")
+    deltas = [(HourlyRideStats, {"hour": hour_of(completed_at)}, {
+        "completed": 1,
+        "ride_seconds": _seconds(started_at, completed_at),
+        "fare_total": fare,
+    })]
+    if driver_id:
+        deltas.append((DriverDailyStats, {
+            "driver_id": driver_id, "day": timezone.localtime(completed_at).date(),
+        }, {
+            "completed": 1,
+            "busy_seconds": _seconds(assigned_at, completed_at),
+            "earnings": fare,
+        }))
+    return deltas
+
+
+def ride_deltas(created_at, assigned_at, started_at, completed_at, driver_id, fare):
+    """Every delta one ride has contributed so far (for rebuilds)."""
+    deltas = requested_deltas(created_at)
+    if assigned_at:
+        deltas += assigned_deltas(created_at, assigned_at)
+    if started_at:
+        deltas += started_deltas(assigned_at, started_at)
+    if completed_at:
+        deltas += completed_deltas(driver_id, assigned_at, started_at, completed_at, fare)
+    return deltas
+
+
+# ----------------------------------------------------------
+# APPLYING DELTAS
+# ----------------------------------------------------------
+def merge(deltas, into=None):
+    """Sum deltas per bucket: {(model, key items): {field: amount}}."""
+    buckets = into if into is not None else defaultdict(lambda: defaultdict(int))
+    for model, key, amounts in deltas:
+        bucket = buckets[(model, tuple(sorted(key.items())))]
+        for field, amount in amounts.items():
+            bucket[field] += amount
+    return buckets
+
+
+def record(*delta_lists):
+    """Add the deltas to their buckets once the current transaction commits: one UPDATE per bucket touched."""
+    buckets = merge(d for deltas in delta_lists for d in deltas)
+    # robust: the transition has committed, a failed counter must not fail it
+    transaction.on_commit(lambda: _apply(buckets), robust=True)
+
+
+def _apply(buckets):
+    for (model, key), amounts in buckets.items():
+        key = dict(key)
+        bucket = model.objects.filter(**key)
+        increments = {field: F(field) + amount for field, amount in amounts.items()}
+        if bucket.update(**increments):
+            continue
+        # First transition in this bucket: open it (a racing request may
+        # have just done so, hence ignore_conflicts) and add again
+        model.objects.bulk_create([model(**key)], ignore_conflicts=True)
+        bucket.update(**increments)
+
+
+async def arecord(*delta_lists):
+    await sync_to_async(record)(*delta_lists)
+
+
+# ----------------------------------------------------------
+# READING (admin/stats/)
+# ----------------------------------------------------------
+COUNTERS = ("requested", "assigned", "started", "completed")
+SUMMED = COUNTERS + ("assign_wait_seconds", "pickup_wait_seconds", "ride_seconds", "fare_total")
+
+
+def _avg(total, count):
+    return round(total / count, 1) if count else None
+
+
+def stats(hours, now=None, top_drivers=20):
+    """Dashboard numbers for the last `hours` hours, from the rollups only."""
+    now = now or timezone.now()
+    since = hour_of(now) - timedelta(hours=hours - 1)
+    since_day = timezone.localtime(since).date()
+
+    rows = list(
+        HourlyRideStats.objects.filter(hour__gte=since).order_by("hour").values("hour", *SUMMED)
+    )
+    window = {field: sum(row[field] for row in rows) for field in SUMMED}
+
+    # All-time counters give the current number of rides in each state
+    lifetime = HourlyRideStats.objects.aggregate(**{field: Sum(field) for field in COUNTERS})
+    lifetime = {field: value or 0 for field, value in lifetime.items()}
+
+    drivers = (
+        DriverDailyStats.objects.filter(day__gte=since_day, completed__gt=0)
+        .values("driver_id")
+        .annotate(completed=Sum("completed"), busy_seconds=Sum("busy_seconds"), earnings=Sum("earnings"))
+        .order_by("-completed", "driver_id")[:top_drivers]
+    )
+    days_seconds = ((timezone.localdate(now) - since_day).days + 1) * 86400
+
+    return {
+        "hours": hours,
+        "since": since,
+        "status_counts": {
+            "REQUESTED": max(0, lifetime["requested"] - lifetime["assigned"]),
+            "ASSIGNED": max(0, lifetime["assigned"] - lifetime["started"]),
+            "ONGOING": max(0, lifetime["started"] - lifetime["completed"]),
+            "COMPLETED": lifetime["completed"],
+        },
+        "totals": {
+            **{field: window[field] for field in COUNTERS},
+            "fare_total": window["fare_total"],
+            "avg_assign_wait_seconds": _avg(window["assign_wait_seconds"], window["assigned"]),
+            "avg_pickup_wait_seconds": _avg(window["pickup_wait_seconds"], window["started"]),
+            "avg_ride_seconds": _avg(window["ride_seconds"], window["completed"]),
+        },
+        "per_hour": [{"hour": row["hour"], **{field: row[field] for field in COUNTERS}} for row in rows],
+        "drivers": [
+            {**driver, "utilization": round(driver["busy_seconds"] / days_seconds, 3)}
+            for driver in drivers
+        ],
+    }
+
+
+def driver_totals(driver_id, now=None):
+    """A driver's completed rides and earnings (all time, today, last 7 days), archived rides included."""
+    today = timezone.localdate(now or timezone.now())
+    totals = DriverDailyStats.objects.filter(driver_id=driver_id).aggregate(
+        total_rides=Sum("completed"),
+        total_earnings=Sum("earnings"),
+        today_earnings=Sum("earnings", filter=Q(day=today)),
+        week_earnings=Sum("earnings", filter=Q(day__gt=today - timedelta(days=7))),
+    )
+    return {field: value or 0 for field, value in totals.items()}
+
+
+# ----------------------------------------------------------
+# REBUILD FROM HISTORY
+# ----------------------------------------------------------
+def rebuild(batch_size=5000):
+    """
+    Recompute both rollup tables from RideRequest and ArchivedRide. Rides
+    are streamed in id order, batch_size rows at a time, so memory holds
+    the buckets, not the rides. Returns (rides, buckets).
+    """
+    from .models import ArchivedRide, RideRequest
+
+    buckets = defaultdict(lambda: defaultdict(int))
+    rides = 0
+    for model in (RideRequest, ArchivedRide):
+        last_id = 0
+        while True:
+            batch = list(
+                model.objects.filter(id__gt=last_id).order_by("id").values_list(
+                    "id", "created_at", "assigned_at", "started_at", "completed_at", "driver_id", "estimated_fare",
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            for _, *fields in batch:
+                merge(ride_deltas(*fields), buckets)
+            rides += len(batch)
+            last_id = batch[-1][0]
+
+    rows = defaultdict(list)
+    for (model, key), amounts in buckets.items():
+        rows[model].append(model(**dict(key), **amounts))
+
+    with transaction.atomic():
+        for model in (HourlyRideStats, DriverDailyStats):
+            model.objects.all().delete()
+            model.objects.bulk_create(rows[model], batch_size=1000)
+    return rides, len(buckets)
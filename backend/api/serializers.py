@@ -1,11 +1,28 @@
+from django.db import models
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from .models import Driver, Customer, PhoneOTP, RideRequest
 
 
+# ----------------------------------------------------------
+# DYNAMIC FIELDS (?fields= PROJECTION)
+# ----------------------------------------------------------
+class DynamicFieldsMixin:
+    """Accepts fields=[...] to serialize only a subset of the fields."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 # ----------------------------------------------------------
 # DRIVER SERIALIZER
 # ----------------------------------------------------------
-class DriverSerializer(serializers.ModelSerializer):
+class DriverSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Driver
         fields = "__all__"
@@ -16,17 +33,22 @@ class DriverSerializer(serializers.ModelSerializer):
             "approval_status",
             "created_at",
         )
-
-    def validate_phone(self, value):
-        if Driver.objects.filter(phone=value).exists():
-            raise serializers.ValidationError("Phone number already registered.")
-        return value
+        # Single uniqueness check for phone (replaces the model's default one)
+        extra_kwargs = {
+            "phone": {"validators": [
+                UniqueValidator(Driver.objects.all(), message="Phone number already registered."),
+            ]},
+        }
 
     def create(self, validated_data):
         password = validated_data.pop("password", None)
+        # Views hash off the request thread and pass the result in
+        password_hash = validated_data.pop("password_hash", None)
         driver = Driver(**validated_data)
 
-        if password:
+        if password_hash:
+            driver.password = password_hash
+        elif password:
             driver.set_password(password)
 
         driver.save()
@@ -41,17 +63,21 @@ class CustomerSerializer(serializers.ModelSerializer):
         model = Customer
         fields = "__all__"
         read_only_fields = ("created_at",)
-
-    def validate_phone(self, value):
-        if Customer.objects.filter(phone=value).exists():
-            raise serializers.ValidationError("Phone number already registered.")
-        return value
+        extra_kwargs = {
+            "phone": {"validators": [
+                UniqueValidator(Customer.objects.all(), message="Phone number already registered."),
+            ]},
+        }
 
     def create(self, validated_data):
         password = validated_data.pop("password", None)
+        # Views hash off the request thread and pass the result in
+        password_hash = validated_data.pop("password_hash", None)
         customer = Customer(**validated_data)
 
-        if password:
+        if password_hash:
+            customer.password = password_hash
+        elif password:
             customer.set_password(password)
 
         customer.save()
@@ -70,7 +96,7 @@ class PhoneOTPSerializer(serializers.ModelSerializer):
 # ----------------------------------------------------------
 # RIDE REQUEST SERIALIZER
 # ----------------------------------------------------------
-class RideRequestSerializer(serializers.ModelSerializer):
+class RideRequestSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     # customer & driver assigned by backend, not form
     customer = serializers.PrimaryKeyRelatedField(read_only=True)
     driver = serializers.PrimaryKeyRelatedField(read_only=True)
@@ -79,9 +105,77 @@ class RideRequestSerializer(serializers.ModelSerializer):
         model = RideRequest
         fields = "__all__"
         read_only_fields = (
+            "estimated_fare",   # priced server-side, api/fares.py
             "status",
             "created_at",
             "assigned_at",
             "started_at",
             "completed_at",
         )
+
+
+# ----------------------------------------------------------
+# READ-ONLY LIST SERIALIZERS (.values_list() ROWS)
+# ----------------------------------------------------------
+class ValuesListSerializer:
+    """
+    Serializes a queryset straight from .values_list() tuples: no model
+    instances and no per-field serializer objects. Output matches the
+    ModelSerializer for the same fields (FKs as ids, decimals as strings);
+    datetimes are left to the renderer.
+    """
+    model = None
+    field_names = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.decimal_fields = {
+            f.name for f in cls.model._meta.concrete_fields
+            if isinstance(f, models.DecimalField)
+        }
+
+    def __init__(self, fields=None):
+        if fields is None:
+            self.fields = list(self.field_names)
+        else:
+            self.fields = [f for f in self.field_names if f in fields]
+
+    def rows(self, queryset, extra=()):
+        """Tuples of self.fields, followed by any extra columns."""
+        return queryset.values_list(*self.fields, *extra)
+
+    def serialize(self, rows):
+        names = self.fields
+        decimals = [i for i, name in enumerate(names) if name in self.decimal_fields]
+
+        data = []
+        for row in rows:
+            if decimals:
+                row = list(row)
+                for i in decimals:
+                    if row[i] is not None:
+                        row[i] = str(row[i])
+            # zip stops at len(names), dropping the extra columns
+            data.append(dict(zip(names, row)))
+        return data
+
+
+class DriverListSerializer(ValuesListSerializer):
+    # No password hash and no file URLs in lists
+    model = Driver
+    field_names = (
+        "id", "full_name", "email", "phone", "address", "experience_years",
+        "approval_status", "is_available", "latitude", "longitude",
+        "created_at", "updated_at",
+    )
+
+
+class RideListSerializer(ValuesListSerializer):
+    model = RideRequest
+    field_names = (
+        "id", "customer", "driver",
+        "pickup_address", "pickup_lat", "pickup_lng",
+        "drop_address", "drop_lat", "drop_lng",
+        "estimated_fare", "status",
+        "created_at", "assigned_at", "started_at", "completed_at", "updated_at",
+    )
@@ -0,0 +1,71 @@
+"""
+Bump the sync versions (api/sync.py) whenever rides or drivers are saved
+or deleted, and revoke the tokens (api/auth.py) of deleted accounts,
+rejected drivers and demoted admins. Bulk writes (queryset.update,
+bulk_update) send no signals and do both themselves.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import auth, sync
+from .models import ArchivedRide, Customer, Driver, RideRequest
+
+
+@receiver(post_save, sender=RideRequest)
+@receiver(post_delete, sender=RideRequest)
+@receiver(post_delete, sender=ArchivedRide)   # customer deletes cascade to the archive
+def ride_changed(sender, instance, **kwargs):
+    sync.bump(*sync.ride_scopes(instance))
+
+
+@receiver(post_save, sender=Driver)
+def driver_changed(sender, instance, **kwargs):
+    sync.bump(sync.DRIVERS_SCOPE)
+
+
+@receiver(post_delete, sender=Driver)
+def driver_removed(sender, instance, **kwargs):
+    sync.bump(sync.DRIVERS_SCOPE, sync.DRIVER_DELETES_SCOPE)
+
+
+@receiver(pre_delete, sender=Driver)
+def driver_deleting(sender, instance, **kwargs):
+    # SET_NULL rewrites this driver's rides with a bulk UPDATE
+    customer_ids = set(instance.rides.values_list("customer_id", flat=True))
+    customer_ids.update(instance.archived_rides.values_list("customer_id", flat=True))
+    sync.bump(
+        sync.RIDES_SCOPE,
+        sync.driver_rides_scope(instance.id),
+        *(sync.customer_rides_scope(cid) for cid in customer_ids),
+    )
+
+
+# ----------------------------------------------------------
+# TOKEN REVOCATION
+# ----------------------------------------------------------
+@receiver(post_save, sender=Driver)
+def driver_saved(sender, instance, **kwargs):
+    if instance.approval_status == "REJECTED":
+        auth.revoke(auth.DRIVER, instance.id)
+
+
+@receiver(post_delete, sender=Driver)
+def driver_deleted(sender, instance, **kwargs):
+    auth.revoke(auth.DRIVER, instance.id)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    auth.revoke(auth.CUSTOMER, instance.id)
+
+
+@receiver(post_save, sender=User)
+def admin_saved(sender, instance, **kwargs):
+    if not (instance.is_staff and instance.is_active):
+        auth.revoke(auth.ADMIN, instance.id)
+
+
+@receiver(post_delete, sender=User)
+def admin_deleted(sender, instance, **kwargs):
+    auth.revoke(auth.ADMIN, instance.id)
@@ -0,0 +1,188 @@
+"""
+Conditional GET (ETag / If-None-Match) and ?since= delta sync for lists.
+
+Every list belongs to a version scope ("rides", "rides:customer:7",
+"drivers", ...). A scope's version is the time in ns of its last committed
+change, kept in the shared cache, so the ETag costs one cache read instead
+of a query plus serializing the body. The same number comes back in
+X-Sync-Version and can be sent as ?since= to get only the rows changed
+after it.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+from . import listcache
+from .pagination import alist_response, list_response
+
+
+VERSION_KEY = "sync:version:{}"
+SYNC_VERSION_HEADER = "X-Sync-Version"
+
+RIDES_SCOPE = "rides"
+DRIVERS_SCOPE = "drivers"
+DRIVER_DELETES_SCOPE = "drivers:deletes"   # the geo index reloads in full (api/geo.py)
+
+
+def customer_rides_scope(customer_id):
+    return f"rides:customer:{customer_id}"
+
+
+def driver_rides_scope(driver_id):
+    return f"rides:driver:{driver_id}"
+
+
+def ride_scopes(ride):
+    """Every list a ride shows up in."""
+    scopes = [RIDES_SCOPE, customer_rides_scope(ride.customer_id)]
+    if ride.driver_id:
+        scopes.append(driver_rides_scope(ride.driver_id))
+    return scopes
+
+
+# ----------------------------------------------------------
+# VERSIONS
+# ----------------------------------------------------------
+def get_version(scope):
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        # First use or evicted: start from now, which no client can hold
+        # an ETag for, rather than from 0, which one might.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*scopes):
+    """get_version() of several scopes in one cache read -> {scope: version}."""
+    found = cache.get_many([VERSION_KEY.format(scope) for scope in scopes])
+    return {
+        scope: found.get(VERSION_KEY.format(scope)) or get_version(scope) for scope in scopes
+    }
+
+
+async def aget_version(scope):
+    return await sync_to_async(get_version)(scope)
+
+
+def bump(*scopes):
+    """Mark scopes as changed once the current transaction commits."""
+    transaction.on_commit(lambda: _set_versions(scopes))
+
+
+async def abump(*scopes):
+    """bump() for async code running outside a transaction."""
+    await sync_to_async(_set_versions)(scopes)
+
+
+def _set_versions(scopes):
+    # A fresh timestamp instead of incr(): two racing bumps can never
+    # leave the version at a value a client has already seen.
+    version = time.time_ns()
+    cache.set_many({VERSION_KEY.format(scope): version for scope in scopes}, None)
+
+
+# ----------------------------------------------------------
+# QUERY PARAMS
+# ----------------------------------------------------------
+def parse_since(request):
+    """?since=<ISO timestamp or X-Sync-Version> -> aware datetime, or None."""
+    raw = request.query_params.get("since")
+    if not raw:
+        return None
+
+    try:
+        if raw.isdigit():
+            return datetime.fromtimestamp(int(raw) / 1e9, tz=dt_timezone.utc)
+        since = parse_datetime(raw.replace(" ", "+"))   # "+" arrives as a space
+    except (ValueError, OverflowError, OSError):
+        # out of range versions, well-formed but impossible dates
+        raise ParseError("Invalid since")
+    if since is None:
+        raise ParseError("Invalid since")
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=dt_timezone.utc)
+    return since
+
+
+def make_etag(request, version):
+    # Same version, different query string or renderer -> different body
+    variant = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    digest = hashlib.md5(variant.encode()).hexdigest()[:8]
+    return f'W/"{version}-{digest}"'
+
+
+# ----------------------------------------------------------
+# CONDITIONAL LIST RESPONSE
+# ----------------------------------------------------------
+def conditional_list_response(request, queryset, serializer_class, scope, cache_body=False, **kwargs):
+    """
+    list_response() plus ETag / If-None-Match and ?since=. With cache_body,
+    full (not ?since=) bodies are rendered once per version (api/listcache.py).
+    """
+    # Read the version before the rows: a change that lands in between
+    # only costs the client one extra refetch, never a stale 304.
+    version = get_version(scope)
+    etag = make_etag(request, version)
+
+    if _not_modified(request, etag):
+        response = Response(status=304)
+    elif cache_body and parse_since(request) is None:
+        body = listcache.cached(
+            scope, version, request.get_full_path(),
+            lambda: listcache.render(list_response(request, queryset, serializer_class, **kwargs).data),
+        )
+        response = listcache.response(request, body)
+    else:
+        queryset, kwargs = _changed_since(request, queryset, **kwargs)
+        response = list_response(request, queryset, serializer_class, **kwargs)
+    return _tag(response, etag, version)
+
+
+async def aconditional_list_response(request, queryset, serializer_class, scope, **kwargs):
+    """conditional_list_response() for async views."""
+    version = await aget_version(scope)
+    etag = make_etag(request, version)
+
+    if _not_modified(request, etag):
+        response = Response(status=304)
+    else:
+        queryset, kwargs = _changed_since(request, queryset, **kwargs)
+        response = await alist_response(request, queryset, serializer_class, **kwargs)
+    return _tag(response, etag, version)
+
+
+def _not_modified(request, etag):
+    return etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+
+
+def _changed_since(request, queryset, **kwargs):
+    """-> (queryset, list_response kwargs), both filtered by ?since=."""
+    since = parse_since(request)
+    if since is None:
+        return queryset, kwargs
+    # updated_at is stamped before commit, the version after it;
+    # the overlap re-sends rows whose commit straddled the last sync.
+    overlap = getattr(settings, "SYNC_SINCE_OVERLAP_SECONDS", 5)
+    changed = {"updated_at__gt": since - timedelta(seconds=overlap)}
+
+    archive = kwargs.get("archive")
+    if archive is not None:
+        kwargs["archive"] = archive._replace(queryset=archive.queryset.filter(**changed))
+    return queryset.filter(**changed), kwargs
+
+
+def _tag(response, etag, version):
+    response["ETag"] = etag
+    response[SYNC_VERSION_HEADER] = str(version)
+    return response
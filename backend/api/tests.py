@@ -1,3 +1,1134 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections
+from django.db.models import F
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import Throttled
+from rest_framework_simplejwt.tokens import RefreshToken
+from driverhiring.routing import websocket_urlpatterns
+
+from . import urls as api_urls
+from .archive import archive_rides, horizon as archive_horizon
+from .bulk import CustomerImporter, DriverImporter, RideImporter, read_rows
+from .dispatch import candidate_matrix, run_dispatch_cycle
+from .fares import Tariff, quote_ride
+from .geo import driver_index, haversine_km
+from .jobs import JOBS, JobRunner
+from . import auth, metrics, sync
+from .admin import reject_drivers
+from .metrics import ConsumerMetrics, RequestMetrics
+from .models import (
+    Customer, Driver, DriverDailyStats, HourlyRideStats, OutboxJob, PhoneOTP, PhoneOTPLimit,
+    RideRequest,
+)
+from .notifications import GROUP_SEND_JOB, publish
+from .presence import RECORD, get_presence
+from .rides import TransitionError, assign_driver
+from .rollups import hour_of, rebuild
+from .otp import STORES, CacheOTPStore, DatabaseOTPStore, OTPError, get_otp_store
+from .views import get_tokens_for_user
+
+
+# ----------------------------------------------------------
+# QUERY BUDGETS
+# ----------------------------------------------------------
+# Maximum number of SQL queries per request, keyed by the route in
+# api/urls.py. Every route must have a budget; raising one should be a
+# deliberate decision made in review.
+QUERY_BUDGETS = {
+    "register-driver/": 5,   # db OTP store: verified check + consume
+    "register-customer/": 3,
+    "login-driver/": 1,
+    "login-customer/": 1,
+    "login-admin/": 1,
+    "send-otp/": 3,   # cache store: counter INSERT + claim UPDATE, +1 read when throttled
+    "verify-otp/": 2,
+    "admin/driver/<int:driver_id>/approve/": 3,   # each side-effect: +1 outbox INSERT
+    "driver/<int:driver_id>/status/": 3,
+    "rides/create/": 4,   # +1 per rollup bucket (see open_rollup_buckets)
+    "rides/available-drivers/": 1,
+    "rides/nearby-drivers/": 2,
+    "rides/quote/": 0,
+    "rides/<int:ride_id>/assign/": 7,     # incl. SAVEPOINT / RELEASE
+    "rides/<int:ride_id>/start/": 4,
+    "rides/<int:ride_id>/complete/": 8,   # incl. SAVEPOINT / RELEASE
+    "customer/<int:customer_id>/rides/": 2,   # +1 once a page reaches the archive
+    "driver/<int:driver_id>/rides/": 2,
+    "driver/<int:driver_id>/stats/": 1,
+    "rides/": 2,
+    "rides/export/": 2,   # +2 per RIDE_EXPORT_BATCH_SIZE rows
+    "drivers/": 1,
+    "admin/jobs/": 1,
+    "admin/stats/": 3,
+    "metrics/": 0,
+}
+
+ADMIN_CHANGELIST_BUDGET = 5
+
+
+class QueryBudgetMixin:
+    def assertMaxQueries(self, budget, func, *args, **kwargs):
+        # Work deferred to on_commit (rollups, job hand-off) is part of the request
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            response = func(*args, **kwargs)
+
+        queries = "\n".join(q["sql"] for q in ctx.captured_queries)
+        self.assertLessEqual(
+            len(ctx.captured_queries), budget,
+            f"{len(ctx.captured_queries)} queries, budget is {budget}:\n{queries}",
+        )
+        return response
+
+
+# Keep OTPs, throttles and sync versions out of the shared file cache
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# The deployed backend, whose incr() is a plain get + set that resets the timeout
+FILE_CACHES = {"default": {
+    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+    "LOCATION": os.path.join(tempfile.gettempdir(), f"driverhiring-cache-test-{os.getpid()}"),
+}}
+
+# ... and driver presence and request metrics out of the live ones
+TEST_PRESENCE_FILE = os.path.join(tempfile.gettempdir(), f"driverhiring-presence-test-{os.getpid()}.bin")
+TEST_METRICS_DIR = os.path.join(tempfile.gettempdir(), f"driverhiring-metrics-test-{os.getpid()}")
+
+
+@override_settings(
+    CACHES=TEST_CACHES, PASSWORD_HASH_WORKERS=0,
+    PRESENCE_FILE=TEST_PRESENCE_FILE, METRICS_DIR=TEST_METRICS_DIR,
+)
+class APIQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("admin", password="admin-pass", is_staff=True)
+
+        cls.customer = Customer(full_name="Customer", email="c@example.com", phone="9000000001")
+        cls.customer.set_password("cust-pass")
+        cls.customer.save()
+
+        cls.drivers = []
+        for i in range(10):
+            driver = Driver(
+                full_name=f"Driver {i}",
+                email=f"d{i}@example.com",
+                phone=f"80000000{i:02d}",
+                approval_status="APPROVED",
+                is_available=True,
+                latitude=17.38 + i * 0.001,
+                longitude=78.48,
+            )
+            driver.set_password("driver-pass")
+            driver.save()
+            cls.drivers.append(driver)
+
+        cls.rides = [
+            RideRequest.objects.create(
+                customer=cls.customer,
+                driver=cls.drivers[i % 3],
+                pickup_address=f"Pickup {i}",
+                drop_address=f"Drop {i}",
+                status="COMPLETED",
+            )
+            for i in range(10)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        driver_index.invalidate()
+        self.open_rollup_buckets()
+        archive_horizon()   # cached by the first history request
+        self.admin_auth = self.auth(self.admin)
+
+    def auth(self, user):
+        return {"HTTP_AUTHORIZATION": f"Bearer {get_tokens_for_user(user)['access']}"}
+
+    def open_rollup_buckets(self):
+        # The first transition in a new hour / driver-day bucket costs two
+        # more queries; budgets are for the steady state
+        now = timezone.now()
+        HourlyRideStats.objects.bulk_create(
+            [HourlyRideStats(hour=hour_of(now + timedelta(hours=h))) for h in (0, 1)]
+        )
+        DriverDailyStats.objects.bulk_create([
+            DriverDailyStats(driver=driver, day=timezone.localdate(now) + timedelta(days=d))
+            for driver in self.drivers for d in (0, 1)
+        ])
+
+    def url(self, route, **kwargs):
+        path = route
+        for name, value in kwargs.items():
+            path = path.replace(f"<int:{name}>", str(value))
+        return "/api/" + path
+
+    def post(self, route, data=None, **kwargs):
+        route_kwargs = {k: v for k, v in kwargs.items() if not k.startswith("HTTP_")}
+        headers = {k: v for k, v in kwargs.items() if k.startswith("HTTP_")}
+        return self.assertMaxQueries(
+            QUERY_BUDGETS[route],
+            self.client.post, self.url(route, **route_kwargs), data or {}, **headers,
+        )
+
+    def get(self, route, query="", **kwargs):
+        route_kwargs = {k: v for k, v in kwargs.items() if not k.startswith("HTTP_")}
+        headers = {k: v for k, v in kwargs.items() if k.startswith("HTTP_")}
+        return self.assertMaxQueries(
+            QUERY_BUDGETS[route],
+            self.client.get, self.url(route, **route_kwargs) + query, **headers,
+        )
+
+    # ---------- COVERAGE ----------
+    def test_every_route_has_a_budget(self):
+        routes = {str(p.pattern) for p in api_urls.urlpatterns}
+        self.assertEqual(routes - set(QUERY_BUDGETS), set(), "route without a query budget")
+        self.assertEqual(set(QUERY_BUDGETS) - routes, set(), "budget for a removed route")
+
+    # ---------- REGISTRATION / LOGIN / OTP ----------
+    def test_register_driver(self):
+        for i, store in enumerate(STORES):
+            with self.subTest(store=store), self.settings(OTP_STORE=store):
+                phone = f"700000001{i}"
+                get_otp_store().verify(phone, get_otp_store().issue(phone))
+
+                response = self.post("register-driver/", {
+                    "full_name": "New Driver",
+                    "email": f"new{i}@example.com",
+                    "phone": phone,
+                    "password": "secret",
+                })
+                self.assertEqual(response.status_code, 201)
+                self.assertFalse(get_otp_store().is_verified(phone))
+
+    def test_register_customer(self):
+        response = self.post("register-customer/", {
+            "full_name": "New Customer",
+            "email": "newc@example.com",
+            "phone": "7000000002",
+            "password": "secret",
+        })
+        self.assertEqual(response.status_code, 201)
+
+    def test_login_driver(self):
+        response = self.post("login-driver/", {"phone": self.drivers[0].phone, "password": "driver-pass"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_customer(self):
+        response = self.post("login-customer/", {"phone": self.customer.phone, "password": "cust-pass"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_register_then_login_customer(self):
+        self.post("register-customer/", {
+            "full_name": "New Customer",
+            "email": "newc@example.com",
+            "phone": "7000000002",
+            "password": "secret",
+        })
+        response = self.post("login-customer/", {"phone": "7000000002", "password": "secret"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_rejected_when_hashing_pool_is_full(self):
+        with self.settings(PASSWORD_HASH_MAX_PENDING=0):
+            response = self.post("login-driver/", {"phone": self.drivers[0].phone, "password": "driver-pass"})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_login_admin(self):
+        response = self.post("login-admin/", {"username": "admin", "password": "admin-pass"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_send_and_verify_otp(self):
+        for i, store in enumerate(STORES):
+            with self.subTest(store=store), self.settings(OTP_STORE=store):
+                phone = f"700000003{i}"
+                response = self.post("send-otp/", {"phone": phone})
+                self.assertEqual(response.status_code, 200)
+                code = response.json()["otp"]
+
+                response = self.post("send-otp/", {"phone": phone})
+                self.assertEqual(response.status_code, 429)   # resend too soon
+
+                response = self.post("verify-otp/", {"phone": phone, "otp": "x"})
+                self.assertEqual(response.json()["detail"], "Incorrect OTP")
+
+                response = self.post("verify-otp/", {"phone": phone, "otp": code})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(get_otp_store().is_verified(phone))
+
+    @override_settings(CACHES=FILE_CACHES)
+    def test_otp_guesses_and_send_window(self):
+        cache.clear()
+        settings = {"OTP_MAX_ATTEMPTS": 2, "OTP_SEND_LIMIT": 2, "OTP_SEND_WINDOW_SECONDS": 3600}
+        for i, store in enumerate(STORES):
+            with self.subTest(store=store), self.settings(OTP_STORE=store, **settings):
+                phone = f"700000005{i}"
+                code = get_otp_store().issue(phone)
+                for _ in range(2):
+                    with self.assertRaisesMessage(OTPError, "Incorrect OTP"):
+                        get_otp_store().verify(phone, "x")
+                with self.assertRaisesMessage(OTPError, "Too many attempts"):
+                    get_otp_store().verify(phone, code)   # the right code, too late
+                self.assertFalse(get_otp_store().is_verified(phone))
+
+                # Ten minutes on, the second send of the window goes out and
+                # the third waits fifty minutes, not sixty
+                later = timezone.now() + timedelta(minutes=10)
+                with mock.patch("time.time", return_value=time.time() + 600), \
+                        mock.patch("django.utils.timezone.now", return_value=later):
+                    get_otp_store().issue(phone)
+                    with self.assertRaises(Throttled) as caught:
+                        get_otp_store().issue(phone)
+                self.assertAlmostEqual(caught.exception.wait, 3000, delta=5)
+
+    def test_sweep_expired_otps(self):
+        old = timezone.now() - timezone.timedelta(days=1)
+        PhoneOTP.objects.bulk_create([PhoneOTP(phone="7000000004", otp="1234", created_at=old)] * 3)
+        PhoneOTP.objects.create(phone="7000000004", otp="1234")
+
+        self.assertEqual(DatabaseOTPStore.sweep(batch_size=2), 3)
+        self.assertEqual(PhoneOTP.objects.count(), 1)
+
+        PhoneOTPLimit.objects.bulk_create([
+            PhoneOTPLimit(phone=phone, window_ends=ends, next_send=ends)
+            for phone, ends in [("7000000004", old), ("7000000005", timezone.now())]
+        ])
+        self.assertEqual(CacheOTPStore.sweep(batch_size=2), 1)
+        self.assertEqual(PhoneOTPLimit.objects.get().phone, "7000000005")
+
+    # ---------- DRIVER MANAGEMENT ----------
+    def test_approve_driver(self):
+        response = self.post(
+            "admin/driver/<int:driver_id>/approve/", {"action": "reject"},
+            driver_id=self.drivers[5].id, **self.admin_auth,
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_driver_status(self):
+        response = self.post(
+            "driver/<int:driver_id>/status/",
+            {"is_available": "true", "latitude": "17.400000", "longitude": "78.500000"},
+            driver_id=self.drivers[4].id, **self.auth(self.drivers[4]),
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # Only the driver itself (or an admin)
+        url = self.url("driver/<int:driver_id>/status/", driver_id=self.drivers[4].id)
+        response = self.client.post(url, {"is_available": "false"}, **self.auth(self.drivers[5]))
+        self.assertEqual(response.status_code, 403)
+
+    # ---------- RIDE LIFECYCLE ----------
+    def test_ride_lifecycle(self):
+        response = self.post("rides/create/", {
+            "customer_id": self.customer.id,
+            "pickup_address": "A",
+            "drop_address": "B",
+        })
+        self.assertEqual(response.status_code, 201)
+        ride_id = response.json()["id"]
+        driver = self.drivers[9]
+
+        response = self.post(
+            "rides/<int:ride_id>/assign/", {"driver_id": driver.id},
+            ride_id=ride_id, **self.admin_auth,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # Only the assigned driver may start and complete it
+        for route in ("rides/<int:ride_id>/start/", "rides/<int:ride_id>/complete/"):
+            response = self.client.post(self.url(route, ride_id=ride_id), **self.auth(self.drivers[8]))
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(self.client.post(self.url(route, ride_id=ride_id)).status_code, 401)
+
+        response = self.post("rides/<int:ride_id>/start/", ride_id=ride_id, **self.auth(driver))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.post("rides/<int:ride_id>/complete/", ride_id=ride_id, **self.auth(driver))
+        self.assertEqual(response.status_code, 200)
+
+        # Every step left its WebSocket fan-out in the outbox
+        self.assertEqual(OutboxJob.objects.filter(name=GROUP_SEND_JOB, status="PENDING").count(), 4)
+
+        stats = self.get("admin/stats/", "?hours=1", **self.admin_auth).json()
+        self.assertEqual(
+            [stats["totals"][f] for f in ("requested", "assigned", "started", "completed")], [1, 1, 1, 1]
+        )
+        self.assertEqual(stats["status_counts"]["ONGOING"], 0)
+        self.assertEqual([d["driver_id"] for d in stats["drivers"]], [driver.id])
+
+        # The driver app's totals come from the same rollups
+        route = "driver/<int:driver_id>/stats/"
+        stats = self.get(route, driver_id=driver.id, **self.auth(driver)).json()
+        self.assertEqual((stats["total_rides"], stats["today_earnings"]), (1, stats["total_earnings"]))
+        self.assertEqual(self.client.get(self.url(route, driver_id=driver.id), **self.auth(self.drivers[8])).status_code, 403)
+
+    @override_settings(FARE_TARIFF={
+        "base": 50, "per_km": 10, "per_minute": 2, "minimum": 80,
+        "road_factor": 1.0, "avg_speed_kmh": 30, "time_of_day": [(0, 24, 1.5)],
+    })
+    def test_quote_fares(self):
+        pairs = [[17.38, 78.48, 17.48, 78.48], [17.38, 78.48, 17.38, 78.48]]
+        response = self.assertMaxQueries(
+            QUERY_BUDGETS["rides/quote/"], self.client.post,
+            "/api/rides/quote/", {"pairs": pairs}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+
+        km = haversine_km(*pairs[0])
+        self.assertAlmostEqual(body["distance_km"][0], km, places=2)
+        self.assertAlmostEqual(body["fare"][0], (50 + 10 * km + 2 * km * 2) * 1.5, places=1)
+        self.assertEqual(body["fare"][1], 80)   # minimum fare
+
+        response = self.client.post(
+            "/api/rides/quote/", {"pairs": [[91, 0, 0, 0]]}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_tariff_bands_wrap_midnight(self):
+        tariff = Tariff({"time_of_day": [(22, 6, 1.5), (8, 11, 1.2)]})
+        self.assertEqual(
+            list(tariff.hour_multipliers),
+            [1.5] * 6 + [1.0] * 2 + [1.2] * 3 + [1.0] * 11 + [1.5] * 2,
+        )
+        for band in [(-1, 6, 1.5), (22, 25, 1.5)]:
+            with self.assertRaises(ImproperlyConfigured):
+                Tariff({"time_of_day": [band]})
+
+    def test_create_ride_prices_fare(self):
+        response = self.post("rides/create/", {
+            "customer_id": self.customer.id,
+            "pickup_address": "A", "pickup_lat": "17.380000", "pickup_lng": "78.480000",
+            "drop_address": "B", "drop_lat": "17.480000", "drop_lng": "78.480000",
+            "estimated_fare": "1.00",   # ignored
+        })
+        fare = RideRequest.objects.get(id=response.json()["id"]).estimated_fare
+        self.assertEqual(fare, quote_ride(17.38, 78.48, 17.48, 78.48))
+        self.assertGreater(fare, 80)
+
+    def test_available_drivers(self):
+        response = self.get("rides/available-drivers/")
+        self.assertEqual(len(response.json()["drivers"]), 10)
+
+    def test_driver_lists_cached_until_drivers_change(self):
+        def available():
+            return len(self.client.get("/api/rides/available-drivers/").json()["drivers"])
+
+        self.assertEqual(available(), 10)
+        with self.assertNumQueries(0):
+            self.assertEqual(available(), 10)
+
+        # post_save, then an admin action's bulk update
+        with self.captureOnCommitCallbacks(execute=True):
+            self.drivers[0].is_available = False
+            self.drivers[0].save()
+        self.assertEqual(available(), 9)
+        with self.captureOnCommitCallbacks(execute=True):
+            reject_drivers(None, None, Driver.objects.filter(id=self.drivers[1].id))
+        self.assertEqual(available(), 8)
+
+    def test_nearby_drivers(self):
+        driver_index.invalidate()
+        self.client.get("/api/rides/nearby-drivers/?lat=17.38&lng=78.48")  # warm the index
+
+        response = self.get("rides/nearby-drivers/", "?lat=17.38&lng=78.48&k=5")
+        self.assertEqual(len(response.json()["drivers"]), 5)
+
+    def test_nearby_drivers_follow_changes_from_other_processes(self):
+        def nearby():
+            response = self.client.get("/api/rides/nearby-drivers/?lat=17.38&lng=78.48&k=20")
+            return {driver["id"] for driver in response.json()["drivers"]}
+
+        self.assertEqual(len(nearby()), 10)
+        # Written elsewhere: no signal, no version bump yet -> rows re-checked
+        Driver.objects.filter(id=self.drivers[0].id).update(is_available=False, updated_at=timezone.now())
+        self.assertNotIn(self.drivers[0].id, nearby())
+        # ... and the bump brings the index up to date with the changed rows only
+        Driver.objects.filter(id=self.drivers[0].id).update(is_available=True, updated_at=timezone.now())
+        with self.captureOnCommitCallbacks(execute=True):
+            Driver.objects.filter(id=self.drivers[1].id).update(
+                approval_status="REJECTED", updated_at=timezone.now()
+            )
+            sync.bump(sync.DRIVERS_SCOPE)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(nearby(), {driver.id for driver in self.drivers[:1] + self.drivers[2:]})
+        self.assertIn('"updated_at" >', queries[0]["sql"])
+        self.assertNotIn(self.drivers[1].id, dict(driver_index.nearest(17.38, 78.48, k=20)))
+
+        # A delete leaves no row to read: the whole index is reloaded
+        with self.captureOnCommitCallbacks(execute=True):
+            self.drivers[2].delete()
+        self.assertNotIn(self.drivers[2].id, nearby())
+        self.assertNotIn(self.drivers[2].id, dict(driver_index.nearest(17.38, 78.48, k=20)))
+
+    # ---------- HISTORY / ADMIN LISTS ----------
+    def test_customer_rides(self):
+        response = self.get("customer/<int:customer_id>/rides/", customer_id=self.customer.id)
+        self.assertEqual(len(response.json()), 10)
+
+    def test_customer_rides_page(self):
+        response = self.get("customer/<int:customer_id>/rides/", "?limit=4", customer_id=self.customer.id)
+        self.assertEqual(len(response.json()["results"]), 4)
+
+    def test_customer_rides_not_modified(self):
+        first = self.get("customer/<int:customer_id>/rides/", customer_id=self.customer.id)
+        response = self.get(
+            "customer/<int:customer_id>/rides/", customer_id=self.customer.id,
+            HTTP_IF_NONE_MATCH=first["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rides[0].save()
+        response = self.get(
+            "customer/<int:customer_id>/rides/", customer_id=self.customer.id,
+            HTTP_IF_NONE_MATCH=first["ETag"],
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_customer_rides_since(self):
+        RideRequest.objects.filter(customer=self.customer).update(
+            updated_at=timezone.now() - timezone.timedelta(hours=1)
+        )
+        url = self.url("customer/<int:customer_id>/rides/", customer_id=self.customer.id)
+        version = self.client.get(url)["X-Sync-Version"]
+        self.rides[3].save()
+
+        response = self.get(
+            "customer/<int:customer_id>/rides/", f"?since={version}", customer_id=self.customer.id
+        )
+        self.assertEqual([r["id"] for r in response.json()], [self.rides[3].id])
+
+        for since in ("9" * 30, "2024-13-45T00:00", "yesterday"):
+            response = self.client.get(url, {"since": since})
+            self.assertEqual((response.status_code, response.json()["detail"]), (400, "Invalid since"))
+
+    def test_customer_rides_page_into_archive(self):
+        old = timezone.now() - timedelta(days=40)
+        for i, ride in enumerate(self.rides[:5]):
+            RideRequest.objects.filter(id=ride.id).update(
+                created_at=old + timedelta(minutes=i), updated_at=old + timedelta(days=5)
+            )
+        route = "customer/<int:customer_id>/rides/"
+        expected = [r["id"] for r in self.get(route, customer_id=self.customer.id).json()]
+
+        self.assertEqual(archive_rides(days=30, batch_size=2), 5)
+        self.assertEqual(RideRequest.objects.count(), 5)
+
+        # Recent pages never touch the archive
+        with self.assertNumQueries(1):
+            self.client.get(self.url(route, customer_id=self.customer.id) + "?limit=3")
+
+        ids, query = [], "?limit=3"
+        while True:
+            page = self.get(route, query, customer_id=self.customer.id).json()
+            ids += [r["id"] for r in page["results"]]
+            if not page["next_cursor"]:
+                break
+            query = f"?limit=3&cursor={page['next_cursor']}"
+        self.assertEqual(ids, expected)
+        # Without a page size only the live rides, never the whole archive
+        full = self.get(route, customer_id=self.customer.id).json()
+        self.assertEqual([r["id"] for r in full], expected[:5])
+
+        # The rollups still count the archived rides
+        self.assertEqual(rebuild()[0], 10)
+
+    def test_driver_rides(self):
+        response = self.get("driver/<int:driver_id>/rides/", driver_id=self.drivers[0].id)
+        self.assertEqual(response.status_code, 200)
+
+    def test_all_rides(self):
+        response = self.get("rides/", **self.admin_auth)
+        self.assertEqual(len(response.json()), 10)
+
+    def test_export_rides(self):
+        # Through the ASGI handler, as deployed, reading the chunks as they come
+        async def aexport(query):
+            response = await self.async_client.get(
+                self.url("rides/export/") + query,
+                headers={"Authorization": self.admin_auth["HTTP_AUTHORIZATION"]},
+            )
+            self.assertTrue(response.is_async)
+            response.body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+            return response
+
+        export = async_to_sync(aexport)
+
+        # Half the rides live, half archived
+        RideRequest.objects.filter(id__in=[r.id for r in self.rides[:5]]).update(status="ASSIGNED")
+        self.assertEqual(archive_rides(days=-1), 5)
+        self.assertEqual(
+            self.assertMaxQueries(QUERY_BUDGETS["rides/export/"], export, "").body.count("\n"), 11
+        )
+
+        lines = export("?output=ndjson").body.splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], sorted(r.id for r in self.rides))
+
+    def test_driver_list(self):
+        response = self.get("drivers/", **self.admin_auth)
+        self.assertEqual(len(response.json()), 10)
+
+    def test_rebuild_rollups(self):
+        self.assertEqual(rebuild(batch_size=3), (10, 1))
+        stats = self.get("admin/stats/", **self.admin_auth).json()
+        self.assertEqual(stats["totals"]["requested"], 10)
+        self.assertEqual(stats["status_counts"]["REQUESTED"], 10)   # no timestamps past created_at
+
+    def test_job_stats(self):
+        OutboxJob.objects.create(name=GROUP_SEND_JOB, payload={"sends": []})
+        response = self.get("admin/jobs/", **self.admin_auth)
+        self.assertEqual(response.json()["pending"], 1)
+
+
+class AdminChangelistQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser("root", password="root-pass")
+
+        customer = Customer.objects.create(full_name="C", email="c@example.com", phone="9000000001")
+        for i in range(20):
+            driver = Driver.objects.create(
+                full_name=f"Driver {i}", email=f"d{i}@example.com", phone=f"80000000{i:02d}"
+            )
+            RideRequest.objects.create(
+                customer=customer, driver=driver,
+                pickup_address="A", drop_address="B",
+            )
+            PhoneOTP.objects.create(phone=f"70000000{i:02d}", otp="1234", created_at=timezone.now())
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def test_changelists(self):
+        for model in ("driver", "customer", "phoneotp", "riderequest", "archivedride", "outboxjob"):
+            with self.subTest(model=model):
+                response = self.assertMaxQueries(
+                    ADMIN_CHANGELIST_BUDGET, self.client.get, f"/admin/api/{model}/"
+                )
+                self.assertEqual(response.status_code, 200)
+
+
+# ----------------------------------------------------------
+# AUTHENTICATION
+# ----------------------------------------------------------
+@override_settings(CACHES=TEST_CACHES)
+class TokenTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(auth._seen.clear)   # revocations remembered by this process
+        self.admin = User.objects.create_user("token-admin", is_staff=True)
+
+    def jobs(self, token):
+        return self.client.get("/api/admin/jobs/", HTTP_AUTHORIZATION=f"Bearer {token}").status_code
+
+    def test_roles_and_revocation(self):
+        token = get_tokens_for_user(self.admin)["access"]
+        self.assertEqual(self.jobs(token), 200)
+
+        driver = Driver.objects.create(full_name="D", email="t@example.com", phone="8200000000")
+        self.assertEqual(self.jobs(get_tokens_for_user(driver)["access"]), 403)
+
+        # Tokens issued before losing is_staff stop working
+        later = time.time() + 1
+        with mock.patch.object(auth.time, "time", return_value=later), self.captureOnCommitCallbacks(execute=True):
+            self.admin.is_staff = False
+            self.admin.save()
+        self.assertEqual(self.jobs(token), 401)
+
+    def test_tokens_issued_in_the_revocation_second_work(self):
+        auth._set_cutoffs(auth.DRIVER, [1], 1_700_000_000.7)
+        self.assertTrue(auth.is_revoked(auth.DRIVER, 1, 1_699_999_999))
+        self.assertFalse(auth.is_revoked(auth.DRIVER, 1, 1_700_000_000))   # re-login right after
+
+    def test_rejecting_from_a_status_filter_revokes(self):
+        driver = Driver.objects.create(full_name="D", email="r@example.com", phone="8200000001")
+        issued_at = time.time() - 1
+        with self.captureOnCommitCallbacks(execute=True):
+            # The changelist filtered on "PENDING", which the update empties
+            reject_drivers(None, None, Driver.objects.filter(approval_status="PENDING", id=driver.id))
+        self.assertTrue(auth.is_revoked(auth.DRIVER, driver.id, issued_at))
+        self.assertTrue(OutboxJob.objects.exists())   # DRIVER_CHANGED for the feed
+
+    def test_tokens_without_role_are_refused(self):
+        self.assertEqual(self.jobs(str(RefreshToken.for_user(self.admin).access_token)), 401)
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    async def test_sockets_only_open_for_their_owner(self):
+        application = URLRouter(websocket_urlpatterns)
+        driver_token = auth.tokens_for(auth.DRIVER, 7)["access"]
+        for path, code in (
+            ("/ws/driver/7/", 4401),
+            ("/ws/driver/7/?token=garbage", 4401),
+            (f"/ws/driver/8/?token={driver_token}", 4403),
+            (f"/ws/customer/7/?token={driver_token}", 4403),
+            (f"/ws/admin/feed/?token={driver_token}", 4403),
+        ):
+            socket = WebsocketCommunicator(application, path)
+            self.assertEqual(await socket.connect(), (False, code), path)
+
+        token = auth.tokens_for(auth.CUSTOMER, 7)["access"]
+        socket = WebsocketCommunicator(application, f"/ws/customer/7/?token={token}")
+        self.assertTrue((await socket.connect())[0])
+        await socket.disconnect()
+
+
+# ----------------------------------------------------------
+# DISPATCH
+# ----------------------------------------------------------
+@override_settings(CACHES=TEST_CACHES, PRESENCE_FILE=TEST_PRESENCE_FILE, DISPATCH_MAX_PICKUP_KM=10)
+class DispatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(full_name="C", email="dc@example.com", phone="9300000000")
+        cls.near, cls.far = [
+            Driver.objects.create(
+                full_name=f"Driver {i}", email=f"dd{i}@example.com", phone=f"83000000{i:02d}",
+                approval_status="APPROVED", is_available=True, latitude=lat, longitude=78.48,
+            )
+            for i, lat in enumerate((17.381, 19.0))
+        ]
+        cls.ride = RideRequest.objects.create(
+            customer=customer, pickup_address="A", drop_address="B", pickup_lat=17.38, pickup_lng=78.48,
+        )
+
+    def setUp(self):
+        cache.clear()
+        driver_index.invalidate()
+
+    def test_candidates_are_nearest_drivers_within_the_radius(self):
+        rides = [(self.ride.id, 17.38, 78.48)]
+        rows, drivers, dist = candidate_matrix(rides, 10, per_ride=8, max_drivers=100)
+        self.assertEqual((rows, drivers, dist.shape), ([0], [self.near.id], (1, 1)))
+
+        # Two rides, one column each at most
+        rows, drivers, dist = candidate_matrix(rides * 2, 500, per_ride=1, max_drivers=100)
+        self.assertEqual((drivers, dist.shape), ([self.near.id], (2, 1)))
+        rows, drivers, dist = candidate_matrix(rides + [(0, 19.0, 78.48)], 500, per_ride=2, max_drivers=1)
+        self.assertEqual(dist.shape, (2, 1))
+
+    def test_cycle_assigns_and_fans_out_through_the_outbox(self):
+        with self.captureOnCommitCallbacks():
+            self.assertEqual(run_dispatch_cycle(), [(self.ride.id, self.near.id)])
+
+        job = OutboxJob.objects.get()
+        self.assertEqual(job.name, GROUP_SEND_JOB)
+        groups = [group for group, _ in job.payload["sends"]]
+        self.assertEqual(groups, [f"driver_{self.near.id}", "admin_feed", f"customer_{self.ride.customer_id}", "admin_feed"])
+        # Stamped, so dashboards can drop events delivered after a newer one
+        _, ride_event, _, driver_event = (message for _, message in job.payload["sends"])
+        self.ride.refresh_from_db()
+        self.near.refresh_from_db()
+        self.assertEqual(ride_event["ride"]["updated_at"], self.ride.updated_at.isoformat().replace("+00:00", "Z"))
+        self.assertEqual(driver_event["driver"]["updated_at"], self.near.updated_at.isoformat().replace("+00:00", "Z"))
+
+
+# ----------------------------------------------------------
+# BACKGROUND JOBS
+# ----------------------------------------------------------
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    JOBS_MAX_ATTEMPTS=2,
+)
+class OutboxJobTests(TestCase):
+
+    def setUp(self):
+        self.calls = 0
+
+        def flaky():
+            self.calls += 1
+            raise RuntimeError("boom")
+
+        JOBS["test_flaky"] = flaky
+        self.addCleanup(JOBS.pop, "test_flaky")
+
+    async def test_runner_delivers_group_sends(self):
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        await layer.group_add("driver_7", channel)
+
+        await sync_to_async(publish)([("driver_7", {"type": "new_ride", "ride_id": 1})])
+        runner = JobRunner(concurrency=2)
+        await runner.drain()
+
+        self.assertEqual((await layer.receive(channel))["ride_id"], 1)
+        self.assertEqual(runner.completed, 1)
+        self.assertFalse(await OutboxJob.objects.aexists())
+
+    def test_retries_then_fails(self):
+        job = OutboxJob.objects.create(name="test_flaky")
+        runner = JobRunner(concurrency=1)
+
+        with self.assertLogs("api.jobs", "ERROR"):
+            async_to_sync(runner.drain)()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("PENDING", 1))
+        self.assertGreater(job.run_after, timezone.now())   # backing off
+        self.assertIn("boom", job.last_error)
+
+        OutboxJob.objects.filter(id=job.id).update(run_after=timezone.now())
+        with self.assertLogs("api.jobs", "ERROR"):
+            async_to_sync(runner.drain)()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, self.calls), ("FAILED", 2, 2))
+
+    @override_settings(JOBS_CONCURRENCY=0)
+    def test_inline_mode_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            publish([("admin_feed", {"type": "driver_changed", "driver": {"id": 1}})])
+        self.assertFalse(OutboxJob.objects.exists())
+
+
+# ----------------------------------------------------------
+# DRIVER PRESENCE
+# ----------------------------------------------------------
+@override_settings(CACHES=TEST_CACHES, PRESENCE_TTL_SECONDS=30, JOBS_CONCURRENCY=4)
+class PresenceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.online, cls.silent, cls.untracked = [
+            Driver.objects.create(
+                full_name=f"Driver {i}", email=f"p{i}@example.com", phone=f"81000000{i:02d}",
+                approval_status="APPROVED", is_available=True,
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(self.settings(PRESENCE_FILE=os.path.join(directory, "presence.bin")))
+        self.presence = get_presence()
+        cache.clear()   # driver list bodies of other tests' rows
+
+    def available_ids(self):
+        response = self.client.get("/api/rides/available-drivers/")
+        return {driver["id"] for driver in response.json()["drivers"]}
+
+    def test_silent_driver_goes_offline_and_comes_back(self):
+        now = time.time()
+        self.presence.touch(self.online.id, now)
+        self.presence.touch(self.silent.id, now - 60)   # last heartbeat a minute ago
+
+        self.assertEqual(self.available_ids(), {self.online.id, self.untracked.id})
+
+        went_offline, came_back = self.presence.reconcile(now)
+        self.assertEqual((went_offline, came_back), ([self.silent.id], []))
+        self.silent.refresh_from_db()
+        self.assertFalse(self.silent.is_available)
+
+        self.presence.touch(self.silent.id, now)
+        self.assertEqual(self.presence.reconcile(now), ([], [self.silent.id]))
+        self.silent.refresh_from_db()
+        self.assertTrue(self.silent.is_available)
+
+    def test_reconcile_only_restores_what_it_took(self):
+        now = time.time()
+        self.presence.touch(self.silent.id, now - 60)
+        self.presence.reconcile(now)
+
+        # Gone offline on purpose while disconnected: reconnecting keeps it so
+        response = self.client.post(
+            f"/api/driver/{self.silent.id}/status/", {"is_available": "false"},
+            HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.silent)['access']}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.presence.touch(self.silent.id, now)
+        self.assertEqual(self.presence.reconcile(now), ([], []))
+        self.silent.refresh_from_db()
+        self.assertFalse(self.silent.is_available)
+
+    def test_stale_socket_closing_keeps_driver_online(self):
+        self.presence.touch(self.online.id, conn=1)
+        self.presence.touch(self.online.id, conn=2)   # reconnected before the old socket closed
+        self.presence.leave(self.online.id, conn=1)
+        self.assertFalse(self.presence.is_offline(self.online.id))
+        self.presence.leave(self.online.id, conn=2)
+        self.assertTrue(self.presence.is_offline(self.online.id))
+
+    def test_assign_refuses_disconnected_driver(self):
+        ride = RideRequest.objects.create(
+            customer=Customer.objects.create(full_name="C", email="pc@example.com", phone="9100000001"),
+            pickup_address="A", drop_address="B",
+        )
+        self.presence.touch(self.online.id)
+        self.presence.leave(self.online.id)
+
+        with self.assertRaisesMessage(TransitionError, "Driver is offline"):
+            assign_driver(ride.id, self.online.id)
+        self.online.refresh_from_db()
+        self.assertTrue(self.online.is_available)
+
+    def test_table_is_bounded_by_slots_not_ids(self):
+        with self.settings(PRESENCE_MAX_DRIVERS=2):
+            presence = get_presence()
+            presence.touch(1_000_000_000)
+            presence.touch(self.online.id)
+            presence.touch(self.silent.id)   # no slot left: not tracked
+
+            self.assertEqual(os.path.getsize(presence.path), 3 * RECORD.itemsize)
+            self.assertEqual(set(presence.online_ids()), {1_000_000_000, self.online.id})
+            presence.leave(self.silent.id)
+            self.assertFalse(presence.is_offline(self.silent.id))
+
+
+# ----------------------------------------------------------
+# REQUEST METRICS
+# ----------------------------------------------------------
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(self.settings(METRICS_DIR=self.directory, CACHES=TEST_CACHES))
+        cache.clear()
+
+    def test_counts_requests_per_view(self):
+        for _ in range(2):
+            self.client.get("/api/rides/available-drivers/")
+        self.client.post("/api/rides/quote/", {"pairs": "nope"}, content_type="application/json")
+
+        text = self.client.get("/api/metrics/").content.decode()
+        self.assertIn('http_requests_total{view="api.views.ListAvailableDrivers",status="2xx"} 2', text)
+        self.assertIn('http_requests_total{view="api.views.QuoteFares",status="4xx"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{view="api.views.ListAvailableDrivers"} 2', text)
+        self.assertIn('http_db_queries_total{view="api.views.ListAvailableDrivers"} 1', text)   # then cached
+
+    def test_sums_every_process(self):
+        # Another worker process is another registry writing its own file
+        for registry in (RequestMetrics(self.directory, 8), RequestMetrics(self.directory, 16)):
+            registry.record("api.views.DriverList", 200, 0.02, queries=2, response_bytes=100)
+
+        totals = RequestMetrics.collect(self.directory)["api.views.DriverList"]
+        self.assertEqual((totals["status"][1], totals["queries"], totals["response_bytes"]), (2, 4, 200))
+        self.assertEqual(list(totals["latency"][:4]), [0, 0, 2, 0])   # le=0.025
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    async def test_consumer_metrics(self):
+        token = auth.tokens_for(auth.CUSTOMER, 5)["access"]
+        socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/customer/5/?token={token}")
+        self.assertTrue((await socket.connect())[0])
+        await get_channel_layer().group_send("customer_5", {"type": "ride_changed", "ride": {"id": 1}})
+        await socket.receive_json_from()
+
+        live = ConsumerMetrics.collect(self.directory)["CustomerRideConsumer"]
+        self.assertEqual((live["active"], live["group_members"], live["messages_out"]), (1, 1, 1))
+
+        await socket.disconnect()
+        metrics._monitor_task.cancel()
+        text = metrics.render(self.directory)
+        self.assertIn('ws_connections_active{consumer="CustomerRideConsumer"} 0', text)
+        self.assertIn('ws_connections_total{consumer="CustomerRideConsumer"} 1', text)
+        self.assertIn('ws_send_duration_seconds_count{consumer="CustomerRideConsumer"} 1', text)
+
+    def test_gauges_drop_exited_processes(self):
+        registry = ConsumerMetrics(self.directory, 8)
+        registry.add("DriverRideConsumer", "connections")
+        registry.add("DriverRideConsumer", "active")
+        dead = registry.path.replace(f"-{os.getpid()}-", "-999999999-")
+        for suffix in ("", ".json"):
+            os.rename(registry.path + suffix, dead + suffix)
+
+        totals = ConsumerMetrics.collect(self.directory)["DriverRideConsumer"]
+        self.assertEqual((totals["connections"], totals["active"]), (1, 0))
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_token(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+        response = self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer scrape-me")
+        self.assertEqual(response.status_code, 200)
+
+
+# ----------------------------------------------------------
+# BULK IMPORT
+# ----------------------------------------------------------
+class BulkImportTests(TestCase):
+
+    def run_import(self, importer_class, text, fmt="csv", batch_size=2):
+        importer = importer_class(hash_passwords=lambda passwords: [make_password(p) for p in passwords],
+                                  batch_size=batch_size)
+        with self.captureOnCommitCallbacks(execute=True):
+            return importer.run(read_rows(io.StringIO(text), fmt))
+
+    def test_drivers_csv(self):
+        Driver.objects.create(full_name="Taken", email="taken@example.com", phone="8200000000")
+        created, skipped = self.run_import(DriverImporter, (
+            "full_name,email,phone,password,approval_status,experience_years\n"
+            "A,a@example.com,8200000001,pass-a,APPROVED,3\n"
+            "B,b@example.com,8200000000,pass-b,APPROVED,1\n"      # phone taken
+            "C,c@example.com,8200000003,pass-c,HIRED,2\n"         # bad status
+            "D,a@example.com,8200000004,pass-d,PENDING,0\n"       # email earlier in the file
+            f"E,e@example.com,8200000005,{make_password('pass-e')},PENDING,0\n"
+        ))
+        self.assertEqual(created, 2)
+        self.assertEqual([number for number, _ in skipped], [3, 4, 5])
+
+        driver = Driver.objects.get(phone="8200000001")
+        self.assertTrue(check_password("pass-a", driver.password))
+        self.assertEqual((driver.approval_status, driver.is_available), ("APPROVED", False))
+        self.assertTrue(check_password("pass-e", Driver.objects.get(phone="8200000005").password))
+
+    def test_rides_ndjson_keep_history(self):
+        self.run_import(CustomerImporter, "full_name,email,phone,password\nC,c@example.com,9200000001,x\n")
+        completed = "2024-03-01T10:30:00+00:00"
+        created, skipped = self.run_import(RideImporter, "\n".join([
+            json.dumps({"customer_phone": "9200000001", "pickup_address": "A", "drop_address": "B",
+                        "status": "COMPLETED", "estimated_fare": "120.50",
+                        "created_at": "2024-03-01T10:00:00+00:00", "completed_at": completed}),
+            json.dumps({"customer_phone": "9299999999", "pickup_address": "A", "drop_address": "B"}),
+            "{not json",
+        ]), fmt="ndjson")
+
+        self.assertEqual((created, [number for number, _ in skipped]), (1, [2, 3]))
+        ride = RideRequest.objects.get()
+        self.assertEqual(ride.created_at.isoformat(), "2024-03-01T10:00:00+00:00")
+        self.assertEqual(ride.updated_at.isoformat(), completed)
+        self.assertEqual(HourlyRideStats.objects.get(completed=1).fare_total, Decimal("120.50"))
+
+
+# ----------------------------------------------------------
+# CONCURRENT RIDE TRANSITIONS
+# ----------------------------------------------------------
+@unittest.skipIf(
+    connection.vendor == "sqlite" and not connection.settings_dict["TEST"]["NAME"],
+    "in-memory SQLite fails concurrent writers with 'table is locked' instead of waiting",
+)
+class RideTransitionConcurrencyTests(TransactionTestCase):
+    """Hundreds of parallel assign / start / complete calls over HTTP."""
+
+    WORKERS = 16
+    DRIVERS = 20
+    RIDES = 100
+    ASSIGN_CALLS = 400
+    MIN_REQUESTS_PER_SECOND = 50
+
+    def setUp(self):
+        admin = User.objects.create_user("admin", password="admin-pass", is_staff=True)
+        self.admin_auth = {
+            "HTTP_AUTHORIZATION": f"Bearer {get_tokens_for_user(admin)['access']}"
+        }
+
+        customer = Customer.objects.create(full_name="C", email="c@example.com", phone="9000000001")
+        self.driver_ids = [
+            Driver.objects.create(
+                full_name=f"Driver {i}", email=f"d{i}@example.com", phone=f"80000000{i:02d}",
+                approval_status="APPROVED", is_available=True,
+            ).id
+            for i in range(self.DRIVERS)
+        ]
+        self.ride_ids = [
+            RideRequest.objects.create(customer=customer, pickup_address="A", drop_address="B").id
+            for _ in range(self.RIDES)
+        ]
+
+    def fire(self, calls):
+        """Run [(path, data, headers)] on a thread pool; returns status codes and req/s."""
+        def call(args):
+            path, data, headers = args
+            try:
+                return Client().post(path, data, **headers).status_code
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.WORKERS) as pool:
+            codes = list(pool.map(call, calls))
+        return codes, len(calls) / (time.perf_counter() - start)
+
+    def test_no_double_booking(self):
+        rng = random.Random(1)
+        calls = [
+            (f"/api/rides/{rng.choice(self.ride_ids)}/assign/",
+             {"driver_id": rng.choice(self.driver_ids)}, self.admin_auth)
+            for _ in range(self.ASSIGN_CALLS)
+        ]
+        codes, rate = self.fire(calls)
+
+        self.assertEqual(set(codes) - {200, 400}, set())
+        assigned = list(RideRequest.objects.filter(status="ASSIGNED").values_list("driver_id", flat=True))
+        self.assertEqual(codes.count(200), len(assigned))
+        self.assertEqual(len(assigned), len(set(assigned)), "driver assigned to two rides")
+        self.assertEqual(len(assigned), self.DRIVERS)
+        self.assertFalse(Driver.objects.filter(id__in=assigned, is_available=True).exists())
+        self.assertGreater(rate, self.MIN_REQUESTS_PER_SECOND)
+
+        # Start and complete every assigned ride, each call sent twice and
+        # shuffled so starts race completes
+        rides = dict(RideRequest.objects.filter(status="ASSIGNED").values_list("id", "driver_id"))
+        ride_ids = list(rides)
+        calls = [
+            (f"/api/rides/{ride_id}/{action}/", {}, {
+                "HTTP_AUTHORIZATION": f"Bearer {auth.tokens_for(auth.DRIVER, driver_id)['access']}"
+            })
+            for ride_id, driver_id in rides.items() for action in ("start", "complete") for _ in range(2)
+        ]
+        rng.shuffle(calls)
+        codes, rate = self.fire(calls)
+
+        results = {}
+        for (path, _, _), code in zip(calls, codes):
+            results.setdefault(path, []).append(code)
+        for ride_id in ride_ids:
+            self.assertLessEqual(results[f"/api/rides/{ride_id}/start/"].count(200), 1)
+            self.assertLessEqual(results[f"/api/rides/{ride_id}/complete/"].count(200), 1)
+
+        completed = RideRequest.objects.filter(id__in=ride_ids, status="COMPLETED")
+        ongoing = RideRequest.objects.filter(id__in=ride_ids, status="ONGOING")
+        self.assertEqual(completed.count() + ongoing.count(), len(ride_ids))
+        self.assertFalse(Driver.objects.filter(rides__in=completed, is_available=False).exists())
+        self.assertFalse(Driver.objects.filter(rides__in=ongoing, is_available=True).exists())
+        self.assertGreater(rate, self.MIN_REQUESTS_PER_SECOND)
+
+
+# ----------------------------------------------------------
+# CONCURRENT OTP GUESSES
+# ----------------------------------------------------------
+@unittest.skipIf(
+    connection.vendor == "sqlite" and not connection.settings_dict["TEST"]["NAME"],
+    "in-memory SQLite fails concurrent writers with 'table is locked' instead of waiting",
+)
+@override_settings(CACHES=FILE_CACHES, OTP_MAX_ATTEMPTS=3)
+class OTPGuessConcurrencyTests(TransactionTestCase):
+
+    def test_parallel_guesses_stop_at_the_limit(self):
+        cache.clear()
+        for i, store in enumerate(STORES):
+            with self.subTest(store=store), self.settings(OTP_STORE=store):
+                phone = f"700000006{i}"
+                code = get_otp_store().issue(phone)
+                wrong = "0000" if code != "0000" else "1111"
+
+                def guess(_):
+                    try:
+                        get_otp_store().verify(phone, wrong)
+                    except OTPError as exc:
+                        return str(exc.detail)
+                    finally:
+                        connections.close_all()
+
+                with ThreadPoolExecutor(16) as pool:
+                    results = list(pool.map(guess, range(32)))
+                self.assertLessEqual(results.count("Incorrect OTP"), 3)
+                with self.assertRaises(OTPError):
+                    get_otp_store().verify(phone, code)
@@ -2,9 +2,9 @@ from django.urls import path
 from .views import (
     RegisterDriver, RegisterCustomer, DriverLogin, CustomerLogin,
     SendOTP, VerifyOTP, ApproveDriver, UpdateDriverStatus,
-    CreateRideRequest, ListAvailableDrivers, AssignDriverToRide,
-    DriverStartRide, DriverCompleteRide, CustomerRides, DriverRides,
-    AdminLogin, DriverList,
+    CreateRideRequest, ListAvailableDrivers, NearbyDrivers, QuoteFares, AssignDriverToRide,
+    DriverStartRide, DriverCompleteRide, CustomerRides, DriverRides, DriverStats,
+    AdminLogin, AdminStats, DriverList, ExportRides, JobStats, Metrics,
     AllRides   # <-- NEW IMPORT
 )
 
@@ -31,17 +31,34 @@ urlpatterns = [
     # ride management
     path("rides/create/", CreateRideRequest.as_view()),
     path("rides/available-drivers/", ListAvailableDrivers.as_view()),
+    path("rides/nearby-drivers/", NearbyDrivers.as_view()),
+    path("rides/quote/", QuoteFares.as_view()),
     path("rides/<int:ride_id>/assign/", AssignDriverToRide.as_view()),
     path("rides/<int:ride_id>/start/", DriverStartRide.as_view()),
     path("rides/<int:ride_id>/complete/", DriverCompleteRide.as_view()),
 
     # ride history
-    path("customer/<int:customer_id}/rides/", CustomerRides.as_view()),
-    path("driver/<int:driver_id}/rides/", DriverRides.as_view()),
+    path("customer/<int:customer_id>/rides/", CustomerRides.as_view()),
+    path("driver/<int:driver_id>/rides/", DriverRides.as_view()),
+
+    # driver earnings, archived rides included
+    path("driver/<int:driver_id>/stats/", DriverStats.as_view()),
 
     # NEW ENDPOINT — list ALL rides (Admin)
     path("rides/", AllRides.as_view()),
 
+    # stream every ride as CSV / NDJSON (admin)
+    path("rides/export/", ExportRides.as_view()),
+
     # list all drivers (admin)
     path("drivers/", DriverList.as_view()),
+
+    # background job queue depth (admin)
+    path("admin/jobs/", JobStats.as_view()),
+
+    # operational stats from the rollups (admin)
+    path("admin/stats/", AdminStats.as_view()),
+
+    # request metrics, Prometheus text format
+    path("metrics/", Metrics.as_view()),
 ]
@@ -1,41 +1,62 @@
+import numpy as np
 from rest_framework import parsers
 from rest_framework.views import APIView
 from rest_framework import permissions
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.utils import timezone
-from django.shortcuts import get_object_or_404
-from django.contrib.auth.hashers import check_password, make_password
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
 from django.contrib.auth import authenticate
 
-from .models import Driver, Customer, PhoneOTP, RideRequest
+from .models import ArchivedRide, Driver, Customer, RideRequest
+from .async_views import AsyncAPIView
+from .geo import driver_index, get_driver_index
+from .fares import parse_when, quote_pairs, quote_ride
+from .hashing import acheck_password, amake_password
+from .jobs import job_runner
+from .locations import location_buffer
+from .otp import get_otp_store
+from .presence import exclude_offline, get_presence
+from . import archive, auth, bulk, listcache, metrics, rollups
+from .auth import IsDriverOrAdmin, acting_as, check_owner
+from .rides import aassign_driver, acomplete_ride, astart_ride
+from .sync import (
+    DRIVERS_SCOPE, RIDES_SCOPE, aconditional_list_response, conditional_list_response,
+    customer_rides_scope, driver_rides_scope, get_version,
+)
+from .notifications import (
+    apublish, driver_changed_sends, new_ride_sends, publish, ride_changed_sends,
+)
 from .serializers import (
     DriverSerializer, CustomerSerializer,
-    PhoneOTPSerializer, RideRequestSerializer
+    PhoneOTPSerializer, RideRequestSerializer,
+    DriverListSerializer, RideListSerializer,
 )
 
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-
 
 # ----------------------------------------------------------
 # HELPER — GENERATE JWT TOKENS
 # ----------------------------------------------------------
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
-    return {
-        "refresh": str(refresh),
-        "access": str(refresh.access_token),
-    }
+    """Tokens naming the role and id of a Driver, Customer or admin User (api/auth.py)."""
+    if isinstance(user, Driver):
+        role = auth.DRIVER
+    elif isinstance(user, Customer):
+        role = auth.CUSTOMER
+    else:
+        role = auth.ADMIN
+    return auth.tokens_for(role, user.id)
 
 
 # ----------------------------------------------------------
 # DRIVER LOGIN
 # ----------------------------------------------------------
-class DriverLogin(APIView):
+class DriverLogin(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
 
-    def post(self, request):
+    async def post(self, request):
         phone = request.data.get("phone")
         password = request.data.get("password")
 
@@ -43,11 +64,11 @@ class DriverLogin(APIView):
             return Response({"detail": "phone and password required"}, status=400)
 
         try:
-            driver = Driver.objects.get(phone=phone)
+            driver = await Driver.objects.aget(phone=phone)
         except Driver.DoesNotExist:
             return Response({"detail": "Invalid credentials"}, status=400)
 
-        if not check_password(password, driver.password):
+        if not await acheck_password(password, driver.password):
             return Response({"detail": "Invalid credentials"}, status=400)
 
         if driver.approval_status != "APPROVED":
@@ -65,19 +86,22 @@ class DriverLogin(APIView):
 # ----------------------------------------------------------
 # CUSTOMER LOGIN
 # ----------------------------------------------------------
-class CustomerLogin(APIView):
+class CustomerLogin(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
 
-    def post(self, request):
+    async def post(self, request):
         phone = request.data.get("phone")
         password = request.data.get("password")
 
+        if not phone or not password:
+            return Response({"detail": "Invalid credentials"}, status=400)
+
         try:
-            customer = Customer.objects.get(phone=phone)
+            customer = await Customer.objects.aget(phone=phone)
         except Customer.DoesNotExist:
             return Response({"detail": "Invalid credentials"}, status=400)
 
-        if not check_password(password, customer.password):
+        if not await acheck_password(password, customer.password):
             return Response({"detail": "Invalid credentials"}, status=400)
 
         tokens = get_tokens_for_user(customer)
@@ -123,45 +147,40 @@ class AdminLogin(APIView):
 # ----------------------------------------------------------
 # DRIVER REGISTRATION
 # ----------------------------------------------------------
-class RegisterDriver(APIView):
+class RegisterDriver(AsyncAPIView):
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
     permission_classes = [permissions.AllowAny]
 
-    def post(self, request):
-        phone = request.data.get("phone")
-        password = request.data.get("password")
+    async def post(self, request):
+        # Multipart parsing may spool uploads to disk
+        data = await sync_to_async(lambda: request.data.copy())()
+        phone = data.get("phone")
 
-        if Driver.objects.filter(phone=phone).exists():
-            return Response({"detail": "Phone already registered"}, status=400)
-
-        otp_obj = PhoneOTP.objects.filter(phone=phone, is_verified=True).last()
-        if not otp_obj:
+        otp_store = get_otp_store()
+        if not phone or not await sync_to_async(otp_store.is_verified)(phone):
             return Response({"detail": "Phone not verified"}, status=400)
 
-        data = request.data.copy()
-        data["password"] = make_password(password)
-
         serializer = DriverSerializer(data=data)
-        if not serializer.is_valid():
+        if not await sync_to_async(serializer.is_valid)():
             return Response(serializer.errors, status=400)
 
-        serializer.save()
+        password_hash = await amake_password(serializer.validated_data["password"])
+        await sync_to_async(serializer.save)(password_hash=password_hash)
+        await sync_to_async(otp_store.consume)(phone)
         return Response({"message": "Driver registered successfully"}, status=201)
 
 
 # ----------------------------------------------------------
 # CUSTOMER REGISTRATION
 # ----------------------------------------------------------
-class RegisterCustomer(APIView):
+class RegisterCustomer(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
 
-    def post(self, request):
-        data = request.data.copy()
-        data["password"] = make_password(data.get("password"))
-
-        serializer = CustomerSerializer(data=data)
-        if serializer.is_valid():
-            serializer.save()
+    async def post(self, request):
+        serializer = CustomerSerializer(data=request.data)
+        if await sync_to_async(serializer.is_valid)():
+            password_hash = await amake_password(serializer.validated_data["password"])
+            await sync_to_async(serializer.save)(password_hash=password_hash)
             return Response({"message": "Customer registered successfully"}, status=201)
 
         return Response(serializer.errors, status=400)
@@ -178,17 +197,7 @@ class SendOTP(APIView):
         if not phone:
             return Response({"detail": "Phone required"}, status=400)
 
-        import random
-        code = str(random.randint(1000, 9999))
-
-        PhoneOTP.objects.update_or_create(
-            phone=phone,
-            defaults={
-                "otp": code,
-                "is_verified": False,
-                "created_at": timezone.now()
-            }
-        )
+        code = get_otp_store().issue(phone)
 
         return Response({"message": "OTP sent", "otp": code})
 
@@ -203,18 +212,10 @@ class VerifyOTP(APIView):
         phone = request.data.get("phone")
         otp = str(request.data.get("otp", "")).strip()
 
-        obj = PhoneOTP.objects.filter(phone=phone).last()
-        if not obj:
-            return Response({"detail": "OTP not found"}, status=400)
-
-        if timezone.now() - obj.created_at > timezone.timedelta(minutes=10):
-            return Response({"detail": "OTP expired"}, status=400)
-
-        if otp != str(obj.otp).strip():
-            return Response({"detail": "Incorrect OTP"}, status=400)
+        if not phone:
+            return Response({"detail": "Phone required"}, status=400)
 
-        obj.is_verified = True
-        obj.save()
+        get_otp_store().verify(phone, otp)
 
         return Response({"message": "OTP verified"})
 
@@ -237,6 +238,8 @@ class ApproveDriver(APIView):
             return Response({"detail": "Invalid action"}, status=400)
 
         driver.save()
+        driver_index.sync_driver(driver)
+        publish(driver_changed_sends(driver))
 
         return Response({
             "message": "Driver status updated",
@@ -248,9 +251,10 @@ class ApproveDriver(APIView):
 # UPDATE DRIVER STATUS
 # ----------------------------------------------------------
 class UpdateDriverStatus(APIView):
-    permission_classes = [permissions.AllowAny]
+    permission_classes = [IsDriverOrAdmin]
 
     def post(self, request, driver_id):
+        check_owner(request, auth.DRIVER, driver_id)
         driver = get_object_or_404(Driver, id=driver_id)
 
         is_available = request.data.get("is_available")
@@ -259,13 +263,19 @@ class UpdateDriverStatus(APIView):
 
         if is_available is not None:
             driver.is_available = str(is_available).lower() == "true"
+            # Their call now, not presence reconcile's to undo
+            get_presence().keep_status(driver.id)
 
         if lat:
             driver.latitude = lat
         if lng:
             driver.longitude = lng
 
-        driver.save()
+        driver.save(update_fields=["is_available", "latitude", "longitude", "updated_at"])
+        if lat or lng:
+            location_buffer.discard(driver.id)
+        driver_index.sync_driver(driver)
+        publish(driver_changed_sends(driver))
 
         return Response({
             "message": "Driver status updated",
@@ -276,12 +286,12 @@ class UpdateDriverStatus(APIView):
 # ----------------------------------------------------------
 # CREATE RIDE
 # ----------------------------------------------------------
-class CreateRideRequest(APIView):
+class CreateRideRequest(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
 
-    def post(self, request):
+    async def post(self, request):
         customer_id = request.data.get("customer_id")
-        customer = get_object_or_404(Customer, id=customer_id)
+        customer = await aget_object_or_404(Customer, id=customer_id)
 
         data = {
             "customer": customer.id,
@@ -291,13 +301,20 @@ class CreateRideRequest(APIView):
             "drop_address": request.data.get("drop_address"),
             "drop_lat": request.data.get("drop_lat"),
             "drop_lng": request.data.get("drop_lng"),
-            "estimated_fare": request.data.get("estimated_fare")
         }
 
         serializer = RideRequestSerializer(data=data)
 
         if serializer.is_valid():
-            ride = serializer.save()
+            # The fare is always priced here, never taken from the client
+            fields = serializer.validated_data
+            fare = quote_ride(
+                fields.get("pickup_lat"), fields.get("pickup_lng"),
+                fields.get("drop_lat"), fields.get("drop_lng"),
+            )
+            ride = await RideRequest.objects.acreate(customer=customer, estimated_fare=fare, **fields)
+            await rollups.arecord(rollups.requested_deltas(ride.created_at))
+            await apublish(ride_changed_sends(ride))
             return Response(RideRequestSerializer(ride).data, status=201)
 
         return Response(serializer.errors, status=400)
@@ -311,46 +328,122 @@ class ListAvailableDrivers(APIView):
 
     def get(self, request):
         drivers = Driver.objects.filter(is_available=True, approval_status="APPROVED")
-        return Response({"drivers": DriverSerializer(drivers, many=True).data})
+        # Rendered once per drivers version, a JSON fragment per driver
+        ids, fragments = listcache.cached(
+            DRIVERS_SCOPE, get_version(DRIVERS_SCOPE), "available",
+            lambda: listcache.render_rows(DriverListSerializer(), drivers),
+        )
+
+        # Drop drivers whose app has gone away but whose flag isn't reconciled yet
+        offline = get_presence().offline_mask(ids)
+        fragments = [fragment for fragment, gone in zip(fragments, offline) if not gone]
+        return listcache.response(request, listcache.join_rows("drivers", fragments))
 
 
 # ----------------------------------------------------------
-# ASSIGN DRIVER + SEND REAL-TIME EVENT
+# NEARBY DRIVERS (K NEAREST FROM SPATIAL INDEX)
 # ----------------------------------------------------------
-class AssignDriverToRide(APIView):
-    permission_classes = [permissions.IsAdminUser]
+class NearbyDrivers(APIView):
+    permission_classes = [permissions.AllowAny]
 
-    def post(self, request, ride_id):
-        ride = get_object_or_404(RideRequest, id=ride_id)
+    MAX_K = 100
+    MAX_RADIUS_KM = 50
 
-        if ride.driver:
-            return Response({"detail": "Ride already assigned"}, status=400)
+    def get(self, request):
+        try:
+            lat = float(request.query_params["lat"])
+            lng = float(request.query_params["lng"])
+            k = int(request.query_params.get("k", 10))
+            radius_km = float(request.query_params.get("radius_km", 5))
+        except (KeyError, ValueError):
+            return Response({"detail": "lat and lng required"}, status=400)
 
-        driver_id = request.data.get("driver_id")
-        driver = get_object_or_404(Driver, id=driver_id)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({"detail": "Invalid coordinates"}, status=400)
 
-        if driver.approval_status != "APPROVED" or not driver.is_available:
-            return Response({"detail": "Driver not available"}, status=400)
+        k = max(1, min(k, self.MAX_K))
+        radius_km = max(0.0, min(radius_km, self.MAX_RADIUS_KM))
 
-        ride.driver = driver
-        ride.status = "ASSIGNED"
-        ride.assigned_at = timezone.now()
-        ride.save()
+        matches = get_driver_index().nearest(lat, lng, k=k, radius_km=radius_km)
+        online = set(exclude_offline(driver_id for driver_id, _ in matches))
+        matches = [(driver_id, distance) for driver_id, distance in matches if driver_id in online]
 
-        driver.is_available = False
-        driver.save()
+        serializer = DriverListSerializer()
+        # The index may lag behind the table: re-check what it vouched for
+        rows = serializer.rows(Driver.objects.filter(
+            id__in=[driver_id for driver_id, _ in matches], is_available=True, approval_status="APPROVED",
+        ))
+        drivers = {data["id"]: data for data in serializer.serialize(rows)}
 
-        # SEND REAL-TIME NOTIFICATION
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"driver_{driver.id}",
-            {
-                "type": "new_ride",
-                "message": "New ride assigned!",
-                "ride_id": ride.id,
-                "pickup": ride.pickup_address,
-                "drop": ride.drop_address,
-            }
+        results = []
+        for driver_id, distance in matches:
+            data = drivers.get(driver_id)
+            if data is None:
+                continue
+            data["distance_km"] = round(distance, 3)
+            results.append(data)
+
+        return Response({"drivers": results})
+
+
+# ----------------------------------------------------------
+# FARE QUOTES (BATCH)
+# ----------------------------------------------------------
+class QuoteFares(APIView):
+    """
+    POST {"pairs": [[pickup_lat, pickup_lng, drop_lat, drop_lng], ...], "at": optional ISO time}
+    Answers column-wise, one entry per pair, so thousands of quotes stay compact.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        pairs = request.data.get("pairs")
+        max_pairs = getattr(settings, "FARE_QUOTE_MAX_PAIRS", 5000)
+
+        if not isinstance(pairs, list) or not pairs:
+            return Response({"detail": "pairs required"}, status=400)
+        if len(pairs) > max_pairs:
+            return Response({"detail": f"At most {max_pairs} pairs per quote"}, status=400)
+
+        try:
+            coords = np.asarray(pairs, dtype=np.float64)
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid pairs"}, status=400)
+        if coords.ndim != 2 or coords.shape[1] != 4:
+            return Response({"detail": "Each pair needs 4 numbers"}, status=400)
+
+        lats, lngs = coords[:, [0, 2]], coords[:, [1, 3]]
+        if not (np.isfinite(coords).all() and (abs(lats) <= 90).all() and (abs(lngs) <= 180).all()):
+            return Response({"detail": "Invalid coordinates"}, status=400)
+
+        try:
+            when = parse_when(request.data.get("at"))
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid at"}, status=400)
+
+        quote = quote_pairs(coords, when)
+        return Response({
+            "currency": getattr(settings, "FARE_CURRENCY", "INR"),
+            "multiplier": quote["multiplier"],
+            "distance_km": quote["distance_km"].tolist(),
+            "duration_min": quote["duration_min"].tolist(),
+            "fare": quote["fare"].tolist(),
+        })
+
+
+# ----------------------------------------------------------
+# ASSIGN DRIVER + SEND REAL-TIME EVENT
+# ----------------------------------------------------------
+class AssignDriverToRide(AsyncAPIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    async def post(self, request, ride_id):
+        ride = await aassign_driver(ride_id, request.data.get("driver_id"))
+        driver_index.sync_driver(ride.driver)
+
+        # SEND REAL-TIME NOTIFICATIONS (in the background, see api/jobs.py)
+        await apublish(
+            new_ride_sends(ride), ride_changed_sends(ride), driver_changed_sends(ride.driver)
         )
 
         return Response({
@@ -362,18 +455,12 @@ class AssignDriverToRide(APIView):
 # ----------------------------------------------------------
 # START RIDE
 # ----------------------------------------------------------
-class DriverStartRide(APIView):
-    permission_classes = [permissions.AllowAny]
+class DriverStartRide(AsyncAPIView):
+    permission_classes = [IsDriverOrAdmin]
 
-    def post(self, request, ride_id):
-        ride = get_object_or_404(RideRequest, id=ride_id)
-
-        if ride.status != "ASSIGNED":
-            return Response({"detail": "Ride not in assigned state"}, status=400)
-
-        ride.status = "ONGOING"
-        ride.started_at = timezone.now()
-        ride.save()
+    async def post(self, request, ride_id):
+        ride = await astart_ride(ride_id, driver_id=acting_as(request, auth.DRIVER))
+        await apublish(ride_changed_sends(ride))
 
         return Response({"message": "Ride started"})
 
@@ -381,22 +468,17 @@ class DriverStartRide(APIView):
 # ----------------------------------------------------------
 # COMPLETE RIDE
 # ----------------------------------------------------------
-class DriverCompleteRide(APIView):
-    permission_classes = [permissions.AllowAny]
-
-    def post(self, request, ride_id):
-        ride = get_object_or_404(RideRequest, id=ride_id)
+class DriverCompleteRide(AsyncAPIView):
+    permission_classes = [IsDriverOrAdmin]
 
-        if ride.status != "ONGOING":
-            return Response({"detail": "Ride not started"}, status=400)
-
-        ride.status = "COMPLETED"
-        ride.completed_at = timezone.now()
-        ride.save()
+    async def post(self, request, ride_id):
+        ride = await acomplete_ride(ride_id, driver_id=acting_as(request, auth.DRIVER))
+        sends = [ride_changed_sends(ride)]
 
         if ride.driver:
-            ride.driver.is_available = True
-            ride.driver.save()
+            driver_index.sync_driver(ride.driver)
+            sends.append(driver_changed_sends(ride.driver))
+        await apublish(*sends)
 
         return Response({"message": "Ride completed"})
 
@@ -404,23 +486,40 @@ class DriverCompleteRide(APIView):
 # ----------------------------------------------------------
 # CUSTOMER RIDES
 # ----------------------------------------------------------
-class CustomerRides(APIView):
+class CustomerRides(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
 
-    def get(self, request, customer_id):
-        rides = RideRequest.objects.filter(customer_id=customer_id).order_by("-created_at")
-        return Response(RideRequestSerializer(rides, many=True).data)
+    async def get(self, request, customer_id):
+        rides = RideRequest.objects.filter(customer_id=customer_id)
+        archived = await archive.ahistory(ArchivedRide.objects.filter(customer_id=customer_id))
+        return await aconditional_list_response(
+            request, rides, RideListSerializer, customer_rides_scope(customer_id), archive=archived
+        )
 
 
 # ----------------------------------------------------------
 # DRIVER RIDES
 # ----------------------------------------------------------
-class DriverRides(APIView):
+class DriverRides(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
 
+    async def get(self, request, driver_id):
+        rides = RideRequest.objects.filter(driver_id=driver_id)
+        archived = await archive.ahistory(ArchivedRide.objects.filter(driver_id=driver_id))
+        return await aconditional_list_response(
+            request, rides, RideListSerializer, driver_rides_scope(driver_id), archive=archived
+        )
+
+
+# ----------------------------------------------------------
+# DRIVER EARNINGS (FROM THE ROLLUPS)
+# ----------------------------------------------------------
+class DriverStats(APIView):
+    permission_classes = [IsDriverOrAdmin]
+
     def get(self, request, driver_id):
-        rides = RideRequest.objects.filter(driver_id=driver_id).order_by("-created_at")
-        return Response(RideRequestSerializer(rides, many=True).data)
+        check_owner(request, auth.DRIVER, driver_id)
+        return Response(rollups.driver_totals(driver_id))
 
 
 # ----------------------------------------------------------
@@ -430,15 +529,88 @@ class DriverList(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        drivers = Driver.objects.all().order_by("-id")
-        return Response(DriverSerializer(drivers, many=True).data)
-    # ----------------------------------------------------------
+        drivers = Driver.objects.all()
+        return conditional_list_response(
+            request, drivers, DriverListSerializer, DRIVERS_SCOPE, cache_body=True
+        )
+
+
+# ----------------------------------------------------------
 # LIST ALL RIDES (ADMIN ONLY)
 # ----------------------------------------------------------
-class AllRides(APIView):
+class AllRides(AsyncAPIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    async def get(self, request):
+        rides = RideRequest.objects.all()
+        archived = await archive.ahistory(ArchivedRide.objects.all())
+        return await aconditional_list_response(
+            request, rides, RideListSerializer, RIDES_SCOPE, archive=archived
+        )
+
+
+# ----------------------------------------------------------
+# EXPORT ALL RIDES (ADMIN, STREAMED)
+# ----------------------------------------------------------
+class ExportRides(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        # ?output=, since DRF keeps ?format= for renderer selection
+        fmt = request.query_params.get("output", "csv")
+        if fmt not in bulk.FORMATS:
+            return Response({"detail": f"output must be one of {', '.join(bulk.FORMATS)}"}, status=400)
+
+        batch_size = getattr(settings, "RIDE_EXPORT_BATCH_SIZE", 2000)
+        # An async iterator, or the ASGI handler would buffer the whole export
+        response = StreamingHttpResponse(
+            bulk.aexport_rides(fmt, batch_size), content_type=bulk.CONTENT_TYPES[fmt]
+        )
+        response["Content-Disposition"] = f'attachment; filename="rides.{fmt}"'
+        return response
+
+
+# ----------------------------------------------------------
+# BACKGROUND JOB QUEUE DEPTH (ADMIN)
+# ----------------------------------------------------------
+class JobStats(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(job_runner.stats())
+
+
+# ----------------------------------------------------------
+# OPERATIONAL STATS (ADMIN, FROM THE ROLLUPS)
+# ----------------------------------------------------------
+class AdminStats(APIView):
     permission_classes = [permissions.IsAdminUser]
 
+    MAX_HOURS = 24 * 31
+
+    def get(self, request):
+        try:
+            hours = int(request.query_params.get("hours", 24))
+        except ValueError:
+            return Response({"detail": "Invalid hours"}, status=400)
+
+        hours = max(1, min(hours, self.MAX_HOURS))
+        return Response(rollups.stats(hours))
+
+
+# ----------------------------------------------------------
+# PROMETHEUS METRICS (ALL WORKERS ON THIS HOST)
+# ----------------------------------------------------------
+class Metrics(APIView):
+    # Prometheus sends a static bearer token (METRICS_TOKEN), not a JWT
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
     def get(self, request):
-        rides = RideRequest.objects.all().order_by("-created_at")
-        return Response(RideRequestSerializer(rides, many=True).data)
+        token = getattr(settings, "METRICS_TOKEN", None)
+        if token and not constant_time_compare(request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}"):
+            return Response({"detail": "Invalid metrics token"}, status=401)
 
+        return HttpResponse(
+            metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
@@ -1,14 +1,21 @@
 import os
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'driverhiring.settings')
+
 from django.core.asgi import get_asgi_application
-from driver_hiring.routing import websocket_urlpatterns
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'driver_hiring.settings')
+# Populate the app registry before anything imports models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.auth import AuthMiddlewareStack
+from driverhiring.routing import websocket_urlpatterns
+from api.dispatch import with_dispatch_loop
+from api.jobs import with_job_runner
 
-application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+application = with_job_runner(with_dispatch_loop(ProtocolTypeRouter({
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(websocket_urlpatterns)
     ),
-})
+})))
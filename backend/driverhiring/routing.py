@@ -1,6 +1,8 @@
 from django.urls import re_path
-from api.consumers import DriverRideConsumer
+from api.consumers import DriverRideConsumer, AdminFeedConsumer, CustomerRideConsumer
 
 websocket_urlpatterns = [
     re_path(r"ws/driver/(?P<driver_id>\d+)/$", DriverRideConsumer.as_asgi()),
+    re_path(r"ws/customer/(?P<customer_id>\d+)/$", CustomerRideConsumer.as_asgi()),
+    re_path(r"ws/admin/feed/$", AdminFeedConsumer.as_asgi()),
 ]
@@ -50,8 +50,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+
+    # Local: SQL query count + DB time per view
+    'api.middleware.QueryCountMiddleware',
 ]
 
+# Log a warning when a single request runs more queries than this
+QUERY_COUNT_WARN_THRESHOLD = 20
+
 
 ROOT_URLCONF = 'driverhiring.urls'
 
@@ -131,6 +137,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_HEADERS = ['*']
 CORS_ALLOW_METHODS = ['*']
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Sync-Version']
 
 
 # -----------------------------------------------------------
@@ -138,7 +145,11 @@ CORS_ALLOW_METHODS = ['*']
 # -----------------------------------------------------------
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.auth.StatelessJWTAuthentication",   # role + id from the token, no query
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.ORJSONRenderer",   # plain JSON renderer if orjson is missing
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",  # Easier for dev
@@ -151,14 +162,197 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Each worker rechecks a subject's revocation (api/auth.py) this often;
+# None skips revocation checks altogether
+AUTH_REVOCATION_CACHE_SECONDS = 30
+
+
+# -----------------------------------------------------------
+# CACHE (SHARED BY ALL WORKER PROCESSES ON THIS HOST)
+# -----------------------------------------------------------
+# Holds the list sync versions; it must be shared or a worker would
+# answer 304 for changes made by another one.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": "/tmp/driverhiring-cache",
+    }
+}
+
+# ?since= re-sends rows changed up to N seconds before the given version
+SYNC_SINCE_OVERLAP_SECONDS = 5
+
+# Driver list bodies rendered once per drivers version (api/listcache.py):
+# the newest in a per-process LRU, all of them in the cache above
+LIST_CACHE_LOCAL_ENTRIES = 128
+LIST_CACHE_TIMEOUT = 300
+
+
+# -----------------------------------------------------------
+# PASSWORD HASHING POOL
+# -----------------------------------------------------------
+# Login / registration hash passwords in this many worker processes
+# (0 = inline). Past MAX_PENDING waiting calls they answer 429.
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_MAX_PENDING = 64
+
 
 # -----------------------------------------------------------
-# CHANNELS + REDIS (REAL-TIME WEBSOCKETS)
+# PHONE OTP
 # -----------------------------------------------------------
-# Make sure Redis is running on localhost:6379
+# "cache": codes live in CACHES["default"] and expire on their own.
+# "db": PhoneOTP rows.
+# Both count sends and guesses in the DB; delete expired rows with
+# `manage.py sweep_otps --loop`.
+OTP_STORE = "cache"
+OTP_TTL_SECONDS = 600             # a code is valid for 10 minutes
+OTP_VERIFIED_TTL_SECONDS = 3600   # register within an hour of verifying
+OTP_RESEND_SECONDS = 30           # per phone
+OTP_SEND_LIMIT = 5                # sends per phone per window
+OTP_SEND_WINDOW_SECONDS = 3600
+OTP_MAX_ATTEMPTS = 5              # verify calls per code, then send a new one
+
+
+# -----------------------------------------------------------
+# CHANNELS (REAL-TIME WEBSOCKETS)
+# -----------------------------------------------------------
+# Fans group_send out to every ASGI worker on this host over Unix
+# sockets, so more than one worker can run. For a single process,
+# "channels.layers.InMemoryChannelLayer" works too.
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+        "BACKEND": "api.channel_layers.UnixSocketChannelLayer",
+        "CONFIG": {
+            "socket_dir": "/tmp/driverhiring-channels",
+        },
     }
 }
 
+
+# -----------------------------------------------------------
+# DRIVER SPATIAL INDEX
+# -----------------------------------------------------------
+# Grid cell size in degrees (~1.1 km at the equator)
+DRIVER_INDEX_CELL_DEG = 0.01
+
+
+# -----------------------------------------------------------
+# REQUEST + WEBSOCKET METRICS (api/metrics.py, served at api/metrics/)
+# -----------------------------------------------------------
+# One counters file per worker process; clear the directory on deploy
+METRICS_DIR = "/tmp/driverhiring-metrics"
+METRICS_MAX_VIEWS = 256           # further views / consumers are counted as "<other>"
+METRICS_TOKEN = None              # set to require "Authorization: Bearer <token>"
+METRICS_LOOP_PROBE_SECONDS = 0.5  # event loop lag sampling interval (ASGI workers)
+
+
+# -----------------------------------------------------------
+# LOGGING (api/logs.py)
+# -----------------------------------------------------------
+# Records go through a queue to a writer thread, never straight to stderr
+# from the event loop. Per-message WebSocket logs below WARNING are sampled.
+WS_LOG_SAMPLE_RATE = 0.01
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "plain": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+    },
+    "filters": {
+        "ws_sample": {"()": "api.logs.SampleFilter", "rate": WS_LOG_SAMPLE_RATE},
+    },
+    "handlers": {
+        "queue": {"()": "api.logs.queue_handler", "formatter": "plain"},
+    },
+    "loggers": {
+        # Django's own loggers keep their defaults
+        "api": {"handlers": ["queue"], "level": "INFO", "propagate": False},
+        "api.consumers": {"filters": ["ws_sample"]},
+    },
+}
+
+
+# -----------------------------------------------------------
+# DRIVER PRESENCE (api/presence.py)
+# -----------------------------------------------------------
+# Shared by every ASGI worker on this host (one 24-byte slot per driver
+# that has connected, at most PRESENCE_MAX_DRIVERS; clear it on deploy)
+PRESENCE_FILE = "/tmp/driverhiring-presence.bin"
+PRESENCE_MAX_DRIVERS = 100_000
+PRESENCE_TTL_SECONDS = 45         # the driver app PINGs every 15 s
+PRESENCE_RECONCILE_SECONDS = 10   # write changes back to is_available
+
+
+# -----------------------------------------------------------
+# AUTOMATIC DISPATCH
+# -----------------------------------------------------------
+# Run the dispatch loop inside the ASGI process. Enable it on one worker
+# only, or run `python manage.py dispatch_rides --loop` instead.
+DISPATCH_LOOP_ENABLED = False
+DISPATCH_INTERVAL_SECONDS = 5
+DISPATCH_SOLVER = "greedy"        # or "hungarian" (needs scipy)
+DISPATCH_MAX_PICKUP_KM = 10       # None = no limit
+DISPATCH_RADIUS_KM = 25           # candidate search radius when there is no limit
+DISPATCH_MAX_RIDES = 1000         # rides per cycle
+DISPATCH_CANDIDATES_PER_RIDE = 8  # nearest drivers considered for each ride
+DISPATCH_MAX_DRIVERS = 2000       # drivers per cycle (cost matrix columns)
+
+
+# -----------------------------------------------------------
+# DRIVER LOCATION STREAMING
+# -----------------------------------------------------------
+# Positions sent as LOCATION events over ws/driver/<id>/ are written
+# to the DB in one bulk update every N seconds
+DRIVER_LOCATION_FLUSH_SECONDS = 5
+
+
+# -----------------------------------------------------------
+# RIDE ARCHIVE (api/archive.py)
+# -----------------------------------------------------------
+# `manage.py archive_rides` moves COMPLETED / CANCELLED rides not updated
+# for this many days out of the live ride table
+RIDE_ARCHIVE_AFTER_DAYS = 30
+
+
+# -----------------------------------------------------------
+# BULK IMPORT / EXPORT (api/bulk.py)
+# -----------------------------------------------------------
+# rides/export/ streams both ride tables this many rows per query
+RIDE_EXPORT_BATCH_SIZE = 2000
+
+
+# -----------------------------------------------------------
+# BACKGROUND JOBS (api/jobs.py)
+# -----------------------------------------------------------
+# Side-effects such as WebSocket fan-out go through the OutboxJob table
+# and run in each ASGI worker's event loop (or `manage.py run_jobs`).
+# 0 = run every job inline right after its transaction commits.
+JOBS_CONCURRENCY = 4              # jobs running at once per process
+JOBS_POLL_SECONDS = 5             # look for due / retried jobs this often
+JOBS_LEASE_SECONDS = 60           # a RUNNING job is reclaimed after this
+JOBS_MAX_ATTEMPTS = 5             # then it stays FAILED
+JOBS_RETRY_BASE_SECONDS = 2       # backoff: 2, 4, 8, 16 s
+
+
+# -----------------------------------------------------------
+# FARES (api/fares.py)
+# -----------------------------------------------------------
+FARE_CURRENCY = "INR"
+FARE_TIME_ZONE = "Asia/Kolkata"   # time-of-day bands use local hours
+FARE_TARIFF = {
+    "base": 50,
+    "per_km": 12,
+    "per_minute": 1.5,
+    "minimum": 80,
+    "road_factor": 1.3,           # road km per straight-line km
+    "avg_speed_kmh": 25,          # for the per-minute part
+    # (from_hour, to_hour, multiplier), to_hour exclusive, from > to
+    # wraps past midnight
+    "time_of_day": [
+        (23, 6, 1.25),            # night
+        (8, 11, 1.2),             # morning rush
+        (17, 21, 1.3),            # evening rush
+    ],
+}
+FARE_QUOTE_MAX_PAIRS = 5000       # per rides/quote/ call
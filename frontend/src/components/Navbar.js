@@ -11,7 +11,9 @@ function Navbar() {
   // Handle logout
   const handleLogout = () => {
     localStorage.removeItem("customer");
+    localStorage.removeItem("customer_token");
     localStorage.removeItem("driver");
+    localStorage.removeItem("driver_token");
     localStorage.removeItem("admin");
     localStorage.removeItem("admin_token");
 
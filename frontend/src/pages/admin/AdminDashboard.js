@@ -1,5 +1,6 @@
 import { useEffect, useState } from "react";
 import api from "../../utils/api";
+import { openLiveFeed, upsertById } from "../../utils/liveFeed";
 import { useNavigate } from "react-router-dom";
 
 export default function AdminDashboard() {
@@ -43,16 +44,26 @@ export default function AdminDashboard() {
     }
   };
 
+  // -----------------------------
+  // LIVE UPDATES (WEBSOCKET PUSH)
+  // -----------------------------
   useEffect(() => {
-    loadDrivers();
-    loadRides();
-
-    const timer = setInterval(() => {
-      loadDrivers();
-      loadRides();
-    }, 10000);
-
-    return () => clearInterval(timer);
+    const token = localStorage.getItem("admin_token");
+
+    // Full reload on every (re)connect, then apply pushed changes
+    return openLiveFeed(`/admin/feed/?token=${encodeURIComponent(token || "")}`, {
+      onOpen: () => {
+        loadDrivers();
+        loadRides();
+      },
+      onEvent: (data) => {
+        if (data.event === "RIDE_CHANGED") {
+          setRides((prev) => upsertById(prev, data.ride));
+        } else if (data.event === "DRIVER_CHANGED") {
+          setDrivers((prev) => upsertById(prev, data.driver));
+        }
+      },
+    });
   }, []);
 
   // -----------------------------
@@ -63,7 +74,6 @@ export default function AdminDashboard() {
       await api.post(`/admin/driver/${id}/approve/`, { action });
 
       alert(`Driver ${action}d successfully`);
-      loadDrivers();
     } catch (err) {
       console.error(err);
       alert("Failed to update driver");
@@ -81,8 +91,6 @@ export default function AdminDashboard() {
       await api.post(`/rides/${rideId}/assign/`, { driver_id: driverId });
 
       alert("Driver assigned successfully!");
-      loadDrivers();
-      loadRides();
     } catch (err) {
       console.error(err);
       alert("Failed to assign driver");
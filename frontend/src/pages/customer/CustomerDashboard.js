@@ -1,5 +1,6 @@
 import { useEffect, useState } from "react";
 import api from "../../utils/api";
+import { openLiveFeed, upsertById } from "../../utils/liveFeed";
 import { useNavigate } from "react-router-dom";
 
 export default function CustomerDashboard() {
@@ -10,12 +11,17 @@ export default function CustomerDashboard() {
   const customerId = customer?.id;
 
   const [rides, setRides] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
 
-  // Fetch customer's ride history
-  const loadRides = async () => {
+  // Fetch customer's ride history a page at a time (older pages include
+  // archived rides); without a cursor, start again from the newest
+  const loadRides = async (cursor = null) => {
     try {
-      const res = await api.get(`/customer/${customerId}/rides/`);
-      setRides(res.data);
+      const res = await api.get(`/customer/${customerId}/rides/`, {
+        params: cursor ? { limit: PAGE_SIZE, cursor } : { limit: PAGE_SIZE },
+      });
+      setRides((prev) => (cursor ? [...prev, ...res.data.results] : res.data.results));
+      setNextCursor(res.data.next_cursor);
     } catch (err) {
       console.error(err);
       alert("Failed to load rides.");
@@ -25,11 +31,16 @@ export default function CustomerDashboard() {
   useEffect(() => {
     if (!customerId) return navigate("/customer/login");
 
-    loadRides();
-
-    // Auto-refresh every 10 seconds
-    const timer = setInterval(loadRides, 10000);
-    return () => clearInterval(timer);
+    // Reload on every (re)connect, then apply pushed ride changes
+    const token = localStorage.getItem("customer_token") || "";
+    return openLiveFeed(`/customer/${customerId}/?token=${encodeURIComponent(token)}`, {
+      onOpen: () => loadRides(),
+      onEvent: (data) => {
+        if (data.event === "RIDE_CHANGED") {
+          setRides((prev) => upsertById(prev, data.ride));
+        }
+      },
+    });
   }, [customerId]);
 
   return (
@@ -76,11 +87,19 @@ export default function CustomerDashboard() {
             </div>
           ))
         )}
+
+        {nextCursor && (
+          <button style={styles.moreBtn} onClick={() => loadRides(nextCursor)}>
+            Load older rides
+          </button>
+        )}
       </div>
     </div>
   );
 }
 
+const PAGE_SIZE = 20;
+
 // ---------------------------
 // STYLES
 // ---------------------------
@@ -110,6 +129,14 @@ const styles = {
   listContainer: {
     marginTop: "10px",
   },
+  moreBtn: {
+    background: "white",
+    padding: "10px 18px",
+    borderRadius: "6px",
+    border: "1px solid #ccc",
+    cursor: "pointer",
+    fontWeight: "600",
+  },
   card: {
     background: "white",
     padding: "15px",
@@ -20,6 +20,7 @@ export default function CustomerLogin() {
 
       // Save logged-in user data
       localStorage.setItem("customer", JSON.stringify(res.data.customer));
+      localStorage.setItem("customer_token", res.data.tokens.access);
 
       alert("Login successful!");
 
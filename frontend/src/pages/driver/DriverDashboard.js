@@ -18,36 +18,16 @@ export default function DriverDashboard() {
   /* ===========================================
      LOAD DRIVER STATS
   ============================================ */
+  // Totals are summed on the server, archived rides included
   const loadStats = async () => {
     try {
+      const token = localStorage.getItem("driver_token") || "";
       const res = await fetch(
-        `http://127.0.0.1:8000/api/driver/${driver.id}/rides/`
+        `http://127.0.0.1:8000/api/driver/${driver.id}/stats/`,
+        { headers: { Authorization: `Bearer ${token}` } }
       );
-      const rides = await res.json();
-
-      const totalEarnings = rides.reduce(
-        (sum, r) => sum + Number(r.estimated_fare || 0),
-        0
-      );
-      const totalRides = rides.length;
-
-      const today = new Date().toISOString().slice(0, 10);
-      const weekAgo = new Date(Date.now() - 7 * 24 * 3600 * 1000);
-
-      const todayEarnings = rides
-        .filter((r) => r.completed_at?.slice(0, 10) === today)
-        .reduce((sum, r) => sum + Number(r.estimated_fare || 0), 0);
-
-      const weekEarnings = rides
-        .filter((r) => new Date(r.completed_at) >= weekAgo)
-        .reduce((sum, r) => sum + Number(r.estimated_fare || 0), 0);
-
-      setStats({
-        total_rides: totalRides,
-        total_earnings: totalEarnings,
-        today_earnings: todayEarnings,
-        week_earnings: weekEarnings,
-      });
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      setStats(await res.json());
     } catch (err) {
       console.log("Failed loading stats", err);
     }
@@ -80,19 +60,36 @@ export default function DriverDashboard() {
      WEBSOCKET
   ============================================ */
   useEffect(() => {
+    const token = localStorage.getItem("driver_token") || "";
     const ws = new WebSocket(
-      `ws://127.0.0.1:8000/ws/driver/${driver.id}/`
+      `ws://127.0.0.1:8000/ws/driver/${driver.id}/?token=${encodeURIComponent(token)}`
     );
 
-    ws.onopen = () => setWsStatus(true);
-    ws.onclose = () => setWsStatus(false);
+    // Heartbeat: the server marks a silent driver offline after its presence TTL
+    let heartbeat = null;
+
+    ws.onopen = () => {
+      setWsStatus(true);
+      heartbeat = setInterval(() => ws.send(JSON.stringify({ event: "PING" })), 15000);
+    };
+    ws.onclose = () => {
+      setWsStatus(false);
+      clearInterval(heartbeat);
+    };
     ws.onerror = () => setWsStatus(false);
 
     ws.onmessage = (e) => {
       const data = JSON.parse(e.data);
+      if (data.event) return; // CONNECTED / PONG, not a ride
+
       alert("🚖 New Ride Assigned!\nPickup: " + data.pickup);
       loadStats();
     };
+
+    return () => {
+      clearInterval(heartbeat);
+      ws.close();
+    };
   }, []);
 
   return (
@@ -26,6 +26,7 @@ function DriverLogin() {
 
       // Save driver data
       localStorage.setItem("driver", JSON.stringify(res.data.driver));
+      localStorage.setItem("driver_token", res.data.tokens.access);
 
       // Redirect to driver dashboard
       navigate("/driver/dashboard");
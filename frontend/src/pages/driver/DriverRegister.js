@@ -61,7 +61,8 @@ function DriverRegister() {
       setOtpSent(true);
       setTimer(30);
     } catch (err) {
-      alert("Failed to send OTP");
+      // 429 when OTPs are requested too often for this phone
+      alert(err.response?.data?.detail || "Failed to send OTP");
     }
   };
 
@@ -34,7 +34,6 @@ const CustomerRideBook = () => {
           pickup_lng: null,
           drop_lat: null,
           drop_lng: null,
-          estimated_fare: null,
         }
       );
 
@@ -1,6 +1,7 @@
 import axios from "axios";
 
 const API_BASE = "http://127.0.0.1:8000/api";
+export const WS_BASE = "ws://127.0.0.1:8000/ws";
 
 const api = axios.create({
   baseURL: API_BASE,
@@ -0,0 +1,55 @@
+import { WS_BASE } from "./api";
+
+// Open a dashboard WebSocket that reconnects with backoff.
+// onOpen runs on every (re)connect so the page can reload anything it
+// missed while disconnected; onEvent gets each parsed message.
+// Returns a function that closes the feed for good.
+export function openLiveFeed(path, { onEvent, onOpen }) {
+  let socket = null;
+  let retryTimer = null;
+  let delay = 1000;
+  let closed = false;
+
+  const connect = () => {
+    socket = new WebSocket(`${WS_BASE}${path}`);
+
+    socket.onopen = () => {
+      delay = 1000;
+      if (onOpen) onOpen();
+    };
+
+    socket.onmessage = (e) => onEvent(JSON.parse(e.data));
+
+    socket.onclose = () => {
+      if (closed) return;
+      retryTimer = setTimeout(connect, delay);
+      delay = Math.min(delay * 2, 30000);
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (socket) socket.close();
+  };
+}
+
+// Replace the item with the same id, or add it to the front of the list.
+// The server fans events out from several job workers, with retries, so
+// they can arrive out of order: one older than the item shown is dropped.
+export function upsertById(list, item) {
+  const idx = list.findIndex((x) => x.id === item.id);
+  if (idx === -1) return [item, ...list];
+  if (isOlder(item, list[idx])) return list;
+
+  const next = [...list];
+  next[idx] = { ...next[idx], ...item };
+  return next;
+}
+
+function isOlder(item, current) {
+  if (!item.updated_at || !current.updated_at) return false;
+  return Date.parse(item.updated_at) < Date.parse(current.updated_at);
+}